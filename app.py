@@ -5,21 +5,208 @@ Uses collaborative filtering to recommend similar books based on user ratings
 Live Demo: https://books-recommender-sscz.onrender.com/
 """
 
-from flask import Flask, render_template, request
-import pickle
+from flask import Flask, Response, g, render_template, request
+import math
+import time
+import logging
+import threading
+import numpy as np
+from config.configuration import ConfigurationManager
+from logger.log import OUTCOMES, setup_logging
+from components.serving_engine import load_artifacts
+from utils.artifact_bundle import read_current_version
+from utils.metrics import MetricsRegistry, CONTENT_TYPE
+from utils.response_cache import create_response_cache
 
 app = Flask(__name__)
+logger = logging.getLogger(__name__)
+# One record per request, sampled by logging.sample_rates
+request_logger = logging.getLogger('app.requests')
 
-# Load pre-trained model and preprocessed data
-model = pickle.load(open('artifacts/model.pkl', 'rb'))
-book_names = pickle.load(open('artifacts/book_name.pkl', 'rb'))
-final_ratings = pickle.load(open('artifacts/final_ratings.pkl', 'rb'))
-book_matrix = pickle.load(open('artifacts/book_matrix.pkl', 'rb'))
+MAX_BATCH_TITLES = 1000
+MAX_RECOMMENDATIONS = 100
+MAX_SEARCH_RESULTS = 50
+MAX_PROFILE_TITLES = 1000
+
+# Label values are fixed up front so every worker's metrics file has the same layout
+ROUTES = ('/', '/health', '/recommend', '/api/recommend', '/api/recommend/profile', '/api/search', '/metrics', 'other')
+STATUS_CLASSES = ('1xx', '2xx', '3xx', '4xx', '5xx')
+PHASES = ('neighbor_search', 'metadata_lookup', 'template_render')
+
+metrics = MetricsRegistry(namespace='book_recommender')
+HTTP_REQUESTS = metrics.counter(
+    'http_requests_total', 'Requests served by route and status class',
+    {'route': ROUTES, 'status': STATUS_CLASSES}
+)
+HTTP_LATENCY = metrics.histogram(
+    'http_request_duration_seconds', 'Request latency by route', {'route': ROUTES}
+)
+PHASE_LATENCY = metrics.histogram(
+    'recommend_phase_duration_seconds', 'Time spent in each phase of a recommendation request',
+    {'phase': PHASES}
+)
+RECOMMENDED_TITLES = metrics.counter(
+    'recommend_titles_total', 'Titles looked up, by whether they were found', {'result': ('found', 'not_found')}
+)
+CACHE_REQUESTS = metrics.counter(
+    'cache_requests_total', 'Response cache lookups by cache and result',
+    {'cache': ('recommendations', 'pages'), 'result': ('hit', 'miss')}
+)
+ARTIFACT_RELOADS = metrics.counter(
+    'artifact_reloads_total', 'Hot reloads of a new artifact version', {'result': ('success', 'failure')}
+)
+LOG_RECORDS = metrics.counter(
+    'log_records_total', 'Log records by whether they were queued for writing, sampled out or dropped',
+    {'outcome': OUTCOMES}
+)
+
+
+def publish_artifact_info(loaded, load_seconds):
+    """Report the active version through /metrics"""
+    metrics.set_info(
+        artifact_version=loaded.version,
+        artifact_format=config.artifact_format,
+        artifact_load_seconds=round(load_seconds, 6),
+        books_loaded=len(loaded.book_list)
+    )
+
+
+config_manager = ConfigurationManager()
+config = config_manager.get_model_trainer_config()
+serving_config = config_manager.get_serving_config()
+metrics.open(serving_config.metrics_dir)
+setup_logging(config_manager.get_logging_config(), count=LOG_RECORDS.inc)
+
+load_started = time.perf_counter()
+artifacts = load_artifacts(config)
+publish_artifact_info(artifacts, time.perf_counter() - load_started)
+
+response_cache = create_response_cache(
+    serving_config.cache_backend, serving_config.cache_max_entries, serving_config.cache_ttl_seconds,
+    serving_config.cache_eviction, serving_config.cache_path
+)
+if response_cache is not None:
+    response_cache.set_version(artifacts.version)
+
+# Only one reload runs per worker at a time; the pickle format is not published atomically, so it never reloads
+reload_lock = threading.Lock()
+next_reload_check = 0.0
+hot_reload = config.artifact_format == 'numpy' and serving_config.reload_interval_seconds is not None
+
+
+def reload_artifacts():
+    """
+    Load the current bundle version in the background and swap it in
+    
+    Requests keep being served from the old version while the new one loads. Bundle
+    arrays are memory-mapped, so loading costs little memory until pages are touched,
+    and the old version is freed as soon as the last request holding it finishes.
+    """
+    global artifacts
+    try:
+        started = time.perf_counter()
+        loaded = load_artifacts(config)
+        previous, artifacts = artifacts, loaded
+        if response_cache is not None:
+            response_cache.set_version(loaded.version)
+        publish_artifact_info(loaded, time.perf_counter() - started)
+        ARTIFACT_RELOADS.inc('success')
+        logger.info(f"Artifacts reloaded: {previous.version} -> {loaded.version}")
+    except Exception as e:
+        ARTIFACT_RELOADS.inc('failure')
+        logger.error(f"Artifact reload failed, still serving {artifacts.version}: {e}")
+    finally:
+        reload_lock.release()
+
+
+def check_for_new_version():
+    """
+    Start a background reload when the bundle's current pointer names a new version
+    
+    Runs at most once per reload interval per worker and costs one small file read, so it
+    works the same under gunicorn's forked workers without a watcher thread per process.
+    """
+    global next_reload_check
+    now = time.monotonic()
+    if not hot_reload or now < next_reload_check:
+        return
+    next_reload_check = now + serving_config.reload_interval_seconds
+    
+    version = read_current_version(config.bundle_dir)
+    if version is None or version == artifacts.version:
+        return
+    if reload_lock.acquire(blocking=False):
+        threading.Thread(target=reload_artifacts, name='artifact-reload', daemon=True).start()
+
+
+def cache_get(cache_name, key):
+    """Look key up in the response cache and count the hit or miss; None on a miss or with caching off"""
+    if response_cache is None:
+        return None
+    value = response_cache.get((cache_name,) + key)
+    CACHE_REQUESTS.inc(cache_name, 'miss' if value is None else 'hit')
+    return value
+
+
+def cache_set(cache_name, key, value):
+    """Store a computed response; keys carry the version it was computed from"""
+    if response_cache is not None:
+        response_cache.set((cache_name,) + key, value)
+
+
+def recommend_books_batch(book_titles, n_recommendations=5):
+    """
+    Generate recommendations for many books at once
+    
+    Titles already answered for the same n under the loaded artifact version come from the
+    response cache; cached lists are shared between requests and must not be modified.
+    
+    Args:
+        book_titles (list): Titles of the books to base recommendations on
+        n_recommendations (int): Number of recommendations per book (default: 5)
+    
+    Returns:
+        list: One entry per title, in order - a list of recommendation dictionaries
+              as returned by recommend_books, or None if the title is not in the dataset
+    """
+    current = artifacts
+    book_indices = np.array([current.book_positions.get(title, -1) for title in book_titles], dtype=np.int64)
+    found = np.flatnonzero(book_indices >= 0)
+    n_recommendations = min(n_recommendations, len(current.book_list) - 1)
+    
+    results = [None] * len(book_titles)
+    RECOMMENDED_TITLES.inc('found', amount=len(found))
+    RECOMMENDED_TITLES.inc('not_found', amount=len(book_titles) - len(found))
+    if response_cache is not None:
+        for position in found:
+            results[position] = cache_get('recommendations', (current.version, book_titles[position], n_recommendations))
+        found = np.array([position for position in found if results[position] is None], dtype=np.int64)
+    if len(found) == 0:
+        return results
+    
+    search_started = time.perf_counter()
+    indices, distances = current.find_neighbors(book_indices[found], n_recommendations)
+    lookup_started = time.perf_counter()
+    PHASE_LATENCY.observe(lookup_started - search_started, 'neighbor_search')
+    
+    book_list, image_urls = current.book_list, current.image_urls
+    for position, row_indices, row_distances in zip(found, indices, distances):
+        results[position] = [
+            {
+                'title': book_list[idx],
+                'distance': round(float(similarity_distance), 4),
+                'image_url': image_urls[idx]
+            }
+            for idx, similarity_distance in zip(row_indices, row_distances)
+        ]
+        cache_set('recommendations', (current.version, book_titles[position], n_recommendations), results[position])
+    PHASE_LATENCY.observe(time.perf_counter() - lookup_started, 'metadata_lookup')
+    return results
 
 
 def recommend_books(book_title, n_recommendations=5):
     """
-    Generate book recommendations using K-Nearest Neighbors collaborative filtering
+    Generate book recommendations from the precomputed K-Nearest Neighbors table
     
     Args:
         book_title (str): Title of the book to base recommendations on
@@ -29,43 +216,124 @@ def recommend_books(book_title, n_recommendations=5):
         list: List of dictionaries containing recommended books with title, distance, and image URL
         None: If book is not found in the dataset
     """
-    try:
-        book_index = book_names.get_loc(book_title)
-        
-        distances, similar_indices = model.kneighbors(
-            book_matrix.iloc[book_index, :].values.reshape(1, -1),
-            n_neighbors=n_recommendations + 1
-        )
-        
-        recommendations = []
-        for i in range(1, len(similar_indices.flatten())):
-            idx = similar_indices.flatten()[i]
-            recommended_title = book_matrix.index[idx]
-            similarity_distance = distances.flatten()[i]
-            book_image_url = final_ratings[final_ratings['Title'] == recommended_title]['Image-URL'].iloc[0]
-            
-            recommendations.append({
-                'title': recommended_title,
-                'distance': round(similarity_distance, 4),
-                'image_url': book_image_url
-            })
-        
-        return recommendations
-    
-    except (IndexError, KeyError):
+    return recommend_books_batch([book_title], n_recommendations)[0]
+
+
+def recommend_for_history(book_titles, weights=None, n_recommendations=5, current=None):
+    """
+    Recommendations for a reader from several books at once ("because you read these")
+    
+    Every book is scored against the whole history in one sparse pass, and books in the
+    history are never recommended back.
+    
+    Args:
+        book_titles (list): Titles the reader has read
+        weights (list): Optional weight per title, e.g. the reader's rating; all 1 by default
+        n_recommendations (int): Number of recommendations to return (default: 5)
+        current (ServingArtifacts): Artifact version to use, the active one by default
+    
+    Returns:
+        Tuple of (recommendations, titles not in the dataset); recommendations is a list of
+        dictionaries with title, distance and image URL, or None if no title was found
+    
+    Raises:
+        ValueError: If the weights of the titles found are all zero
+    """
+    current = current or artifacts
+    weights = [1.0] * len(book_titles) if weights is None else weights
+    found = [(current.book_positions[title], weight) for title, weight in zip(book_titles, weights)
+             if title in current.book_positions]
+    not_found = [title for title in book_titles if title not in current.book_positions]
+    RECOMMENDED_TITLES.inc('found', amount=len(found))
+    RECOMMENDED_TITLES.inc('not_found', amount=len(not_found))
+    if not found:
+        return None, not_found
+    
+    item_ids = np.fromiter((position for position, _ in found), dtype=np.int64, count=len(found))
+    item_weights = np.fromiter((weight for _, weight in found), dtype=np.float32, count=len(found))
+    if not item_weights.sum() > 0:
+        raise ValueError("The ratings of the titles found in the dataset are all zero")
+    search_started = time.perf_counter()
+    indices, distances = current.find_profile_neighbors(item_ids, item_weights, n_recommendations)
+    lookup_started = time.perf_counter()
+    PHASE_LATENCY.observe(lookup_started - search_started, 'neighbor_search')
+    
+    recommendations = [
+        {
+            'title': current.book_list[idx],
+            'distance': round(float(similarity_distance), 4),
+            'image_url': current.image_urls[idx]
+        }
+        for idx, similarity_distance in zip(indices, distances)
+    ]
+    PHASE_LATENCY.observe(time.perf_counter() - lookup_started, 'metadata_lookup')
+    return recommendations, not_found
+
+
+def recommend_for_user(user_id, n_recommendations=5):
+    """
+    Recommendations from everything a known user rated, weighted by their ratings
+    
+    Args:
+        user_id (int): User-ID from the training ratings
+        n_recommendations (int): Number of recommendations to return (default: 5)
+    
+    Returns:
+        list: Recommendation dictionaries as returned by recommend_books
+        None: If the user is not in the training data
+    """
+    current = artifacts
+    user_ratings, user_positions = current.get_user_ratings()
+    position = user_positions.get(user_id)
+    if position is None:
         return None
+    
+    row = user_ratings[position]
+    titles = [current.book_list[idx] for idx in row.indices]
+    recommendations, _ = recommend_for_history(titles, row.data.tolist(), n_recommendations, current=current)
+    return recommendations
+
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+    check_for_new_version()
+
+
+@app.after_request
+def record_request(response):
+    """Count the request and its latency by route, and log it; the cost is a few float additions and one queued record"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        rule = request.url_rule.rule if request.url_rule is not None else 'other'
+        route = rule if rule in ROUTES else 'other'
+        seconds = time.perf_counter() - started
+        HTTP_LATENCY.observe(seconds, route)
+        HTTP_REQUESTS.inc(route, STATUS_CLASSES[min(max(response.status_code // 100, 1), 5) - 1])
+        request_logger.info("request", extra={
+            'method': request.method, 'route': route, 'status': response.status_code,
+            'duration_ms': round(seconds * 1000, 3), 'artifact_version': artifacts.version,
+        })
+    return response
 
 
 @app.route('/')
 def index():
-    """Render home page with book selection dropdown"""
-    return render_template('index.html', book_list=list(book_names))
+    """Render home page with the title search box"""
+    return render_template('index.html')
 
 
 @app.route('/health')
 def health():
-    """Health check endpoint for monitoring"""
-    return {'status': 'healthy', 'books_loaded': len(book_names)}, 200
+    """Health check endpoint for monitoring, reporting the artifact version being served"""
+    current = artifacts
+    return {
+        'status': 'healthy',
+        'books_loaded': len(current.book_list),
+        'artifact_version': current.version,
+        'artifact_loaded_at': current.loaded_at.isoformat(),
+        'reloading': reload_lock.locked(),
+    }, 200
 
 
 @app.route('/recommend', methods=['POST'])
@@ -74,15 +342,146 @@ def recommend():
     selected_book = request.form.get('book')
     
     if not selected_book:
-        return render_template('index.html', book_list=list(book_names), error="Please select a book")
+        return render_template('index.html', error="Please select a book")
+    
+    version = artifacts.version
+    page = cache_get('pages', (version, selected_book, 5))
+    if page is not None:
+        return page
     
     recommendations = recommend_books(selected_book, n_recommendations=5)
     
     if recommendations is None:
-        return render_template('index.html', book_list=list(book_names), 
-                             error=f"Book '{selected_book}' not found in the dataset")
+        return render_template('index.html', error=f"Book '{selected_book}' not found in the dataset")
+    
+    render_started = time.perf_counter()
+    page = render_template('recommend.html', book_name=selected_book, recommendations=recommendations)
+    PHASE_LATENCY.observe(time.perf_counter() - render_started, 'template_render')
+    cache_set('pages', (version, selected_book, 5), page)
+    return page
+
+
+@app.route('/api/recommend', methods=['POST'])
+def api_recommend():
+    """
+    Batch recommendations as JSON
     
-    return render_template('recommend.html', book_name=selected_book, recommendations=recommendations)
+    Request body: {"titles": ["Title A", "Title B", ...], "n": 5}
+    Unknown titles are reported per item instead of failing the whole batch.
+    """
+    payload = request.get_json(silent=True) or {}
+    titles = payload.get('titles')
+    n_recommendations = payload.get('n', 5)
+    
+    if not isinstance(titles, list) or not all(isinstance(title, str) for title in titles):
+        return {'error': "'titles' must be a list of strings"}, 400
+    if len(titles) > MAX_BATCH_TITLES:
+        return {'error': f"At most {MAX_BATCH_TITLES} titles per request"}, 400
+    if isinstance(n_recommendations, bool) or not isinstance(n_recommendations, int) \
+            or not 1 <= n_recommendations <= MAX_RECOMMENDATIONS:
+        return {'error': f"'n' must be an integer between 1 and {MAX_RECOMMENDATIONS}"}, 400
+    
+    results = []
+    for title, recommendations in zip(titles, recommend_books_batch(titles, n_recommendations)):
+        if recommendations is None:
+            results.append({'title': title, 'error': f"Book '{title}' not found in the dataset"})
+        else:
+            results.append({'title': title, 'recommendations': recommendations})
+    
+    return {'n': n_recommendations, 'results': results}, 200
+
+
+@app.route('/api/recommend/profile', methods=['POST'])
+def api_recommend_profile():
+    """
+    Recommendations from a reader's history as JSON
+    
+    Request body, one of:
+        {"titles": ["Title A", "Title B"], "n": 5}
+        {"ratings": {"Title A": 9, "Title B": 6}, "n": 5}
+        {"user_id": 11676, "n": 5}
+    Titles in the history are never recommended back.
+    """
+    payload = request.get_json(silent=True) or {}
+    n_recommendations = payload.get('n', 5)
+    sources = [key for key in ('titles', 'ratings', 'user_id') if key in payload]
+    
+    if len(sources) != 1:
+        return {'error': "Provide exactly one of 'titles', 'ratings' or 'user_id'"}, 400
+    if isinstance(n_recommendations, bool) or not isinstance(n_recommendations, int) \
+            or not 1 <= n_recommendations <= MAX_RECOMMENDATIONS:
+        return {'error': f"'n' must be an integer between 1 and {MAX_RECOMMENDATIONS}"}, 400
+    
+    if sources[0] == 'user_id':
+        user_id = payload['user_id']
+        if isinstance(user_id, bool) or not isinstance(user_id, int):
+            return {'error': "'user_id' must be an integer"}, 400
+        recommendations = recommend_for_user(user_id, n_recommendations)
+        if recommendations is None:
+            return {'error': f"User {user_id} not found in the training data"}, 404
+        return {'n': n_recommendations, 'user_id': user_id, 'recommendations': recommendations}, 200
+    
+    if sources[0] == 'titles':
+        titles, weights = payload['titles'], None
+        if not isinstance(titles, list) or not all(isinstance(title, str) for title in titles):
+            return {'error': "'titles' must be a list of strings"}, 400
+    else:
+        ratings = payload['ratings']
+        if not isinstance(ratings, dict) or not all(
+                isinstance(rating, (int, float)) and not isinstance(rating, bool) and math.isfinite(rating)
+                and rating >= 0 for rating in ratings.values()):
+            return {'error': "'ratings' must map titles to finite non-negative numbers"}, 400
+        titles, weights = list(ratings), list(ratings.values())
+    if len(titles) > MAX_PROFILE_TITLES:
+        return {'error': f"At most {MAX_PROFILE_TITLES} titles per history"}, 400
+    
+    try:
+        recommendations, not_found = recommend_for_history(titles, weights, n_recommendations)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    if recommendations is None:
+        return {'error': "None of the titles are in the dataset", 'not_found': not_found}, 404
+    return {'n': n_recommendations, 'recommendations': recommendations, 'not_found': not_found}, 200
+
+
+@app.route('/api/search')
+def api_search():
+    """
+    Title autocomplete
+    
+    Query string: q (required), limit (default 10), fuzzy=1 to correct misspelled words.
+    Matching ignores case, accents and punctuation; more-rated titles rank first among equals.
+    """
+    query = request.args.get('q', '').strip()
+    limit = request.args.get('limit', '10')
+    fuzzy = request.args.get('fuzzy', '').lower() in ('1', 'true', 'yes')
+    
+    if not query:
+        return {'error': "'q' must not be empty"}, 400
+    if not limit.isdigit() or not 1 <= int(limit) <= MAX_SEARCH_RESULTS:
+        return {'error': f"'limit' must be an integer between 1 and {MAX_SEARCH_RESULTS}"}, 400
+    
+    current = artifacts
+    matches = current.search_index.search(query, limit=int(limit), fuzzy=fuzzy)
+    results = [
+        {'title': current.book_list[idx], 'ratings': int(current.search_index.rating_counts[idx])}
+        for idx in matches
+    ]
+    return {'query': query, 'results': results}, 200
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics summed over all workers sharing serving.metrics_dir"""
+    body = metrics.render(
+        gauges={
+            'artifact_load_seconds': ('artifact_load_seconds', 'Seconds taken by the last artifact load'),
+            'books_loaded': ('books_loaded', 'Books in the loaded artifacts'),
+        },
+        info_metric='artifact_info',
+        info_labels=('artifact_version', 'artifact_format')
+    )
+    return Response(body, content_type=CONTENT_TYPE)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,4 @@
+"""
+Benchmarks
+Synthetic Book-Crossing data and timing harnesses for the pipeline stages and the web app
+"""
@@ -0,0 +1,67 @@
+"""
+Benchmark Comparison
+Compares two result files written by benchmarks/run_benchmarks.py,
+benchmarks/startup_benchmark.py or benchmarks/load_test.py and flags regressions
+
+Usage:
+    python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Dict
+
+# Keys holding a duration; every one of them is "lower is better"
+TIMING_KEYS = (
+    'seconds', 'p50_ms', 'p95_ms', 'p99_ms', 'per_title_ms',
+    'import_seconds', 'load_seconds', 'first_request_seconds', 'process_seconds'
+)
+
+
+def load_timings(path: Path) -> Dict[str, float]:
+    """Flatten a result file to {'section.benchmark.metric': value} for its timing metrics"""
+    with open(path) as f:
+        results = json.load(f)
+    
+    timings = {}
+    for section in ('stages', 'recommendations', 'startup', 'load'):
+        for name, metrics in results.get(section, {}).items():
+            for key in TIMING_KEYS:
+                if key in metrics:
+                    timings[f"{section}.{name}.{key}"] = metrics[key]
+    return timings
+
+
+def compare(old_path: Path, new_path: Path, threshold: float) -> int:
+    """
+    Print old vs new timings and return the number of regressions
+    
+    Args:
+        threshold: Relative slowdown (0.1 = 10%) counted as a regression
+    """
+    old, new = load_timings(old_path), load_timings(new_path)
+    regressions = 0
+    print(f"{'metric':<52} {'old':>12} {'new':>12} {'change':>9}")
+    for metric in sorted(old.keys() & new.keys()):
+        change = (new[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{metric:<52} {old[metric]:>12.4f} {new[metric]:>12.4f} {change:>+8.1%}{flag}")
+    print(f"\n{regressions} regression(s) above {threshold:.0%}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument('old', type=Path, help="Baseline result JSON")
+    parser.add_argument('new', type=Path, help="Candidate result JSON")
+    parser.add_argument('--threshold', type=float, default=0.1, help="Relative slowdown flagged as a regression")
+    parser.add_argument('--fail-on-regression', action='store_true', help="Exit with status 1 on any regression")
+    args = parser.parse_args()
+    
+    regressions = compare(args.old, args.new, args.threshold)
+    sys.exit(1 if regressions and args.fail_on_regression else 0)
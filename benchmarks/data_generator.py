@@ -0,0 +1,151 @@
+"""
+Synthetic Book-Crossing Data Generator
+Writes BX-Books.csv, BX-Users.csv and BX-Book-Ratings.csv in the original ';'-separated,
+quoted latin-1 format, with Zipf-like user activity and book popularity
+"""
+
+import os
+import csv
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Size of the real Book-Crossing dump, i.e. scale 1
+BASE_BOOKS = 271_379
+BASE_USERS = 278_858
+BASE_RATINGS = 1_149_780
+
+# Zipf-Mandelbrot activity: weight of rank r is (r + offset) ** -exponent. The offset flattens the
+# head so scale 1 has roughly the real number of users with more than 200 ratings
+USER_ZIPF = (1.2, 20)
+BOOK_ZIPF = (1.0, 50)
+# Share of editions reusing an earlier title, of ratings pointing at ISBNs missing from
+# BX-Books.csv and of implicit (0) ratings, all roughly as in the real data
+DUPLICATE_TITLE_RATE = 0.08
+UNKNOWN_ISBN_RATE = 0.1
+IMPLICIT_RATING_RATE = 0.62
+MISSING_AGE_RATE = 0.4
+
+CHUNK_SIZE = 1_000_000
+CSV_OPTIONS = dict(sep=';', index=False, encoding='latin-1', quoting=csv.QUOTE_ALL)
+
+
+def zipf_probabilities(n: int, exponent: float, offset: float = 0) -> np.ndarray:
+    """Probability of each rank under a Zipf-Mandelbrot law truncated to n items"""
+    weights = (np.arange(1, n + 1, dtype=np.float64) + offset) ** -exponent
+    return weights / weights.sum()
+
+
+def _isbns(ids: np.ndarray) -> np.ndarray:
+    """Ten-digit, zero-padded ISBN strings so leading zeros are exercised"""
+    return np.char.zfill(ids.astype(str), 10)
+
+
+def generate_books(n_books: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Books table with duplicate titles across editions"""
+    ids = np.arange(n_books)
+    title_ids = ids.copy()
+    editions = rng.random(n_books) < DUPLICATE_TITLE_RATE
+    title_ids[editions] = rng.integers(0, n_books, int(editions.sum()))
+    
+    years = rng.integers(1950, 2005, n_books).astype(str)
+    years[rng.random(n_books) < 0.01] = '0'
+    isbns = _isbns(ids)
+    return pd.DataFrame({
+        'ISBN': isbns,
+        'Book-Title': np.char.add('Synthetic Book ', title_ids.astype(str)),
+        'Book-Author': np.char.add('Author ', (ids % max(1, n_books // 3)).astype(str)),
+        'Year-Of-Publication': years,
+        'Publisher': np.char.add('Publisher ', (ids % max(1, n_books // 15)).astype(str)),
+        'Image-URL-S': np.char.add(np.char.add('http://images.example.com/S/', isbns), '.jpg'),
+        'Image-URL-M': np.char.add(np.char.add('http://images.example.com/M/', isbns), '.jpg'),
+        'Image-URL-L': np.char.add(np.char.add('http://images.example.com/L/', isbns), '.jpg'),
+    })
+
+
+def generate_users(n_users: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Users table with NULL ages for a share of users"""
+    ages = rng.integers(10, 80, n_users).astype(str).astype(object)
+    ages[rng.random(n_users) < MISSING_AGE_RATE] = 'NULL'
+    return pd.DataFrame({
+        'User-ID': np.arange(1, n_users + 1),
+        'Location': 'city, state, country',
+        'Age': ages,
+    })
+
+
+def write_ratings(path: Path, n_ratings: int, n_users: int, n_books: int, rng: np.random.Generator):
+    """Sample ratings chunk by chunk so memory stays flat at any scale"""
+    user_probabilities = zipf_probabilities(n_users, *USER_ZIPF)
+    book_probabilities = zipf_probabilities(n_books, *BOOK_ZIPF)
+    # Random rank → id maps so the most active users and books are spread over the id range
+    user_ids = rng.permutation(n_users) + 1
+    book_ids = rng.permutation(n_books)
+    
+    for start in range(0, n_ratings, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, n_ratings - start)
+        books = book_ids[rng.choice(n_books, size, p=book_probabilities)]
+        unknown = rng.random(size) < UNKNOWN_ISBN_RATE
+        books[unknown] = n_books + rng.integers(0, max(1, n_books // 4), int(unknown.sum()))
+        
+        ratings = rng.integers(1, 11, size)
+        ratings[rng.random(size) < IMPLICIT_RATING_RATE] = 0
+        chunk = pd.DataFrame({
+            'User-ID': user_ids[rng.choice(n_users, size, p=user_probabilities)],
+            'ISBN': _isbns(books),
+            'Book-Rating': ratings,
+        })
+        chunk.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, **CSV_OPTIONS)
+
+
+def generate_dataset(output_dir: Path, scale: float = 1.0, seed: int = 42) -> dict:
+    """
+    Write a synthetic Book-Crossing dataset
+    
+    Args:
+        output_dir: Directory receiving the three CSV files
+        scale: Size relative to the real dump (1 = 1.15M ratings)
+        seed: Random seed, the same seed and scale always give identical files
+    
+    Returns:
+        Dictionary with the row counts and file paths
+    """
+    rng = np.random.default_rng(seed)
+    n_books = max(100, int(BASE_BOOKS * scale))
+    n_users = max(100, int(BASE_USERS * scale))
+    n_ratings = max(1000, int(BASE_RATINGS * scale))
+    os.makedirs(output_dir, exist_ok=True)
+    
+    paths = {
+        'books_file': Path(output_dir, 'BX-Books.csv'),
+        'users_file': Path(output_dir, 'BX-Users.csv'),
+        'ratings_file': Path(output_dir, 'BX-Book-Ratings.csv'),
+    }
+    logger.info(f"Generating {n_books} books, {n_users} users, {n_ratings} ratings (scale {scale}, seed {seed})")
+    generate_books(n_books, rng).to_csv(paths['books_file'], **CSV_OPTIONS)
+    generate_users(n_users, rng).to_csv(paths['users_file'], **CSV_OPTIONS)
+    write_ratings(paths['ratings_file'], n_ratings, n_users, n_books, rng)
+    
+    return {
+        'scale': scale,
+        'seed': seed,
+        'n_books': n_books,
+        'n_users': n_users,
+        'n_ratings': n_ratings,
+        **{name: str(path) for name, path in paths.items()},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Book-Crossing dataset")
+    parser.add_argument('output_dir', type=Path, help="Directory for the generated CSV files")
+    parser.add_argument('--scale', type=float, default=1.0, help="Size relative to the real dataset (1, 10, 100, ...)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print(generate_dataset(args.output_dir, args.scale, args.seed))
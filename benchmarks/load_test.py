@@ -0,0 +1,494 @@
+"""
+Load Test
+Replays a JSONL workload of HTTP requests against the web app at a fixed concurrency and
+reports throughput, latency percentiles per route and the memory of every serving process
+
+Targets:
+    
+    inprocess  app.app through Flask's test client, from --concurrency threads of this process
+    gunicorn   a local `gunicorn app:app` with --workers workers, started from the served
+               workspace with gunicorn.conf.py and driven over HTTP keep-alive connections
+    url        a server that is already running at --url; its memory is not reported
+
+A workload line is one request; form, json and query are optional:
+    
+    {"method": "GET", "path": "/"}
+    {"method": "POST", "path": "/recommend", "form": {"book": "The Da Vinci Code"}}
+    {"method": "POST", "path": "/api/recommend", "json": {"titles": ["The Da Vinci Code"], "n": 5}}
+    {"method": "GET", "path": "/api/search", "query": {"q": "harry"}}
+
+`generate` writes one from the titles of the artifacts being served: a --mix of routes, with
+titles drawn from a Zipf distribution so that some are requested far more often than others,
+as on a real site, and the response cache sees a realistic hit rate. `run` replays a workload
+in a loop until --requests requests were measured, after --warmup unmeasured ones. Without
+a workload it generates one the same way. Each client thread keeps one connection and
+sends its next request as soon as the last one is answered (a closed loop), so
+throughput is what --concurrency clients get, and the clients share this machine's CPUs.
+In process, the reported memory is this whole process's, including training with --scale.
+
+Usage:
+    python -m benchmarks.load_test generate workloads/mixed.jsonl --requests 5000
+    python -m benchmarks.load_test run workloads/mixed.jsonl --target gunicorn --workers 2 --concurrency 8
+    python -m benchmarks.load_test run --scale 1 --target inprocess --concurrency 4 --requests 5000
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import socket
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import http.client
+import numpy as np
+from pathlib import Path
+from itertools import count
+from collections import Counter
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+from typing import Callable, Dict, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.run_benchmarks import git_commit, latency_summary, working_directory
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = Path(REPO_ROOT, 'benchmarks', 'results')
+DEFAULT_MIX = {'/': 0.2, '/recommend': 0.7, '/health': 0.1}
+METHODS = ('GET', 'POST')
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """'/:0.2,/recommend:0.7' → {'/': 0.2, '/recommend': 0.7}, normalized to sum to 1"""
+    weights = {}
+    for item in mix.split(','):
+        path, _, weight = item.rpartition(':')
+        if not path or float(weight) < 0:
+            raise ValueError(f"Mix entries must look like /path:weight, got {item!r}")
+        weights[path] = float(weight)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("At least one route in the mix needs a positive weight")
+    return {path: weight / total for path, weight in weights.items()}
+
+
+def build_request(path: str, title: str, rng: np.random.Generator) -> dict:
+    """One workload entry for path, about title where the route takes one"""
+    if path == '/recommend':
+        return {'method': 'POST', 'path': path, 'form': {'book': title}}
+    if path == '/api/recommend':
+        return {'method': 'POST', 'path': path, 'json': {'titles': [title], 'n': 5}}
+    if path == '/api/search':
+        return {'method': 'GET', 'path': path, 'query': {'q': title[:int(rng.integers(2, 8))]}}
+    return {'method': 'GET', 'path': path}
+
+
+def generate_workload(titles: List[str], requests: int, mix: Dict[str, float], zipf: float, seed: int) -> List[dict]:
+    """
+    Draw a request mix over titles
+    
+    Args:
+        titles: Titles the artifacts serve
+        requests: Workload entries
+        mix: Route → share of the requests
+        zipf: Exponent of the title popularity, 0 for uniform
+        seed: Random seed
+    
+    Returns:
+        List of workload entries
+    """
+    rng = np.random.default_rng(seed)
+    # Popularity ranks are shuffled so that the most requested titles are not the alphabetically first
+    ranked = rng.permutation(len(titles))
+    popularity = 1.0 / np.arange(1, len(titles) + 1) ** zipf
+    picks = ranked[rng.choice(len(titles), size=requests, p=popularity / popularity.sum())]
+    paths = rng.choice(list(mix), size=requests, p=list(mix.values()))
+    return [build_request(str(path), titles[title], rng) for path, title in zip(paths, picks)]
+
+
+def served_titles() -> List[str]:
+    """Titles of the artifacts in the current directory's config"""
+    from config.configuration import ConfigurationManager
+    from components.serving_engine import load_artifacts
+    return list(load_artifacts(ConfigurationManager().get_model_trainer_config()).book_list)
+
+
+def load_workload(path: Path) -> List[dict]:
+    """Read and check a JSONL workload, skipping blank lines"""
+    workload = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get('method', 'GET').upper() not in METHODS or not str(entry.get('path', '')).startswith('/'):
+                raise ValueError(f"{path}:{line_number}: needs a GET or POST method and a path starting with /")
+            entry['method'] = entry.get('method', 'GET').upper()
+            workload.append(entry)
+    if not workload:
+        raise ValueError(f"Workload {path} has no requests")
+    return workload
+
+
+def save_workload(workload: List[dict], path: Path):
+    os.makedirs(path.parent, exist_ok=True)
+    with open(path, 'w') as f:
+        for entry in workload:
+            f.write(json.dumps(entry) + '\n')
+
+
+class TestClientSession:
+    """Sends workload entries to app.app through Flask's test client"""
+
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def send(self, entry: dict) -> int:
+        response = self.client.open(
+            entry['path'], method=entry['method'], data=entry.get('form'),
+            json=entry.get('json'), query_string=entry.get('query')
+        )
+        response.get_data()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class HttpSession:
+    """Sends workload entries over one keep-alive HTTP connection, reconnecting after errors"""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host, self.port, self.timeout = host, port, timeout
+        self.connection = None
+
+    def send(self, entry: dict) -> int:
+        path = entry['path'] + ('?' + urlencode(entry['query']) if entry.get('query') else '')
+        headers, body = {}, None
+        if entry.get('json') is not None:
+            headers['Content-Type'], body = 'application/json', json.dumps(entry['json'])
+        elif entry.get('form') is not None:
+            headers['Content-Type'], body = 'application/x-www-form-urlencoded', urlencode(entry['form'])
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self.connection.request(entry['method'], path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def run_load(make_session: Callable, workload: List[dict], requests: int, concurrency: int,
+             warmup: int) -> dict:
+    """
+    Replay workload in a loop from concurrency threads, each with its own session
+    
+    Args:
+        make_session: Returns a new session with send(entry) -> status and close()
+        workload: Requests to replay, in order
+        requests: Requests measured
+        concurrency: Client threads
+        warmup: Requests sent from one thread before measuring
+    
+    Returns:
+        Throughput, latency per route and overall, status counts and errors
+    """
+    session = make_session()
+    for i in range(warmup):
+        session.send(workload[i % len(workload)])
+    session.close()
+    
+    next_request = count()
+    samples: List[List[Tuple[str, int, float]]] = [[] for _ in range(concurrency)]
+    errors = Counter()
+    start = threading.Barrier(concurrency + 1)
+
+    def client(samples_out: List[Tuple[str, int, float]]):
+        session = make_session()
+        start.wait()
+        while True:
+            # next() on itertools.count is atomic under the GIL, so every request index is sent once
+            i = next(next_request)
+            if i >= requests:
+                break
+            entry = workload[(warmup + i) % len(workload)]
+            sent = time.perf_counter()
+            try:
+                status = session.send(entry)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+                continue
+            samples_out.append((entry['path'], status, time.perf_counter() - sent))
+        session.close()
+    
+    threads = [threading.Thread(target=client, args=(samples[i],), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    
+    completed = [sample for thread_samples in samples for sample in thread_samples]
+    routes = {'all': [sample[2] for sample in completed]}
+    for path, _, latency in completed:
+        routes.setdefault(path, []).append(latency)
+    load = {}
+    for route, latencies in routes.items():
+        if latencies:
+            load[route] = dict(latency_summary(latencies), requests_per_second=round(len(latencies) / seconds, 2))
+    return {
+        'seconds': round(seconds, 6),
+        'load': load,
+        'status_counts': {str(status): n for status, n in sorted(Counter(sample[1] for sample in completed).items())},
+        'errors': dict(errors),
+    }
+
+
+def process_memory(pid: int) -> Optional[Dict[str, float]]:
+    """Current and peak RSS of a process in MB from /proc, None where unavailable"""
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    key = 'rss_mb' if line.startswith('VmRSS:') else 'peak_rss_mb'
+                    memory[key] = round(int(line.split()[1]) / 1024, 2)
+    except OSError:
+        return None
+    return memory
+
+
+def child_pids(pid: int) -> List[int]:
+    """Direct children of a process, from /proc on Linux"""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(workspace: Path, workers: int, threads: int, timeout: float) -> Tuple[subprocess.Popen, int]:
+    """Start gunicorn app:app from workspace and wait until every worker is up and /health answers"""
+    port = _free_port()
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get('PYTHONPATH')])))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:app', '-c', str(Path(REPO_ROOT, 'gunicorn.conf.py')),
+         '--workers', str(workers), '--threads', str(threads), '--bind', f"127.0.0.1:{port}"],
+        cwd=workspace, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {server.returncode}:\n{server.stderr.read()[-2000:]}")
+        try:
+            if len(child_pids(server.pid)) >= workers and HttpSession('127.0.0.1', port, 5).send({'method': 'GET', 'path': '/health'}) == 200:
+                return server, port
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.2)
+    stop_gunicorn(server)
+    raise RuntimeError(f"gunicorn did not answer /health within {timeout:g}s")
+
+
+def stop_gunicorn(server: subprocess.Popen):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def build_workspace(workdir: Path, args: argparse.Namespace) -> Path:
+    """Generate a synthetic dataset and train it into a workspace to serve"""
+    from benchmarks.data_generator import generate_dataset
+    from benchmarks.run_benchmarks import prepare_workspace
+    from pipeline.training_pipeline import TrainingPipeline
+    
+    workspace = Path(workdir, f"scale-{args.scale:g}")
+    dataset = generate_dataset(Path(workspace, 'data'), args.scale, args.seed)
+    prepare_workspace(workspace, dataset, {
+        'data_transformation': {'min_user_ratings': args.min_user_ratings, 'min_book_ratings': args.min_book_ratings},
+    })
+    logger.info(f"Training artifacts in {workspace}")
+    with working_directory(workspace):
+        TrainingPipeline(force=True).run_pipeline()
+    return workspace
+
+
+def run(args: argparse.Namespace, workspace: Path) -> dict:
+    """Load the workload, drive the target and collect results"""
+    with working_directory(workspace):
+        if args.workload is not None:
+            workload = load_workload(args.workload)
+        else:
+            workload = generate_workload(served_titles(), args.requests, parse_mix(args.mix), args.zipf, args.seed)
+        
+        server, memory = None, {}
+        if args.target == 'inprocess':
+            import app
+            results = run_load(lambda: TestClientSession(app.app), workload, args.requests, args.concurrency, args.warmup)
+            memory['client_and_app'] = process_memory(os.getpid())
+        else:
+            if args.target == 'gunicorn':
+                server, port = start_gunicorn(workspace, args.workers, args.threads, args.startup_timeout)
+                host = '127.0.0.1'
+            else:
+                url = urlsplit(args.url)
+                host, port = url.hostname, url.port or 80
+            try:
+                results = run_load(lambda: HttpSession(host, port, args.request_timeout), workload,
+                                   args.requests, args.concurrency, args.warmup)
+                if server is not None:
+                    memory['master'] = process_memory(server.pid)
+                    for position, pid in enumerate(child_pids(server.pid)):
+                        memory[f"worker_{position}"] = dict(process_memory(pid) or {}, pid=pid)
+            finally:
+                if server is not None:
+                    stop_gunicorn(server)
+    
+    return dict(results, memory=memory, workload_size=len(workload))
+
+
+def command_generate(args: argparse.Namespace):
+    """Write a generated workload"""
+    workspace = args.workdir or Path.cwd()
+    with working_directory(workspace):
+        titles = served_titles()
+    workload = generate_workload(titles, args.requests, parse_mix(args.mix), args.zipf, args.seed)
+    save_workload(workload, args.output)
+    counts = Counter(entry['path'] for entry in workload)
+    print(f"Wrote {len(workload)} requests over {len(titles)} titles to {args.output}: {dict(counts)}")
+
+
+def command_run(args: argparse.Namespace):
+    """Run a load test and save and print its results"""
+    if args.target == 'url' and not args.url:
+        raise SystemExit("--target url needs --url")
+    if args.workload is not None:
+        # Resolved here since the workload is read from the served workspace
+        args.workload = args.workload.resolve()
+    workdir = None
+    try:
+        if args.scale is not None:
+            workdir = (args.workdir or Path(tempfile.mkdtemp(prefix='book-recommender-load-'))).resolve()
+            workspace = build_workspace(workdir, args)
+        else:
+            workspace = (args.workdir or Path.cwd()).resolve()
+        results = run(args, workspace)
+    finally:
+        if workdir is not None and args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    results = {
+        'benchmark': 'load',
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'target': args.target,
+        'workers': args.workers if args.target == 'gunicorn' else None,
+        'threads': args.threads if args.target == 'gunicorn' else None,
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'workload': str(args.workload) if args.workload else f"generated mix {args.mix}",
+        'scale': args.scale,
+        **results,
+    }
+    os.makedirs(args.output_dir, exist_ok=True)
+    timestamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    path = Path(args.output_dir, f"{timestamp}-{results['commit'] or 'nogit'}-load-{args.target}.json")
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    
+    print(f"\n{args.requests} requests, {args.target}"
+          f"{f' ({args.workers} workers x {args.threads} threads)' if args.target == 'gunicorn' else ''}, "
+          f"concurrency {args.concurrency}, {results['seconds']:.2f} s")
+    print(f"  {'route':<24} {'count':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for route, summary in results['load'].items():
+        print(f"  {route:<24} {summary['count']:>7} {summary['requests_per_second']:>9.1f} {summary['p50_ms']:>9.3f} "
+              f"{summary['p95_ms']:>9.3f} {summary['p99_ms']:>9.3f} {summary['max_ms']:>9.3f}")
+    print(f"  status: {results['status_counts']}" + (f"  errors: {results['errors']}" if results['errors'] else ''))
+    for process, memory in results['memory'].items():
+        if memory:
+            print(f"  {process:<24} RSS {memory.get('rss_mb', float('nan')):>8.1f} MB  "
+                  f"peak {memory.get('peak_rss_mb', float('nan')):>8.1f} MB")
+    print(f"  results: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the web app with a JSONL workload")
+    parser.add_argument('--log-level', default='WARNING', help="Log level of this tool and the pipeline")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    generate = commands.add_parser('generate', help="Write a workload from the titles of the served artifacts")
+    generate.add_argument('output', type=Path, help="Workload JSONL to write")
+    
+    run_parser = commands.add_parser('run', help="Replay a workload against a target")
+    run_parser.add_argument('workload', type=Path, nargs='?', help="Workload JSONL, generated from --mix when omitted")
+    run_parser.add_argument('--target', choices=('inprocess', 'gunicorn', 'url'), default='inprocess',
+                            help="Where the requests go")
+    run_parser.add_argument('--concurrency', type=int, default=4, help="Client threads, each with one request in flight")
+    run_parser.add_argument('--warmup', type=int, default=50, help="Unmeasured requests sent first")
+    run_parser.add_argument('--workers', type=int, default=2, help="gunicorn workers")
+    run_parser.add_argument('--threads', type=int, default=1, help="Threads per gunicorn worker")
+    run_parser.add_argument('--url', help="Base URL of a running server for --target url")
+    run_parser.add_argument('--startup-timeout', type=float, default=120.0, help="Seconds to wait for gunicorn")
+    run_parser.add_argument('--request-timeout', type=float, default=30.0, help="Seconds before a request fails")
+    run_parser.add_argument('--scale', type=float, help="Serve synthetic data of this scale instead of the workspace's artifacts")
+    run_parser.add_argument('--min-user-ratings', type=int, help="Override data_transformation.min_user_ratings with --scale")
+    run_parser.add_argument('--min-book-ratings', type=int, help="Override data_transformation.min_book_ratings with --scale")
+    run_parser.add_argument('--output-dir', type=Path, default=RESULTS_DIR, help="Directory for result JSON files")
+    
+    for command in (generate, run_parser):
+        command.add_argument('--requests', type=int, default=2000,
+                             help="Requests to generate, or to measure when running (the workload loops)")
+        command.add_argument('--mix', default=','.join(f"{path}:{weight:g}" for path, weight in DEFAULT_MIX.items()),
+                             help="Route shares of a generated workload, e.g. /:0.2,/recommend:0.7,/health:0.1")
+        command.add_argument('--zipf', type=float, default=1.0, help="Title popularity exponent, 0 for uniform")
+        command.add_argument('--seed', type=int, default=42, help="Random seed for data and workload")
+        command.add_argument('--workdir', type=Path,
+                             help="Workspace to serve (default: current directory), or to keep --scale data in")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=args.log_level, format="[ %(asctime)s ] %(name)s - %(levelname)s - %(message)s")
+    logger.setLevel(logging.INFO)
+    # Importing app sets up its own logging and lowers the root level, so the console filters by --log-level itself
+    console_level = logging.getLevelName(args.log_level.upper())
+    logging.getLogger().handlers[0].addFilter(lambda record: record.name == __name__ or record.levelno >= console_level)
+    if args.command == 'generate':
+        command_generate(args)
+    else:
+        command_run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Logging Overhead Benchmark
+Times what a logging call costs the calling thread with the original synchronous file
+handler and with the queue-based setup in logger.log
+
+The modes compared are:
+    
+    sync_text    logging.FileHandler with the original text format, formatting and
+                 writing in the caller (the setup logger/log.py had before)
+    queue_json   BoundedQueueHandler → listener thread → SharedRotatingFileHandler, JSON
+    queue_sampled the same, on a logger sampled at --sample-rate, as app.requests is
+
+For the queued modes the time the listener then needs to write everything out is
+reported separately as flush seconds, along with the queued / sampled out / dropped counts.
+The records are logged back to back, faster than the listener formats JSON, so the queued
+modes drop records once the queue fills and share the GIL with the listener thread.
+--stall-ms adds a sleep to every file write, as a slow or network disk would; the
+synchronous handler passes that on to every call, the queued ones do not.
+
+Usage:
+    python -m benchmarks.logging_overhead --records 100000 --queue-size 10000
+    python -m benchmarks.logging_overhead --records 5000 --stall-ms 1
+"""
+
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from entity.config_entity import LoggingConfig
+from logger.log import TEXT_FORMAT, JsonFormatter, LoggingRuntime, SharedRotatingFileHandler
+
+MODES = ('sync_text', 'queue_json', 'queue_sampled')
+
+
+def stalled(handler_class: type, stall_seconds: float) -> type:
+    """handler_class with a sleep before every write"""
+    if not stall_seconds:
+        return handler_class
+    
+    class StalledHandler(handler_class):
+        def emit(self, record: logging.LogRecord):
+            time.sleep(stall_seconds)
+            super().emit(record)
+    
+    return StalledHandler
+
+
+def log_records(log: logging.Logger, records: int) -> float:
+    """Log records INFO lines shaped like a request record: seconds spent in the calls"""
+    started = time.perf_counter()
+    for i in range(records):
+        log.info("request", extra={'method': 'POST', 'route': '/api/recommend', 'status': 200, 'duration_ms': i % 50})
+    return time.perf_counter() - started
+
+
+def run_mode(mode: str, workdir: Path, args: argparse.Namespace) -> dict:
+    """Time one mode on its own logger and file"""
+    log = logging.getLogger(f"benchmark.{mode}")
+    log.propagate = False
+    log.setLevel(logging.INFO)
+    path = Path(workdir, f"{mode}.log")
+    
+    if mode == 'sync_text':
+        handler = stalled(logging.FileHandler, args.stall_ms / 1000)(path)
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        log.addHandler(handler)
+        seconds = log_records(log, args.records)
+        handler.close()
+        log.removeHandler(handler)
+        return {'call_us': seconds / args.records * 1e6, 'flush_seconds': 0.0, 'counts': {'queued': args.records}}
+    
+    config = LoggingConfig(
+        log_dir=workdir, queue_size=args.queue_size,
+        sample_rates={log.name: args.sample_rate} if mode == 'queue_sampled' else {}
+    )
+    file_handler = stalled(SharedRotatingFileHandler, args.stall_ms / 1000)(path)
+    file_handler.setFormatter(JsonFormatter())
+    runtime = LoggingRuntime(config, path, file_handler)
+    log.addHandler(runtime.handler)
+    runtime.start()
+    seconds = log_records(log, args.records)
+    started = time.perf_counter()
+    runtime.stop()
+    flush_seconds = time.perf_counter() - started
+    file_handler.close()
+    log.removeHandler(runtime.handler)
+    return {'call_us': seconds / args.records * 1e6, 'flush_seconds': flush_seconds, 'counts': runtime.handler.counts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-call cost of logging")
+    parser.add_argument('--records', type=int, default=100_000, help="Records logged per mode")
+    parser.add_argument('--queue-size', type=int, default=10_000, help="logging.queue_size of the queued modes")
+    parser.add_argument('--sample-rate', type=float, default=0.01, help="Share kept in queue_sampled")
+    parser.add_argument('--stall-ms', type=float, default=0.0, help="Sleep added to every file write")
+    parser.add_argument('--workdir', type=Path, help="Keep the log files here instead of a temp dir")
+    args = parser.parse_args()
+    
+    workdir = (args.workdir or Path(tempfile.mkdtemp(prefix='book-recommender-logging-'))).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+    try:
+        results = {mode: run_mode(mode, workdir, args) for mode in MODES}
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    baseline = results['sync_text']['call_us']
+    print(f"\n{args.records} records per mode, queue size {args.queue_size}, {args.stall_ms:g} ms stall per write")
+    print(f"  {'mode':<14} {'call µs':>8} {'vs sync':>8} {'flush s':>8} {'queued':>8} {'sampled':>8} {'dropped':>8}")
+    for mode, result in results.items():
+        counts = result['counts']
+        print(f"  {mode:<14} {result['call_us']:>8.2f} {baseline / result['call_us']:>7.1f}x {result['flush_seconds']:>8.3f} "
+              f"{counts.get('queued', 0):>8} {counts.get('sampled_out', 0):>8} {counts.get('dropped', 0):>8}")
+
+
+if __name__ == "__main__":
+    main()
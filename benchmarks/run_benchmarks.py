@@ -0,0 +1,302 @@
+"""
+Pipeline and Recommendation Benchmarks
+Times every training stage, the full pipeline and recommendation latency on synthetic data
+
+Each scale runs in its own workspace holding a copy of config/config.yaml that points at the
+generated CSVs, so the repository's artifacts are never touched. Results are written as JSON
+and can be compared between commits with benchmarks/compare.py.
+
+Usage:
+    python -m benchmarks.run_benchmarks --scale 1 10
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import importlib
+import subprocess
+import tempfile
+import numpy as np
+import pandas as pd
+import yaml
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.data_generator import generate_dataset
+from config.configuration import ConfigurationManager
+from constant import CONFIG_FILE_PATH
+from components.stage_00_data_ingestion import DataIngestion
+from components.stage_01_data_validation import DataValidation
+from components.stage_02_data_transformation import DataTransformation
+from components.stage_03_model_trainer import ModelTrainer
+from pipeline.training_pipeline import TrainingPipeline
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = Path(REPO_ROOT, 'benchmarks', 'results')
+
+
+def time_call(func: Callable, *args, repeat: int = 1) -> Tuple[Any, Dict[str, float]]:
+    """
+    Run func repeat times
+    
+    Returns:
+        Tuple of (result of the last run, timing with the best and mean wall time in seconds)
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    return result, {
+        'seconds': round(min(timings), 6),
+        'mean_seconds': round(float(np.mean(timings)), 6),
+        'runs': repeat,
+    }
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    """Percentiles of latency samples given in seconds, reported in milliseconds"""
+    samples_ms = np.asarray(samples) * 1000
+    return {
+        'count': int(len(samples_ms)),
+        'mean_ms': round(float(samples_ms.mean()), 4),
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples_ms, 95)), 4),
+        'p99_ms': round(float(np.percentile(samples_ms, 99)), 4),
+        'max_ms': round(float(samples_ms.max()), 4),
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Short hash of the checked-out commit, None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextmanager
+def working_directory(path: Path) -> Iterator[None]:
+    """Temporarily run from path, where the relative config/config.yaml is resolved"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def prepare_workspace(workspace: Path, dataset: dict, overrides: Dict[str, Dict[str, Any]]):
+    """Write the repository config into workspace, pointed at the generated CSVs"""
+    with open(Path(REPO_ROOT, CONFIG_FILE_PATH)) as f:
+        config = yaml.safe_load(f)
+    for key in ('books_file', 'users_file', 'ratings_file'):
+        config['data_ingestion'][key] = dataset[key]
+    for section, values in overrides.items():
+        config[section].update({key: value for key, value in values.items() if value is not None})
+    
+    os.makedirs(Path(workspace, CONFIG_FILE_PATH).parent, exist_ok=True)
+    with open(Path(workspace, CONFIG_FILE_PATH), 'w') as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+
+
+def benchmark_stages(repeat: int) -> Dict[str, dict]:
+    """Time each pipeline component on its own, then the whole pipeline from a cold cache"""
+    config_manager = ConfigurationManager()
+    ingestion_config = config_manager.get_data_ingestion_config()
+    results = {}
+    
+    shutil.rmtree(ingestion_config.cache_dir, ignore_errors=True)
+    (books, users, ratings), results['data_ingestion_cold'] = time_call(DataIngestion(ingestion_config).load_data)
+    _, results['data_ingestion_warm'] = time_call(DataIngestion(ingestion_config).load_data, repeat=repeat)
+    rows = {'books': len(books), 'users': len(users), 'ratings': len(ratings)}
+    results['data_ingestion_cold']['rows'] = results['data_ingestion_warm']['rows'] = rows
+    
+    data_validation = DataValidation(config_manager.get_data_validation_config())
+    _, results['data_validation'] = time_call(data_validation.validate_data, books, users, ratings, repeat=repeat)
+    
+    data_transformation = DataTransformation(config_manager.get_data_transformation_config())
+    (final_ratings, user_book_matrix), results['data_transformation'] = time_call(
+        data_transformation.transform_data, books, ratings, repeat=repeat
+    )
+    results['data_transformation'].update(
+        final_ratings=len(final_ratings),
+        matrix_shape=list(user_book_matrix.matrix.shape),
+        matrix_nnz=int(user_book_matrix.matrix.nnz)
+    )
+    
+    model_trainer = ModelTrainer(config_manager.get_model_trainer_config())
+    _, results['model_trainer'] = time_call(model_trainer.train_model, final_ratings, user_book_matrix, repeat=repeat)
+    
+    _, results['end_to_end'] = time_call(lambda: TrainingPipeline(force=True).run_pipeline())
+    return results
+
+
+def benchmark_recommendations(n_queries: int, batch_size: int, n_recommendations: int, seed: int) -> Dict[str, dict]:
+    """Latency of app startup, single, batch and history recommendations, title search and the HTTP endpoints"""
+    started = time.perf_counter()
+    # app loads its artifacts at import time, reloading picks up the current workspace
+    app_module = importlib.reload(sys.modules['app']) if 'app' in sys.modules else importlib.import_module('app')
+    startup_seconds = time.perf_counter() - started
+    
+    rng = np.random.default_rng(seed)
+    book_list = app_module.artifacts.book_list
+    titles = [book_list[i] for i in rng.integers(0, len(book_list), n_queries)]
+    table_width = app_module.artifacts.neighbor_indices.shape[1]
+    app_module.recommend_books(titles[0], n_recommendations)
+
+    def sample(func: Callable, inputs: list) -> Dict[str, float]:
+        samples = []
+        for item in inputs:
+            query_started = time.perf_counter()
+            func(item)
+            samples.append(time.perf_counter() - query_started)
+        return latency_summary(samples)
+    
+    batches = [titles[start:start + batch_size] for start in range(0, n_queries, batch_size)]
+    client = app_module.app.test_client()
+    results = {
+        'app_startup': {'seconds': round(startup_seconds, 6), 'books': len(book_list)},
+        'recommend_single': sample(lambda title: app_module.recommend_books(title, n_recommendations), titles),
+        'recommend_batch': dict(
+            sample(lambda batch: app_module.recommend_books_batch(batch, n_recommendations), batches),
+            batch_size=batch_size
+        ),
+        'recommend_beyond_table': dict(
+            sample(lambda title: app_module.recommend_books(title, table_width + 5), titles[:min(n_queries, 50)]),
+            n_recommendations=table_width + 5
+        ),
+        'recommend_history': dict(
+            sample(lambda batch: app_module.recommend_for_history(batch, None, n_recommendations), batches),
+            history_size=batch_size
+        ),
+        'http_recommend': sample(lambda title: client.post('/recommend', data={'book': title}), titles[:min(n_queries, 200)]),
+        'http_api_recommend': dict(
+            sample(lambda batch: client.post('/api/recommend', json={'titles': batch, 'n': n_recommendations}), batches),
+            batch_size=batch_size
+        ),
+        'http_search': sample(
+            lambda prefix: client.get('/api/search', query_string={'q': prefix}),
+            [title[:int(length)] for title, length in zip(titles[:min(n_queries, 200)], rng.integers(1, 8, n_queries))]
+        ),
+    }
+    for name in ('recommend_batch', 'http_api_recommend'):
+        results[name]['per_title_ms'] = round(results[name]['mean_ms'] / batch_size, 4)
+    return results
+
+
+def run_scale(scale: float, args: argparse.Namespace, workdir: Path) -> dict:
+    """Generate data for one scale and run every benchmark against it"""
+    workspace = Path(workdir, f"scale-{scale:g}")
+    data_dir = Path(workspace, 'data')
+    
+    logger.info(f"Generating scale {scale:g} dataset in {data_dir}")
+    dataset, generate_timing = time_call(generate_dataset, data_dir, scale, args.seed)
+    prepare_workspace(workspace, dataset, {
+        'data_transformation': {'min_user_ratings': args.min_user_ratings, 'min_book_ratings': args.min_book_ratings},
+        'model_trainer': {'algorithm': args.algorithm},
+    })
+    
+    with working_directory(workspace):
+        logger.info(f"Benchmarking pipeline stages at scale {scale:g}")
+        stages = benchmark_stages(args.repeat)
+        logger.info(f"Benchmarking recommendations at scale {scale:g}")
+        recommendations = benchmark_recommendations(args.queries, args.batch_size, args.n, args.seed)
+        with open(CONFIG_FILE_PATH) as f:
+            config = yaml.safe_load(f)
+    
+    return {
+        'benchmark': 'pipeline',
+        'commit': git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+        },
+        'dataset': dict(dataset, generate_seconds=generate_timing['seconds']),
+        'config': {
+            'min_user_ratings': config['data_transformation']['min_user_ratings'],
+            'min_book_ratings': config['data_transformation']['min_book_ratings'],
+            'algorithm': config['model_trainer']['algorithm'],
+            'artifact_format': config['model_trainer']['artifact_format'],
+            'n_neighbors': config['model_trainer']['n_neighbors'],
+        },
+        'stages': stages,
+        'recommendations': recommendations,
+    }
+
+
+def save_results(results: dict, output_dir: Path) -> Path:
+    """Save one scale's results as <timestamp>-<commit>-scale<scale>.json"""
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    path = Path(output_dir, f"{timestamp}-{results['commit'] or 'nogit'}-scale{results['dataset']['scale']:g}.json")
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the training pipeline and recommendation latency")
+    parser.add_argument('--scale', type=float, nargs='+', default=[1.0],
+                        help="Dataset sizes relative to the real Book-Crossing dump, e.g. 1 10 100")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for data and queries")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per stage, the best time is reported")
+    parser.add_argument('--queries', type=int, default=1000, help="Recommendation requests to time")
+    parser.add_argument('--batch-size', type=int, default=100, help="Titles per batch request")
+    parser.add_argument('--n', type=int, default=5, help="Recommendations per title")
+    parser.add_argument('--min-user-ratings', type=int, help="Override data_transformation.min_user_ratings")
+    parser.add_argument('--min-book-ratings', type=int, help="Override data_transformation.min_book_ratings")
+    parser.add_argument('--algorithm', help="Override model_trainer.algorithm")
+    parser.add_argument('--workdir', type=Path, help="Keep generated data and artifacts here instead of a temp dir")
+    parser.add_argument('--output-dir', type=Path, default=RESULTS_DIR, help="Directory for result JSON files")
+    parser.add_argument('--log-level', default='WARNING', help="Log level of the pipeline components")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=args.log_level, format="[ %(asctime)s ] %(name)s - %(levelname)s - %(message)s")
+    logger.setLevel(logging.INFO)
+    # Importing app sets up its own logging and lowers the root level, so the console filters by --log-level itself
+    console_level = logging.getLevelName(args.log_level.upper())
+    logging.getLogger().handlers[0].addFilter(lambda record: record.name == __name__ or record.levelno >= console_level)
+    
+    workdir = (args.workdir or Path(tempfile.mkdtemp(prefix='book-recommender-bench-'))).resolve()
+    try:
+        for scale in args.scale:
+            results = run_scale(scale, args, workdir)
+            path = save_results(results, args.output_dir)
+            stages = results['stages']
+            recommendations = results['recommendations']
+            print(f"\nScale {scale:g}: {results['dataset']['n_ratings']} ratings, "
+                  f"matrix {stages['data_transformation']['matrix_shape']}")
+            for name, timing in stages.items():
+                print(f"  {name:<24} {timing['seconds']:>10.3f} s")
+            print(f"  {'app_startup':<24} {recommendations['app_startup']['seconds']:>10.3f} s")
+            for name, latency in recommendations.items():
+                if 'p50_ms' in latency:
+                    print(f"  {name:<24} p50 {latency['p50_ms']:>8.3f} ms  p99 {latency['p99_ms']:>8.3f} ms")
+            print(f"  results: {path}")
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
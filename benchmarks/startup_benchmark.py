@@ -0,0 +1,242 @@
+"""
+Worker Startup Benchmark
+Times a fresh process from interpreter start to its first recommendation on each serving path
+
+Every measurement runs in a new subprocess, since a warm interpreter would hide exactly the
+import and unpickling costs a gunicorn worker pays at boot. The paths compared are:
+
+    sklearn_model  the original serving path: import scikit-learn and pandas, unpickle
+                   model.pkl and query NearestNeighbors.kneighbors
+    app_pickle     app.py on the pickle artifacts
+    engine_numpy   components.serving_engine on the numpy bundle, without Flask
+    app_numpy      app.py on the numpy bundle
+
+Only this module's standard-library imports run in the measured processes; everything
+needed to generate data and train is imported by the parent.
+
+Usage:
+    python -m benchmarks.startup_benchmark --scale 1 --runs 5
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = Path(REPO_ROOT, 'benchmarks', 'results')
+# Serving path → (artifact format it reads, how the child process serves it)
+PATHS = {
+    'sklearn_model': ('pickle', 'sklearn_model'),
+    'app_pickle': ('pickle', 'app'),
+    'engine_numpy': ('numpy', 'engine'),
+    'app_numpy': ('numpy', 'app'),
+}
+HEAVY_MODULES = ('sklearn', 'pandas', 'flask', 'scipy')
+MEASURES = ('import_seconds', 'load_seconds', 'first_request_seconds', 'seconds', 'process_seconds', 'peak_rss_mb')
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB, None where unsupported"""
+    # Linux carries ru_maxrss over from the parent across fork+exec, VmHWM starts fresh
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 2)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 2)
+
+
+def measure_startup(mode: str, n_recommendations: int) -> dict:
+    """
+    Import, load and answer one request in this (fresh) process
+    
+    Args:
+        mode: 'sklearn_model', 'engine' or 'app'
+        n_recommendations: Recommendations in the first request
+    
+    Returns:
+        Phase timings in seconds, peak RSS and which heavy modules got imported
+    """
+    started = time.perf_counter()
+    if mode == 'sklearn_model':
+        import pandas
+        import sklearn.neighbors
+        from config.configuration import ConfigurationManager
+        from utils.util import load_pickle
+        imported = time.perf_counter()
+        config = ConfigurationManager().get_model_trainer_config()
+        model = load_pickle(config.model_path)
+        book_names = load_pickle(config.book_names_path)
+        matrix = load_pickle(config.book_matrix_path).matrix
+        loaded = time.perf_counter()
+        _, indices = model.kneighbors(matrix[0], n_neighbors=n_recommendations + 1)
+        titles = [book_names[idx] for idx in indices[0][1:]]
+    elif mode == 'engine':
+        from config.configuration import ConfigurationManager
+        from components.serving_engine import load_artifacts
+        imported = time.perf_counter()
+        artifacts = load_artifacts(ConfigurationManager().get_model_trainer_config())
+        loaded = time.perf_counter()
+        indices, _ = artifacts.find_neighbors([0], n_recommendations)
+        titles = [artifacts.book_list[idx] for idx in indices[0]]
+    elif mode == 'app':
+        # app loads its artifacts at import time, so the two phases cannot be told apart
+        import app
+        imported = loaded = time.perf_counter()
+        response = app.app.test_client().post(
+            '/api/recommend', json={'titles': [app.artifacts.book_list[0]], 'n': n_recommendations}
+        )
+        titles = [book['title'] for book in response.get_json()['results'][0]['recommendations']]
+    else:
+        raise ValueError(f"Unknown startup mode: {mode}")
+    finished = time.perf_counter()
+    
+    return {
+        'import_seconds': round(imported - started, 6),
+        'load_seconds': round(loaded - imported, 6),
+        'first_request_seconds': round(finished - loaded, 6),
+        'seconds': round(finished - started, 6),
+        'peak_rss_mb': _peak_rss_mb(),
+        'recommendations': len(titles),
+        'modules': {name: name in sys.modules for name in HEAVY_MODULES},
+    }
+
+
+def run_child(workspace: Path, mode: str, n_recommendations: int) -> dict:
+    """Run measure_startup in a new interpreter from workspace and add its total wall time"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get('PYTHONPATH')])))
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.startup_benchmark', '--child', mode, '--n', str(n_recommendations)],
+        cwd=workspace, env=env, capture_output=True, text=True
+    )
+    process_seconds = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup run '{mode}' failed in {workspace}:\n{completed.stderr[-2000:]}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['process_seconds'] = round(process_seconds, 6)
+    return result
+
+
+def build_workspaces(workdir: Path, args: argparse.Namespace) -> Dict[str, Path]:
+    """Generate one dataset and train it into a numpy and a pickle workspace"""
+    from benchmarks.data_generator import generate_dataset
+    from benchmarks.run_benchmarks import prepare_workspace, working_directory
+    from pipeline.training_pipeline import TrainingPipeline
+    
+    dataset = generate_dataset(Path(workdir, 'data'), args.scale, args.seed)
+    workspaces = {}
+    for artifact_format in ('numpy', 'pickle'):
+        workspace = Path(workdir, artifact_format)
+        # The original path unpickles a NearestNeighbors model, which only 'brute' and the tree algorithms produce
+        prepare_workspace(workspace, dataset, {
+            'data_transformation': {'min_user_ratings': args.min_user_ratings, 'min_book_ratings': args.min_book_ratings},
+            'model_trainer': {'artifact_format': artifact_format, 'algorithm': 'brute'},
+        })
+        logger.info(f"Training {artifact_format} artifacts in {workspace}")
+        with working_directory(workspace):
+            TrainingPipeline(force=True).run_pipeline()
+        workspaces[artifact_format] = workspace
+    return workspaces
+
+
+def summarize(runs: List[dict]) -> dict:
+    """Median of every measure over the runs, plus the modules the path imported"""
+    summary = {
+        measure: round(statistics.median(run[measure] for run in runs), 6)
+        for measure in MEASURES if all(run.get(measure) is not None for run in runs)
+    }
+    summary.update(runs=len(runs), recommendations=runs[-1]['recommendations'], modules=runs[-1]['modules'])
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark worker startup on each serving path")
+    parser.add_argument('--scale', type=float, default=1.0, help="Dataset size relative to the real Book-Crossing dump")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for the data")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh processes per path, the median is reported")
+    parser.add_argument('--n', type=int, default=5, help="Recommendations in the first request")
+    parser.add_argument('--min-user-ratings', type=int, help="Override data_transformation.min_user_ratings")
+    parser.add_argument('--min-book-ratings', type=int, help="Override data_transformation.min_book_ratings")
+    parser.add_argument('--workdir', type=Path, help="Keep generated data and artifacts here instead of a temp dir")
+    parser.add_argument('--output-dir', type=Path, default=RESULTS_DIR, help="Directory for result JSON files")
+    parser.add_argument('--log-level', default='WARNING', help="Log level of the pipeline components")
+    parser.add_argument('--child', choices=('sklearn_model', 'engine', 'app'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        print(json.dumps(measure_startup(args.child, args.n)))
+        return
+    
+    logging.basicConfig(level=args.log_level, format="[ %(asctime)s ] %(name)s - %(levelname)s - %(message)s")
+    logger.setLevel(logging.INFO)
+    from benchmarks.run_benchmarks import git_commit
+    
+    workdir = (args.workdir or Path(tempfile.mkdtemp(prefix='book-recommender-startup-'))).resolve()
+    try:
+        workspaces = build_workspaces(workdir, args)
+        startup = {}
+        for name, (artifact_format, mode) in PATHS.items():
+            logger.info(f"Timing {args.runs} cold starts of {name}")
+            # Interleaving is unnecessary: every run is a new process, and the page cache is warm after the first
+            runs = [run_child(workspaces[artifact_format], mode, args.n) for _ in range(args.runs)]
+            startup[name] = summarize(runs)
+        
+        results = {
+            'benchmark': 'startup',
+            'commit': git_commit(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+            },
+            'scale': args.scale,
+            'startup': startup,
+        }
+        os.makedirs(args.output_dir, exist_ok=True)
+        timestamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        path = Path(args.output_dir, f"{timestamp}-{results['commit'] or 'nogit'}-startup-scale{args.scale:g}.json")
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+        
+        baseline = startup['sklearn_model']['seconds']
+        print(f"\nStartup at scale {args.scale:g} (median of {args.runs} fresh processes)")
+        print(f"  {'path':<14} {'import s':>9} {'load s':>9} {'first s':>9} {'total s':>9} {'process s':>10} "
+              f"{'RSS MB':>8} {'vs sklearn':>10}  imports")
+        for name, summary in startup.items():
+            imported = ','.join(module for module, loaded in summary['modules'].items() if loaded)
+            print(f"  {name:<14} {summary['import_seconds']:>9.3f} {summary['load_seconds']:>9.3f} "
+                  f"{summary['first_request_seconds']:>9.3f} {summary['seconds']:>9.3f} {summary['process_seconds']:>10.3f} "
+                  f"{summary.get('peak_rss_mb') or float('nan'):>8.1f} {baseline / summary['seconds']:>9.1f}x  {imported}")
+        print(f"  results: {path}")
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
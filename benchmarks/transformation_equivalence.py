@@ -0,0 +1,164 @@
+"""
+Data Transformation Equivalence Check
+Runs DataTransformation, in memory and out of core, against the merge-based implementation it
+replaced, on synthetic data, and compares their outputs, run time and peak traced memory
+
+The reference keeps the original pd.merge / groupby / drop_duplicates steps verbatim.
+final_ratings must match column for column with the same dtypes, and the matrix must match
+in labels and values. pandas < 2.2 does not keep the left row order in inner merges, so the
+rows are compared in (User-ID, Title) order and whether the order and index labels also
+match is reported on its own. The out-of-core run streams the ratings CSV in --chunk-size
+rows, and its peak includes reading them, which the other two get for free.
+
+Usage:
+    python -m benchmarks.transformation_equivalence --scale 1 --thresholds 200:50 20:10 5:3 --chunk-size 100000
+"""
+
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Callable, Tuple
+from scipy.sparse import coo_matrix
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.data_generator import generate_dataset
+from benchmarks.run_benchmarks import prepare_workspace, working_directory
+from config.configuration import ConfigurationManager
+from components.stage_00_data_ingestion import DataIngestion
+from components.stage_02_data_transformation import DataTransformation
+from entity.config_entity import DataTransformationConfig
+from entity.artifact_entity import UserBookMatrix
+
+logger = logging.getLogger(__name__)
+
+
+def merge_transform(books: pd.DataFrame, ratings: pd.DataFrame, min_user_ratings: int,
+                    min_book_ratings: int) -> Tuple[pd.DataFrame, UserBookMatrix]:
+    """The transformation as it was before integer coding, kept as the reference"""
+    user_rating_counts = ratings['User-ID'].value_counts() > min_user_ratings
+    active_users = user_rating_counts[user_rating_counts == True].index
+    filtered_ratings = ratings[ratings['User-ID'].isin(active_users)]
+    
+    ratings_with_books = pd.merge(filtered_ratings, books, on='ISBN')
+    book_rating_counts = ratings_with_books.groupby('Title')['Book-Rating'].count().reset_index()
+    book_rating_counts.rename(columns={'Book-Rating': 'Num_Ratings'}, inplace=True)
+    ratings_with_books = pd.merge(ratings_with_books, book_rating_counts, on='Title')
+    
+    final_ratings = ratings_with_books[ratings_with_books['Num_Ratings'] >= min_book_ratings]
+    final_ratings = final_ratings.drop_duplicates(['User-ID', 'Title'])
+    
+    row_codes, titles = pd.factorize(final_ratings['Title'], sort=True)
+    col_codes, user_ids = pd.factorize(final_ratings['User-ID'], sort=True)
+    matrix = coo_matrix(
+        (final_ratings['Book-Rating'].to_numpy(dtype=np.float64), (row_codes, col_codes)),
+        shape=(len(titles), len(user_ids))
+    ).tocsr()
+    matrix.eliminate_zeros()
+    return final_ratings, UserBookMatrix(
+        matrix=matrix, titles=np.asarray(titles, dtype=object), user_ids=np.asarray(user_ids)
+    )
+
+
+def measure(func: Callable, *args) -> Tuple[object, float, float]:
+    """Run func once under tracemalloc: (result, seconds, peak traced MB)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def compare_outputs(expected: Tuple[pd.DataFrame, UserBookMatrix], actual: Tuple[pd.DataFrame, UserBookMatrix]) -> dict:
+    """
+    Compare two (final_ratings, user_book_matrix) results
+    
+    Raises:
+        AssertionError: When the rows, dtypes or matrix differ
+    """
+    expected_ratings, expected_matrix = expected
+    actual_ratings, actual_matrix = actual
+    pd.testing.assert_frame_equal(
+        expected_ratings.sort_values(['User-ID', 'Title']).reset_index(drop=True),
+        actual_ratings.sort_values(['User-ID', 'Title']).reset_index(drop=True)
+    )
+    assert np.array_equal(expected_matrix.titles, actual_matrix.titles), "matrix titles differ"
+    assert np.array_equal(expected_matrix.user_ids, actual_matrix.user_ids), "matrix user ids differ"
+    assert expected_matrix.matrix.shape == actual_matrix.matrix.shape, "matrix shapes differ"
+    assert (expected_matrix.matrix != actual_matrix.matrix).nnz == 0, "matrix values differ"
+    return {
+        'rows': len(actual_ratings),
+        'same_order_and_index': expected_ratings.index.equals(actual_ratings.index) and
+                                expected_ratings.reset_index(drop=True).equals(actual_ratings.reset_index(drop=True)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check DataTransformation against the merge-based reference")
+    parser.add_argument('--scale', type=float, nargs='+', default=[1.0], help="Synthetic dataset sizes")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for the data")
+    parser.add_argument('--thresholds', nargs='+', default=['200:50', '20:10', '5:3'],
+                        help="min_user_ratings:min_book_ratings pairs to check")
+    parser.add_argument('--chunk-size', type=int, default=100_000, help="Ratings rows per chunk out of core")
+    parser.add_argument('--workdir', type=Path, help="Keep generated data here instead of a temp dir")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING, format="[ %(asctime)s ] %(name)s - %(levelname)s - %(message)s")
+    workdir = (args.workdir or Path(tempfile.mkdtemp(prefix='book-recommender-transform-'))).resolve()
+    failures = 0
+    try:
+        for scale in args.scale:
+            workspace = Path(workdir, f"scale-{scale:g}")
+            dataset = generate_dataset(Path(workspace, 'data'), scale, args.seed)
+            prepare_workspace(workspace, dataset, {})
+            with working_directory(workspace):
+                data_ingestion = DataIngestion(ConfigurationManager().get_data_ingestion_config())
+                books, _, ratings = data_ingestion.load_data()
+            
+            print(f"\nScale {scale:g}: {len(ratings)} ratings, {len(books)} books")
+            print(f"  {'thresholds':<10} {'rows':>8} {'merge s':>9} {'coded s':>9} {'speedup':>8} {'ooc s':>8} "
+                  f"{'merge MB':>9} {'coded MB':>9} {'ooc MB':>8}  result")
+            for pair in args.thresholds:
+                min_user, min_book = (int(value) for value in pair.split(':'))
+                config = DataTransformationConfig(
+                    root_dir=workspace, min_user_ratings=min_user, min_book_ratings=min_book
+                )
+                expected, merge_seconds, merge_mb = measure(merge_transform, books, ratings, min_user, min_book)
+                actual, coded_seconds, coded_mb = measure(DataTransformation(config).transform_data, books, ratings)
+                with working_directory(workspace):
+                    streamed, ooc_seconds, ooc_mb = measure(
+                        DataTransformation(config).transform_chunks, books,
+                        lambda: data_ingestion.iter_ratings(args.chunk_size)
+                    )
+                try:
+                    comparison = compare_outputs(expected, actual)
+                    result = 'identical' if comparison['same_order_and_index'] else 'identical rows, different order'
+                    # Both code paths label rows the same way, so out of core must match in order too
+                    if not compare_outputs(actual, streamed)['same_order_and_index']:
+                        raise AssertionError("out-of-core rows differ in order or index")
+                except AssertionError as e:
+                    failures += 1
+                    comparison, result = {'rows': len(actual[0])}, f"MISMATCH: {str(e).splitlines()[0]}"
+                print(f"  {pair:<10} {comparison['rows']:>8} {merge_seconds:>9.3f} {coded_seconds:>9.3f} "
+                      f"{merge_seconds / coded_seconds:>7.1f}x {ooc_seconds:>8.3f} {merge_mb:>9.1f} {coded_mb:>9.1f} "
+                      f"{ooc_mb:>8.1f}  {result}")
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Approximate Nearest Neighbor Index
+IVF-style coarse quantizer over L2-normalized book vectors, implemented with numpy/scipy only
+"""
+
+import logging
+import numpy as np
+from typing import Optional, Tuple
+from scipy.sparse import csr_matrix, diags
+
+logger = logging.getLogger(__name__)
+
+# Storage precisions of the item vectors shipped in the artifact bundle
+VECTOR_DTYPES = ('float32', 'float16', 'int8')
+
+
+def normalize_rows(matrix: csr_matrix) -> csr_matrix:
+    """Scale every row to unit L2 norm so cosine similarity becomes a dot product (zero rows stay zero)"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    inverse_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return csr_matrix(diags(inverse_norms) @ matrix)
+
+
+def _inverse_row_norms(data: np.ndarray, indptr: np.ndarray) -> np.ndarray:
+    """One over the L2 norm of every CSR row, accumulated in float64 (zero for empty rows)"""
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    norms = np.sqrt(np.bincount(rows, weights=np.square(data, dtype=np.float64), minlength=len(indptr) - 1))
+    return np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+
+def quantize_vectors(matrix: csr_matrix, dtype: str = 'float32') -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    L2-normalize the rows of matrix and store their values in a reduced precision
+    
+    Only the data array changes: the vectors keep the sparsity pattern of matrix, so they
+    share its indices and indptr. int8 scales every row by its largest magnitude to ±127
+    and returns the per-row scales needed to undo it.
+    
+    Args:
+        matrix: Books × users ratings matrix
+        dtype: 'float32', 'float16' or 'int8'
+    
+    Returns:
+        Tuple of (data array in dtype, float32 row scales for int8 or None)
+    """
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(f"Unknown vector dtype: {dtype}")
+    row_lengths = np.diff(matrix.indptr)
+    data = matrix.data * np.repeat(_inverse_row_norms(matrix.data, matrix.indptr), row_lengths)
+    if dtype != 'int8':
+        return data.astype(dtype), None
+    
+    row_max = np.zeros(matrix.shape[0])
+    nonempty = row_lengths > 0
+    row_max[nonempty] = np.maximum.reduceat(np.abs(data), matrix.indptr[:-1][nonempty])
+    scales = (row_max / 127).astype(np.float32)
+    inverse_scales = np.divide(1.0, scales, out=np.zeros(len(scales)), where=scales > 0)
+    return np.rint(data * np.repeat(inverse_scales, row_lengths)).astype(np.int8), scales
+
+
+def dequantize_vectors(data: np.ndarray, indices: np.ndarray, indptr: np.ndarray, shape: Tuple[int, int],
+                       scales: Optional[np.ndarray] = None) -> csr_matrix:
+    """
+    Float32 unit-norm CSR vectors from quantize_vectors output, ready for dot-product cosine
+    
+    float32 data is wrapped without a copy, so memory-mapped vectors stay shared between
+    processes. float16 and int8 data are widened into a private float32 array, and int8 rows
+    are renormalized so their dot products are exact cosines of the rounded vectors.
+    """
+    if data.dtype == np.float32:
+        return csr_matrix((data, indices, indptr), shape=shape, copy=False)
+    
+    values = data.astype(np.float32)
+    if scales is not None:
+        row_lengths = np.diff(indptr)
+        values *= np.repeat(scales, row_lengths)
+        values *= np.repeat(_inverse_row_norms(values, indptr).astype(np.float32), row_lengths)
+    return csr_matrix((values, indices, indptr), shape=shape, copy=False)
+
+
+def top_k(similarities: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Column positions and values of the k largest entries per row, sorted descending"""
+    k = min(k, similarities.shape[1])
+    candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    candidate_sims = np.take_along_axis(similarities, candidates, axis=1)
+    order = np.argsort(-candidate_sims, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_sims, order, axis=1)
+
+
+class IVFIndex:
+    """
+    Inverted-file index for cosine nearest neighbors
+    
+    Books are clustered with spherical k-means into n_lists cells. A query only
+    scores the books in its n_probe closest cells, so raising n_probe trades speed for recall.
+    """
+    
+    def __init__(self, n_lists: Optional[int] = None, n_probe: int = 8, n_iter: int = 10,
+                 block_size: int = 4096, random_state: int = 42):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.block_size = block_size
+        self.random_state = random_state
+
+    def fit(self, matrix: csr_matrix) -> "IVFIndex":
+        """
+        Cluster the rows of matrix and build the inverted lists
+        
+        Args:
+            matrix: Books × users ratings matrix (normalized internally)
+        
+        Returns:
+            self
+        """
+        rng = np.random.default_rng(self.random_state)
+        self.vectors_ = normalize_rows(matrix).astype(np.float32)
+        n_rows = self.vectors_.shape[0]
+        n_lists = self.n_lists or max(1, int(np.sqrt(n_rows)))
+        n_lists = min(n_lists, n_rows)
+        
+        centroids = self.vectors_[rng.choice(n_rows, n_lists, replace=False)].toarray()
+        for iteration in range(self.n_iter):
+            assignments = self._nearest_centroids(self.vectors_, centroids, 1)[:, 0]
+            membership = csr_matrix(
+                (np.ones(n_rows, dtype=np.float32), (assignments, np.arange(n_rows))),
+                shape=(n_lists, n_rows)
+            )
+            sums = np.asarray((membership @ self.vectors_).todense())
+            norms = np.linalg.norm(sums, axis=1)
+            empty = norms == 0
+            # Re-seed empty cells with random books so every list stays in use
+            if empty.any():
+                sums[empty] = self.vectors_[rng.choice(n_rows, int(empty.sum()), replace=False)].toarray()
+                norms[empty] = 1.0
+            centroids = sums / norms[:, None]
+        
+        self.centroids_ = centroids.astype(np.float32)
+        assignments = self._nearest_centroids(self.vectors_, self.centroids_, 1)[:, 0]
+        self.list_order_ = np.argsort(assignments, kind='stable').astype(np.int32)
+        self.list_offsets_ = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=n_lists))))
+        
+        logger.info(f"IVF index built: {n_rows} vectors in {n_lists} lists, n_probe={self.n_probe}")
+        return self
+
+    def _nearest_centroids(self, vectors: csr_matrix, centroids: np.ndarray, n: int) -> np.ndarray:
+        """Indices of the n most similar centroids per row, computed in row blocks"""
+        n = min(n, centroids.shape[0])
+        result = np.empty((vectors.shape[0], n), dtype=np.int64)
+        for start in range(0, vectors.shape[0], self.block_size):
+            block_sims = np.asarray(vectors[start:start + self.block_size] @ centroids.T)
+            result[start:start + self.block_size] = top_k(block_sims, n)[0]
+        return result
+
+    def kneighbors(self, queries: csr_matrix, n_neighbors: int,
+                   query_ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate cosine neighbors of each query row
+        
+        Work is grouped by inverted list: every list is scored once against all
+        queries probing it with a single sparse product, then merged into a running top-k.
+        
+        Args:
+            queries: Query rows in the same user space (normalized internally)
+            n_neighbors: Number of neighbors to return per query
+            query_ids: Index of each query in the fitted matrix, excluded from its own results
+        
+        Returns:
+            Tuple of (distances float32, indices int32), both of shape (n_queries, n_neighbors),
+            padded with index -1 and distance inf when fewer candidates were probed
+        """
+        queries = normalize_rows(queries).astype(np.float32)
+        n_queries = queries.shape[0]
+        best_sims = np.full((n_queries, n_neighbors), -np.inf, dtype=np.float32)
+        best_ids = np.full((n_queries, n_neighbors), -1, dtype=np.int32)
+        
+        probes = self._nearest_centroids(queries, self.centroids_, self.n_probe)
+        probed_lists = probes.ravel()
+        probing_queries = np.repeat(np.arange(n_queries), probes.shape[1])
+        order = np.argsort(probed_lists, kind='stable')
+        probed_lists, probing_queries = probed_lists[order], probing_queries[order]
+        boundaries = np.searchsorted(probed_lists, np.arange(len(self.list_offsets_)))
+        
+        for list_id in range(len(self.list_offsets_) - 1):
+            query_rows = probing_queries[boundaries[list_id]:boundaries[list_id + 1]]
+            members = self.list_order_[self.list_offsets_[list_id]:self.list_offsets_[list_id + 1]]
+            if len(query_rows) == 0 or len(members) == 0:
+                continue
+            
+            sims = np.asarray((queries[query_rows] @ self.vectors_[members].T).todense(), dtype=np.float32)
+            if query_ids is not None:
+                sims[query_ids[query_rows][:, None] == members[None, :]] = -np.inf
+            
+            merged_sims = np.hstack([best_sims[query_rows], sims])
+            merged_ids = np.hstack([best_ids[query_rows], np.broadcast_to(members, sims.shape)])
+            positions, best_sims[query_rows] = top_k(merged_sims, n_neighbors)
+            best_ids[query_rows] = np.take_along_axis(merged_ids, positions, axis=1)
+        
+        best_ids[np.isneginf(best_sims)] = -1
+        return (1.0 - best_sims).astype(np.float32), best_ids
+
+
+def exact_kneighbors(vectors: csr_matrix, queries: csr_matrix, n_neighbors: int,
+                     query_ids: Optional[np.ndarray] = None, block_size: int = 1024,
+                     normalized: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Brute-force cosine neighbors in row blocks, also the ground truth for recall reports
+    
+    Args:
+        normalized: Skip normalization when vectors and queries already have unit rows
+    
+    Returns:
+        Tuple of (distances float32, indices int32), both of shape (n_queries, n_neighbors)
+    """
+    if not normalized:
+        vectors = normalize_rows(vectors).astype(np.float32)
+        queries = normalize_rows(queries).astype(np.float32)
+    distances = np.empty((queries.shape[0], n_neighbors), dtype=np.float32)
+    indices = np.empty((queries.shape[0], n_neighbors), dtype=np.int32)
+    
+    for start in range(0, queries.shape[0], block_size):
+        sims = np.asarray((queries[start:start + block_size] @ vectors.T).todense(), dtype=np.float32)
+        if query_ids is not None:
+            block_ids = query_ids[start:start + block_size]
+            sims[np.arange(len(block_ids)), block_ids] = -np.inf
+        block_indices, block_sims = top_k(sims, n_neighbors)
+        indices[start:start + block_size] = block_indices
+        distances[start:start + block_size] = 1.0 - block_sims
+    return distances, indices
+
+
+def ranking_agreement(reference: csr_matrix, candidate: csr_matrix, query_ids: np.ndarray, n_neighbors: int,
+                      block_size: int = 256) -> dict:
+    """
+    How closely neighbor lists from candidate vectors follow those of reference vectors
+    
+    Both matrices hold the same books with L2-normalized rows, e.g. float64 and a reduced
+    precision copy. Ratings are small integers, so many books tie on similarity; besides the
+    plain overlap of the two top-K lists, a candidate neighbor also counts as correct when
+    its reference similarity reaches the reference K-th best (tie-aware recall).
+    
+    Args:
+        reference: Ground-truth vectors, normally float64
+        candidate: Vectors under test
+        query_ids: Rows used as queries, excluded from their own results
+        n_neighbors: K
+    
+    Returns:
+        Dict with recall_at_k, tie_aware_recall_at_k, top1_agreement and max_similarity_error
+    """
+    k = min(n_neighbors, reference.shape[0] - 1)
+    overlap = tie_aware = top1 = 0.0
+    max_error = 0.0
+    for start in range(0, len(query_ids), block_size):
+        block_ids = query_ids[start:start + block_size]
+        rows = np.arange(len(block_ids))
+        reference_sims = np.asarray((reference[block_ids] @ reference.T).todense(), dtype=np.float64)
+        candidate_sims = np.asarray((candidate[block_ids] @ candidate.T).todense(), dtype=np.float64)
+        max_error = max(max_error, float(np.abs(candidate_sims - reference_sims).max()))
+        reference_sims[rows, block_ids] = -np.inf
+        candidate_sims[rows, block_ids] = -np.inf
+        
+        reference_top, reference_best = top_k(reference_sims, k)
+        candidate_top, _ = top_k(candidate_sims, k)
+        overlap += sum(len(np.intersect1d(a, b)) for a, b in zip(reference_top, candidate_top)) / k
+        kth_best = reference_best[:, -1:] - 1e-9
+        tie_aware += float((np.take_along_axis(reference_sims, candidate_top, axis=1) >= kth_best).mean(axis=1).sum())
+        top1 += float((reference_sims[rows, candidate_top[:, 0]] >= reference_best[:, 0] - 1e-9).sum())
+    
+    n_queries = max(len(query_ids), 1)
+    return {
+        f'recall_at_{k}': round(overlap / n_queries, 4),
+        f'tie_aware_recall_at_{k}': round(tie_aware / n_queries, 4),
+        'top1_agreement': round(top1 / n_queries, 4),
+        'max_similarity_error': float(f"{max_error:.3g}"),
+    }
+
+
+def profile_kneighbors(vectors: csr_matrix, item_ids: np.ndarray, weights: np.ndarray,
+                       n_neighbors: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Books closest to a weighted set of books, e.g. a reader's history
+    
+    Scores every book by its weighted mean cosine similarity to the set with two sparse
+    matrix-vector products, V @ (V[set]ᵀ @ w), so the cost is one pass over the matrix
+    however many books the set holds. Books in the set are never returned.
+    
+    Args:
+        vectors: Books × users matrix with L2-normalized rows
+        item_ids: Rows of the books in the set
+        weights: Weight of each book in the set, e.g. its rating
+        n_neighbors: Books to return
+    
+    Returns:
+        Tuple of (distances float32, indices int32), one minus the weighted mean similarity, best first
+    
+    Raises:
+        ValueError: If a weight is not finite or the weights do not sum to more than zero
+    """
+    weights = np.asarray(weights, dtype=np.float32)
+    total_weight = float(weights.sum())
+    if not np.all(np.isfinite(weights)) or not total_weight > 0:
+        raise ValueError("Profile weights must be finite and sum to more than zero")
+    profile = vectors[item_ids].T @ (weights / total_weight)
+    scores = np.asarray(vectors @ profile, dtype=np.float32).ravel()
+    scores[item_ids] = -np.inf
+    
+    n_neighbors = min(n_neighbors, vectors.shape[0] - len(np.unique(item_ids)))
+    if n_neighbors <= 0:
+        return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int32)
+    indices, sims = top_k(scores[np.newaxis, :], n_neighbors)
+    return 1.0 - sims[0], indices[0].astype(np.int32)
+
+
+def recall_at_k(approximate: np.ndarray, exact: np.ndarray) -> float:
+    """Mean fraction of the exact top-k neighbors that the approximate search also returned"""
+    hits = [len(np.intersect1d(a[a >= 0], e)) for a, e in zip(approximate, exact)]
+    return float(np.mean(hits) / exact.shape[1])
@@ -0,0 +1,280 @@
+"""
+Offline Evaluation Component
+Holds out ratings and sweeps min_user_ratings / min_book_ratings / n_neighbors across a process pool,
+scoring each setting by recall@K, NDCG@K and catalog coverage next to its matrix size and latency
+"""
+
+import os
+import time
+import logging
+import itertools
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse import coo_matrix, csr_matrix
+from entity.config_entity import EvaluationConfig
+from components.stage_02_data_transformation import join_books, first_pairs
+from components.ann_index import normalize_rows, exact_kneighbors, top_k
+from utils.util import save_json
+
+logger = logging.getLogger(__name__)
+
+SHARED_ARRAYS = ('user_ids', 'title_codes', 'ratings', 'user_counts', 'holdout')
+# Users scored per dense block when ranking recommendations
+USER_BLOCK_SIZE = 1024
+
+# Memory-mapped ratings shared with pool workers through the initializer
+_worker_state = {}
+
+
+def _init_evaluation_worker(shared_dir: Path, k: int, max_users: int, seed: int):
+    """Pool initializer: map the shared rating arrays once per worker instead of pickling them per task"""
+    _worker_state.update(
+        {name: np.load(Path(shared_dir, f"{name}.npy"), mmap_mode='r') for name in SHARED_ARRAYS},
+        k=k, max_users=max_users, seed=seed
+    )
+
+
+def _positions(sorted_values: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions of values in a sorted unique array, and whether each value is present"""
+    positions = np.minimum(np.searchsorted(sorted_values, values), len(sorted_values) - 1)
+    return positions, sorted_values[positions] == values
+
+
+def _evaluate_thresholds(task: Tuple[int, int, Tuple[int, ...]]) -> List[dict]:
+    """
+    Filter, split and score one (min_user_ratings, min_book_ratings) pair for every n_neighbors
+    
+    The training side is filtered as DataTransformation would filter the ratings that are
+    not held out: users with more than min_user_ratings of them, titles with at least
+    min_book_ratings of them from those users, first rating per (user, title), implicit
+    zero ratings dropped from the matrix. Held-out ratings never count towards a threshold;
+    they are scored if their user and title pass and the pair is not already in training.
+    """
+    min_user_ratings, min_book_ratings, n_neighbors_grid = task
+    state = _worker_state
+    user_ids, title_codes, holdout = state['user_ids'], state['title_codes'], state['holdout']
+    
+    active = state['user_counts'] > min_user_ratings
+    title_counts = np.bincount(title_codes[active & ~holdout], minlength=int(title_codes.max()) + 1)
+    eligible = active & (title_counts[title_codes] >= min_book_ratings)
+    train_pairs = first_pairs(np.flatnonzero(eligible & ~holdout), user_ids, title_codes, len(title_counts))
+    test = first_pairs(np.flatnonzero(eligible & holdout), user_ids, title_codes, len(title_counts))
+    
+    def pair_keys(rows: np.ndarray) -> np.ndarray:
+        return user_ids[rows].astype(np.int64) * len(title_counts) + title_codes[rows]
+    
+    test = test[~np.isin(pair_keys(test), pair_keys(train_pairs))]
+    train = train_pairs[state['ratings'][train_pairs] > 0]
+    
+    base = {'min_user_ratings': min_user_ratings, 'min_book_ratings': min_book_ratings}
+    if len(train) == 0 or len(test) == 0:
+        return [dict(base, n_neighbors=n, error='no ratings left after filtering') for n in n_neighbors_grid]
+    
+    item_codes, train_items = np.unique(title_codes[train], return_inverse=True)
+    user_codes, train_users = np.unique(user_ids[train], return_inverse=True)
+    train_matrix = coo_matrix(
+        (state['ratings'][train].astype(np.float32), (train_items, train_users)),
+        shape=(len(item_codes), len(user_codes))
+    ).tocsr()
+    
+    # Held-out ratings count only for users and books the model has seen
+    test_items, known_items = _positions(item_codes, title_codes[test])
+    test_users, known_users = _positions(user_codes, user_ids[test])
+    known = known_items & known_users
+    eval_users = np.unique(test_users[known])
+    if len(eval_users) > state['max_users']:
+        eval_users = np.sort(np.random.default_rng(state['seed']).choice(eval_users, state['max_users'], replace=False))
+    
+    history = train_matrix.T.tocsr()[eval_users]
+    relevant = csr_matrix(
+        (np.ones(int(known.sum()), dtype=bool), (test_users[known], test_items[known])),
+        shape=(len(user_codes), len(item_codes))
+    )[eval_users]
+    
+    started = time.perf_counter()
+    vectors = normalize_rows(train_matrix).astype(np.float32)
+    max_neighbors = min(max(n_neighbors_grid), len(item_codes) - 1)
+    distances, indices = exact_kneighbors(
+        vectors, vectors, max_neighbors, query_ids=np.arange(len(item_codes)), normalized=True
+    )
+    neighbor_seconds = time.perf_counter() - started
+    
+    results = []
+    for n_neighbors in n_neighbors_grid:
+        n = min(n_neighbors, max_neighbors)
+        neighbors = csr_matrix(
+            ((1.0 - distances[:, :n]).ravel(), indices[:, :n].ravel(), np.arange(0, len(item_codes) * n + 1, n)),
+            shape=(len(item_codes), len(item_codes))
+        )
+        metrics, scoring_seconds = _score_users(history, relevant, neighbors, state['k'])
+        results.append(dict(
+            base,
+            n_neighbors=n_neighbors,
+            n_books=int(train_matrix.shape[0]),
+            n_users=int(train_matrix.shape[1]),
+            nnz=int(train_matrix.nnz),
+            matrix_mb=round((train_matrix.data.nbytes + train_matrix.indices.nbytes + train_matrix.indptr.nbytes) / 2**20, 3),
+            eval_users=int(len(eval_users)),
+            test_ratings=int(relevant.nnz),
+            **metrics,
+            neighbor_table_seconds=round(neighbor_seconds, 4),
+            ms_per_user=round(scoring_seconds * 1000 / max(len(eval_users), 1), 4),
+        ))
+    return results
+
+
+def _score_users(history: csr_matrix, relevant: csr_matrix, neighbors: csr_matrix, k: int) -> Tuple[dict, float]:
+    """
+    Rank top-K books for every evaluated user and compare them with the held-out ratings
+    
+    A book's score is the rating-weighted sum of its similarities to the user's books,
+    counting only similarities inside each book's n_neighbors list, like the served table.
+    
+    Returns:
+        Tuple of (recall/NDCG/coverage metrics, seconds spent scoring)
+    """
+    n_users, n_items = history.shape
+    top = min(k, n_items)
+    discounts = 1.0 / np.log2(np.arange(2, top + 2))
+    ideal = np.cumsum(discounts)
+    recall_sum = ndcg_sum = 0.0
+    recommended = np.zeros(n_items, dtype=bool)
+    
+    started = time.perf_counter()
+    for start in range(0, n_users, USER_BLOCK_SIZE):
+        block_history = history[start:start + USER_BLOCK_SIZE]
+        scores = np.asarray((block_history @ neighbors).todense(), dtype=np.float32)
+        rows = np.repeat(np.arange(block_history.shape[0]), np.diff(block_history.indptr))
+        scores[rows, block_history.indices] = -np.inf
+        top_items, _ = top_k(scores, top)
+        recommended[top_items.ravel()] = True
+        
+        block_relevant = relevant[start:start + USER_BLOCK_SIZE]
+        hits = np.asarray(block_relevant[np.arange(len(top_items))[:, np.newaxis], top_items].todense(), dtype=bool)
+        n_relevant = np.diff(block_relevant.indptr)
+        recall_sum += float((hits.sum(axis=1) / n_relevant).sum())
+        ndcg_sum += float(((hits * discounts).sum(axis=1) / ideal[np.minimum(n_relevant, top) - 1]).sum())
+    seconds = time.perf_counter() - started
+    
+    return {
+        f"recall_at_{k}": round(recall_sum / n_users, 4),
+        f"ndcg_at_{k}": round(ndcg_sum / n_users, 4),
+        'catalog_coverage': round(float(recommended.mean()), 4),
+    }, seconds
+
+
+class ModelEvaluator:
+    """
+    Offline quality sweep over the training thresholds and neighborhood size
+    
+    Ratings are joined to titles once, as integer codes, and written as .npy files that every
+    pool worker memory-maps, so each task costs only its own filtering and scoring. One
+    holdout split is drawn up front and shared by every setting, so scores are comparable.
+    """
+
+    def __init__(self, config: EvaluationConfig):
+        self.config = config
+
+    def prepare_shared_arrays(self, books: pd.DataFrame, ratings: pd.DataFrame) -> Path:
+        """
+        Join ratings to title codes and draw the holdout split
+        
+        The split is drawn per rating, so every books row a duplicated ISBN joins is held
+        out together, and user_counts counts only the ratings left for training.
+        
+        Returns:
+            Directory holding the shared arrays
+        """
+        title_codes, _ = pd.factorize(books['Title'], sort=True)
+        rating_rows, book_rows = join_books(ratings['ISBN'], books['ISBN'], np.arange(len(ratings)))
+        user_ids = ratings['User-ID'].to_numpy(dtype=np.int64)
+        all_ratings = ratings['Book-Rating'].to_numpy(dtype=np.int8)
+        
+        titled = title_codes[book_rows] >= 0
+        rating_rows, book_rows = rating_rows[titled], book_rows[titled]
+        # Only explicit ratings of titled books are held out; implicit zeros never enter the matrix
+        rng = np.random.default_rng(self.config.seed)
+        held_out = np.zeros(len(ratings), dtype=bool)
+        held_out[rating_rows] = True
+        held_out &= (all_ratings > 0) & (rng.random(len(ratings)) < self.config.holdout_fraction)
+        known_users, user_counts = np.unique(user_ids[~held_out], return_counts=True)
+        
+        joined_ratings = all_ratings[rating_rows]
+        joined_users = user_ids[rating_rows]
+        positions, known = _positions(known_users, joined_users)
+        arrays = {
+            'user_ids': joined_users,
+            'title_codes': title_codes[book_rows].astype(np.int32),
+            'ratings': joined_ratings,
+            'user_counts': np.where(known, user_counts[positions], 0),
+            'holdout': held_out[rating_rows],
+        }
+        
+        shared_dir = Path(self.config.root_dir, 'shared')
+        os.makedirs(shared_dir, exist_ok=True)
+        for name in SHARED_ARRAYS:
+            np.save(Path(shared_dir, f"{name}.npy"), arrays[name])
+        logger.info(f"Shared {len(joined_ratings)} joined ratings ({int(arrays['holdout'].sum())} held out) in {shared_dir}")
+        return shared_dir
+
+    def evaluate(self, books: pd.DataFrame, ratings: pd.DataFrame) -> pd.DataFrame:
+        """
+        Run the sweep and save it as CSV and JSON
+        
+        Args:
+            books: Books DataFrame from data ingestion
+            ratings: Ratings DataFrame from data ingestion
+        
+        Returns:
+            One row per (min_user_ratings, min_book_ratings, n_neighbors) setting
+        """
+        try:
+            started = time.perf_counter()
+            shared_dir = self.prepare_shared_arrays(books, ratings)
+            n_neighbors_grid = tuple(sorted(self.config.n_neighbors))
+            tasks = [
+                (min_user, min_book, n_neighbors_grid)
+                for min_user, min_book in itertools.product(self.config.min_user_ratings, self.config.min_book_ratings)
+            ]
+            init_args = (shared_dir, self.config.k, self.config.max_users, self.config.seed)
+            
+            logger.info(f"Evaluating {len(tasks)} threshold pairs × {len(n_neighbors_grid)} neighbor sizes "
+                        f"on {self.config.workers} worker(s)...")
+            rows = []
+            if self.config.workers == 1:
+                _init_evaluation_worker(*init_args)
+                for task in tasks:
+                    rows.extend(_evaluate_thresholds(task))
+            else:
+                with ProcessPoolExecutor(
+                    max_workers=self.config.workers, initializer=_init_evaluation_worker, initargs=init_args
+                ) as executor:
+                    for task_rows in executor.map(_evaluate_thresholds, tasks):
+                        rows.extend(task_rows)
+            
+            results = pd.DataFrame(rows)
+            results.to_csv(Path(self.config.root_dir, 'evaluation_results.csv'), index=False)
+            save_json(
+                {
+                    'settings': {
+                        'holdout_fraction': self.config.holdout_fraction,
+                        'k': self.config.k,
+                        'seed': self.config.seed,
+                        'max_users': self.config.max_users,
+                        'workers': self.config.workers,
+                    },
+                    'seconds': round(time.perf_counter() - started, 4),
+                    'results': results.to_dict(orient='records'),
+                },
+                Path(self.config.root_dir, 'evaluation_report.json')
+            )
+            logger.info(f"Evaluation results:\n{results.to_string(index=False)}")
+            logger.info(f"Evaluation saved in {self.config.root_dir} ({time.perf_counter() - started:.1f}s)")
+            return results
+        
+        except Exception as e:
+            logger.error(f"Error in evaluation: {e}")
+            raise e
@@ -0,0 +1,674 @@
+"""
+Incremental Update Component
+Applies a delta of new ratings to the trained artifacts without rerunning the full pipeline
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from datetime import datetime, timezone
+from scipy.sparse import coo_matrix, csr_matrix
+from entity.config_entity import IncrementalUpdateConfig
+from components.stage_00_data_ingestion import RATINGS_DTYPES
+from components.stage_02_data_transformation import join_books, join_codes, first_pairs
+from components.stage_03_model_trainer import add_matrix_arrays, model_bundle_manifest
+from components.title_search import TitleSearchIndex
+from components.ann_index import normalize_rows, exact_kneighbors, top_k
+from utils.util import file_sha256, save_json
+from utils.artifact_bundle import (
+    MANIFEST_FILE, PackedStrings, add_strings, get_strings, take_strings, concat_strings, get_csr,
+    save_bundle, load_bundle, publish_bundle, resolve_bundle_dir
+)
+
+logger = logging.getLogger(__name__)
+
+SEGMENTS_DIR = 'segments'
+JOINED_ARRAYS = ('joined_user_ids', 'joined_book_rows', 'joined_ratings')
+BOOK_STRING_COLUMNS = {
+    'book_isbns': 'ISBN',
+    'book_authors': 'Author',
+    'book_years': 'Year',
+    'book_publishers': 'Publisher',
+    'book_image_urls': 'Image-URL',
+}
+# Per-book bundle strings and the state's books column they are taken from
+METADATA_STRINGS = {
+    'authors': 'book_authors',
+    'years': 'book_years',
+    'publishers': 'book_publishers',
+    'image_urls': 'book_image_urls',
+}
+SEARCH_ARRAYS = ('search_keys_offsets', 'search_keys_data', 'search_title_ids', 'search_title_starts')
+
+
+def _lookup_counts(ids: np.ndarray, counts: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    """Counts for query ids from sorted (ids, counts) arrays, 0 for unknown ids"""
+    if len(ids) == 0:
+        return np.zeros(len(queries), dtype=np.int64)
+    positions = np.minimum(np.searchsorted(ids, queries), len(ids) - 1)
+    return np.where(ids[positions] == queries, counts[positions], 0).astype(np.int64)
+
+
+def _ranges(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """Concatenation of np.arange(start, stop) for every (start, stop) pair"""
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(stops, dtype=np.int64) - starts
+    return np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum(), dtype=np.int64)
+
+
+def _pair_keys(user_ids: np.ndarray, title_codes: np.ndarray, n_titles: int) -> np.ndarray:
+    """One int64 key per (user, title) pair"""
+    return user_ids.astype(np.int64) * n_titles + title_codes
+
+
+class IncrementalState:
+    """
+    The incremental state on disk: the arrays of the last full run plus one segment per applied delta
+    
+    The base holds every titled rating that joins the books table, in file order, with
+    permutations that group them by user and by title, per-user and per-title counts, the
+    keys of the (user, title) pairs in the matrix and an ISBN hash index of the books.
+    Each delta is appended as a small segment holding its own joined ratings and its
+    changes to the counts and kept pairs, so applying a delta never rewrites the base.
+    Every lookup adds the segments on top of the base; the next full run writes a new
+    base without segments.
+    """
+
+    def __init__(self, state_dir: Path):
+        self.arrays, self.manifest = load_bundle(state_dir, mmap_mode='r')
+        self.segments = [
+            load_bundle(Path(state_dir, SEGMENTS_DIR, name), mmap_mode='r')[0] for name in self.manifest['segments']
+        ]
+        self.n_base = len(self.arrays['joined_user_ids'])
+        self.n_titles = len(self.arrays['title_counts'])
+        # Joined ratings of the applied deltas, held in memory since they are small next to the base
+        self.tail = {
+            name: np.concatenate([self.arrays[name][:0]] + [segment[name] for segment in self.segments])
+            for name in JOINED_ARRAYS
+        }
+
+    @property
+    def n_rows(self) -> int:
+        return self.n_base + len(self.tail['joined_user_ids'])
+
+    @property
+    def matrix_title_codes(self) -> np.ndarray:
+        """Title code of every matrix row"""
+        for segment in reversed(self.segments):
+            if 'matrix_title_codes' in segment:
+                return segment['matrix_title_codes']
+        return self.arrays['matrix_title_codes']
+
+    def join_isbns(self, isbns: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        join_books of ratings ISBNs with the catalog, through the ISBN hash index
+        
+        Only the books rows whose ISBN hash matches a rating are read, so the catalog is never decoded.
+        
+        Returns:
+            Tuple of (ratings row, books row) per joined row, in ratings order
+        """
+        codes = isbns.astype('category').cat
+        categories = codes.categories.to_numpy(dtype=object)
+        hashes = pd.util.hash_array(categories)
+        index_hashes = self.arrays['isbn_hashes']
+        starts = np.searchsorted(index_hashes, hashes, side='left')
+        stops = np.searchsorted(index_hashes, hashes, side='right')
+        matches = _ranges(starts, stops)
+        match_codes = np.repeat(np.arange(len(categories)), stops - starts)
+        book_rows = np.asarray(self.arrays['isbn_book_rows'][matches], dtype=np.int64)
+        
+        # Hashes can collide, so every match is confirmed on the ISBN itself
+        catalog_isbns = get_strings(self.arrays, 'book_isbns')
+        confirmed = np.array(
+            [catalog_isbns[row] == str(categories[code]) for row, code in zip(book_rows, match_codes)], dtype=bool
+        )
+        book_rows, match_codes = book_rows[confirmed], match_codes[confirmed]
+        order = np.argsort(book_rows, kind='stable')
+        rating_rows, matched = join_codes(
+            codes.codes.to_numpy(), match_codes[order], len(categories), np.arange(len(isbns))
+        )
+        return rating_rows, book_rows[order][matched]
+
+    def append(self, user_ids: np.ndarray, book_rows: np.ndarray, ratings: np.ndarray) -> np.ndarray:
+        """Add joined delta ratings after the stored ones and return their positions"""
+        positions = np.arange(self.n_rows, self.n_rows + len(user_ids))
+        for name, values in zip(JOINED_ARRAYS, (user_ids, book_rows, ratings)):
+            self.tail[name] = np.concatenate([self.tail[name], values.astype(self.tail[name].dtype)])
+        return positions
+
+    def gather(self, positions: np.ndarray) -> Dict[str, np.ndarray]:
+        """User id, books row, rating and title code of the joined ratings at sorted positions"""
+        split = np.searchsorted(positions, self.n_base)
+        rows = {
+            name: np.concatenate([self.arrays[name][positions[:split]], self.tail[name][positions[split:] - self.n_base]])
+            for name in JOINED_ARRAYS
+        }
+        rows['titles'] = self.arrays['book_title_codes'][rows['joined_book_rows']]
+        return rows
+
+    def user_counts(self, user_ids: np.ndarray) -> np.ndarray:
+        """Raw rating count of every user id"""
+        counts = _lookup_counts(self.arrays['count_user_ids'], self.arrays['user_counts'], user_ids)
+        for segment in self.segments:
+            counts += _lookup_counts(segment['count_user_ids'], segment['user_counts'], user_ids)
+        return counts
+
+    def title_counts(self, title_codes: np.ndarray) -> np.ndarray:
+        """Ratings of active users per title code"""
+        counts = np.asarray(self.arrays['title_counts'][title_codes], dtype=np.int64)
+        for segment in self.segments:
+            counts += _lookup_counts(segment['title_codes'], segment['title_counts'], title_codes)
+        return counts
+
+    def rows_of_users(self, user_ids: np.ndarray) -> np.ndarray:
+        """Sorted positions of every joined rating of the given sorted, distinct user ids"""
+        known_users = self.arrays['count_user_ids']
+        index = np.minimum(np.searchsorted(known_users, user_ids), len(known_users) - 1)
+        index = index[known_users[index] == user_ids]
+        starts = self.arrays['user_row_starts']
+        base = self.arrays['user_row_order'][_ranges(starts[index], starts[index + 1])]
+        tail = np.flatnonzero(np.isin(self.tail['joined_user_ids'], user_ids)) + self.n_base
+        return np.sort(np.concatenate([base, tail]))
+
+    def rows_of_titles(self, title_codes: np.ndarray) -> np.ndarray:
+        """Sorted positions of every joined rating of the given title codes"""
+        starts = self.arrays['title_row_starts']
+        base = self.arrays['title_row_order'][_ranges(starts[title_codes], starts[title_codes + 1])]
+        tail_titles = self.arrays['book_title_codes'][self.tail['joined_book_rows']]
+        tail = np.flatnonzero(np.isin(tail_titles, title_codes)) + self.n_base
+        return np.sort(np.concatenate([base, tail]))
+
+    def is_kept(self, pair_keys: np.ndarray) -> np.ndarray:
+        """Whether each (user, title) key already has a rating in the matrix"""
+        kept = np.zeros(len(pair_keys), dtype=bool)
+        for keys in [self.arrays['kept_pair_keys']] + [segment['kept_pair_keys'] for segment in self.segments]:
+            if len(keys):
+                positions = np.minimum(np.searchsorted(keys, pair_keys), len(keys) - 1)
+                kept |= keys[positions] == pair_keys
+        return kept
+
+    def first_kept_positions(self, title_codes: np.ndarray) -> np.ndarray:
+        """Position of each title's first rating in the matrix, -1 for titles not in it"""
+        positions = np.array(self.arrays['first_kept_positions'][title_codes], dtype=np.int64)
+        for segment in self.segments:
+            # Segments store position + 1 through _lookup_counts, so 0 means no change
+            moved = _lookup_counts(segment['first_title_codes'], segment['first_kept_positions'] + 1, title_codes)
+            positions = np.where(moved > 0, moved - 1, positions)
+        return positions
+
+
+class IncrementalUpdater:
+    """
+    Folds new ratings into the last trained artifacts
+    
+    The full pipeline leaves a compact state next to the bundle (see IncrementalState).
+    Applying a delta only revisits the users and titles it pushes over the
+    min_user_ratings / min_book_ratings thresholds, found through the state's user and
+    title groupings. The new bundle is the current one patched with the newly kept
+    ratings: arrays the delta does not change are hard-linked, the title search index
+    only gains the new titles, and only books whose vectors changed get their neighbor
+    lists rescored. The result matches a full retrain on the ratings file with the delta appended.
+    """
+
+    def __init__(self, config: IncrementalUpdateConfig):
+        self.config = config
+
+    def build_state(self, books: pd.DataFrame, ratings: pd.DataFrame):
+        """
+        Save the incremental state for the ratings the full pipeline just trained on
+        
+        Args:
+            books: Books DataFrame from data ingestion
+            ratings: Ratings DataFrame from data ingestion
+        """
+        logger.info("Building incremental update state...")
+        min_user, min_book = self.config.min_user_ratings, self.config.min_book_ratings
+        title_codes, catalog_titles = pd.factorize(books['Title'], sort=True)
+        n_titles = len(catalog_titles)
+        arrays = {'book_title_codes': title_codes.astype(np.int32)}
+        add_strings(arrays, 'catalog_titles', catalog_titles)
+        for name, column in BOOK_STRING_COLUMNS.items():
+            add_strings(arrays, name, books[column])
+        
+        # ISBN hashes sorted with their books rows, so deltas look up ISBNs without decoding the catalog
+        isbn_rows = np.flatnonzero(books['ISBN'].notna().to_numpy())
+        isbn_hashes = pd.util.hash_array(books['ISBN'].to_numpy(dtype=object)[isbn_rows])
+        order = np.argsort(isbn_hashes, kind='stable')
+        arrays['isbn_hashes'], arrays['isbn_book_rows'] = isbn_hashes[order], isbn_rows[order].astype(np.int32)
+        
+        # Ratings of books without a title never reach the matrix, so only titled ones are stored
+        user_ids = ratings['User-ID'].to_numpy(dtype=np.int64)
+        rating_rows, book_rows = join_books(ratings['ISBN'], books['ISBN'], np.arange(len(ratings)))
+        titled = title_codes[book_rows] >= 0
+        rating_rows, book_rows = rating_rows[titled], book_rows[titled]
+        joined_users, joined_titles = user_ids[rating_rows], title_codes[book_rows]
+        arrays['joined_user_ids'] = joined_users
+        arrays['joined_book_rows'] = book_rows.astype(np.int32)
+        arrays['joined_ratings'] = ratings['Book-Rating'].to_numpy(dtype=np.int8)[rating_rows]
+        arrays['count_user_ids'], arrays['user_counts'] = np.unique(user_ids, return_counts=True)
+        
+        # Joined ratings grouped by user (aligned with count_user_ids) and by title code
+        arrays['user_row_order'] = np.argsort(joined_users, kind='stable')
+        arrays['user_row_starts'] = np.append(
+            np.searchsorted(joined_users[arrays['user_row_order']], arrays['count_user_ids']), len(joined_users)
+        )
+        arrays['title_row_order'] = np.argsort(joined_titles, kind='stable')
+        arrays['title_row_starts'] = np.append(0, np.cumsum(np.bincount(joined_titles, minlength=n_titles)))
+        
+        active = _lookup_counts(arrays['count_user_ids'], arrays['user_counts'], joined_users) > min_user
+        arrays['title_counts'] = np.bincount(joined_titles[active], minlength=n_titles).astype(np.int64)
+        candidates = np.flatnonzero(active & (arrays['title_counts'][joined_titles] >= min_book))
+        kept = first_pairs(candidates, joined_users, joined_titles, n_titles)
+        arrays['kept_pair_keys'] = np.sort(_pair_keys(joined_users[kept], joined_titles[kept], n_titles))
+        
+        matrix_title_codes, first = np.unique(joined_titles[kept], return_index=True)
+        arrays['matrix_title_codes'] = matrix_title_codes.astype(np.int32)
+        arrays['first_kept_positions'] = np.full(n_titles, -1, dtype=np.int64)
+        arrays['first_kept_positions'][matrix_title_codes] = kept[first]
+        
+        nnz = int(np.count_nonzero(arrays['joined_ratings'][kept]))
+        self._save_state(arrays, n_books=len(matrix_title_codes), nnz=nnz)
+
+    def apply_delta(self, delta_path: Path) -> Optional[dict]:
+        """
+        Apply a ratings delta and publish a new artifact version
+        
+        Args:
+            delta_path: CSV in the BX-Book-Ratings.csv format holding only the new ratings
+        
+        Returns:
+            Update report, or None if this delta file was already applied
+        """
+        try:
+            started = time.perf_counter()
+            if self.config.artifact_format != 'numpy':
+                raise ValueError("Incremental updates need artifact_format: numpy; rerun the full pipeline instead")
+            if not Path(self.config.state_dir, MANIFEST_FILE).exists():
+                raise FileNotFoundError(
+                    f"No incremental state in {self.config.state_dir}; set incremental_update.enabled: true "
+                    "and run the full pipeline once first"
+                )
+            
+            state = IncrementalState(self.config.state_dir)
+            if (state.manifest['min_user_ratings'], state.manifest['min_book_ratings']) != \
+                    (self.config.min_user_ratings, self.config.min_book_ratings):
+                raise ValueError("Rating thresholds changed since the last full run; rerun the full pipeline")
+            
+            delta_sha256 = file_sha256(delta_path)
+            if delta_sha256 in state.manifest['applied_deltas']:
+                logger.info(f"Delta {delta_path} was already applied, nothing to do")
+                return None
+            
+            bundle_dir = resolve_bundle_dir(self.config.bundle_dir)
+            bundle, bundle_manifest = load_bundle(bundle_dir, mmap_mode='r')
+            # bundle_version is recorded from the first delta on; the full run only knows the matrix size
+            expected_version = state.manifest.get('bundle_version', bundle_manifest['artifact_version'])
+            if (bundle_manifest['n_books'], bundle_manifest['nnz'], bundle_manifest['artifact_version']) != \
+                    (state.manifest['n_books'], state.manifest['nnz'], expected_version):
+                raise ValueError(
+                    f"Bundle in {self.config.bundle_dir} does not match the incremental state; rerun the full pipeline"
+                )
+            
+            logger.info(f"Reading ratings delta: {delta_path}")
+            delta = self._read_delta(delta_path)
+            logger.info(f"Delta ratings: {len(delta)}")
+            
+            kept, segment, report = self._apply_ratings(state, delta)
+            if len(kept['positions']):
+                manifest, publish_report = self._publish(state, bundle, bundle_dir, bundle_manifest, kept, segment)
+                report.update(publish_report)
+            else:
+                logger.info("No new ratings enter the matrix, the current artifact version stays")
+                manifest = bundle_manifest
+            
+            # The segment only counts once the manifest lists it, after the bundle is published
+            segment_name = self._write_segment(state, segment, delta_sha256)
+            self._commit_segment(
+                state, segment_name,
+                applied_deltas=state.manifest['applied_deltas'] + [delta_sha256],
+                n_books=manifest['n_books'], nnz=manifest['nnz'], bundle_version=manifest['artifact_version']
+            )
+            
+            report.update({
+                'delta_file': str(delta_path),
+                'delta_sha256': delta_sha256,
+                'delta_rows': int(len(delta)),
+                'n_books': int(manifest['n_books']),
+                'n_users': int(manifest['n_users']),
+                'nnz': int(manifest['nnz']),
+                'parent_version': bundle_manifest['artifact_version'],
+                'artifact_version': manifest['artifact_version'],
+                'seconds': round(time.perf_counter() - started, 4),
+            })
+            save_json(report, Path(self.config.root_dir, 'update_report.json'))
+            logger.info(
+                f"Incremental update published {manifest['artifact_version']}: {report['new_ratings']} new ratings, "
+                f"{report.get('affected_books', 0)} affected books, {report.get('recomputed_books', 0)} neighbor "
+                f"lists rescored in {report['seconds']}s"
+            )
+            return report
+        
+        except Exception as e:
+            logger.error(f"Error in incremental update: {e}")
+            raise e
+
+    def _read_delta(self, path: Path) -> pd.DataFrame:
+        """Read a delta file with the same columns and dtypes as the ratings source"""
+        return pd.read_csv(
+            path,
+            sep=';',
+            on_bad_lines='skip',
+            encoding='latin-1',
+            usecols=list(RATINGS_DTYPES),
+            dtype=RATINGS_DTYPES
+        )
+
+    def _apply_ratings(self, state: IncrementalState,
+                       delta: pd.DataFrame) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray], dict]:
+        """
+        Find the ratings the delta adds to the matrix
+        
+        Only three kinds of ratings can enter the matrix: delta ratings, earlier ratings
+        of users the delta makes active, and earlier ratings of titles it makes popular.
+        They are read through the state's user and title groupings, so the work grows
+        with the delta and the history of the users and titles it touches.
+        
+        Returns:
+            Tuple of (newly kept ratings with their positions, state segment of the delta, report)
+        """
+        min_user, min_book = self.config.min_user_ratings, self.config.min_book_ratings
+        segment = {}
+        
+        # Users: raw rating counts include ratings of books missing from the catalog
+        delta_users = delta['User-ID'].to_numpy(dtype=np.int64)
+        segment['count_user_ids'], segment['user_counts'] = np.unique(delta_users, return_counts=True)
+        old_counts = state.user_counts(segment['count_user_ids'])
+        new_counts = old_counts + segment['user_counts']
+        newly_active = segment['count_user_ids'][(new_counts > min_user) & (old_counts <= min_user)]
+
+        def is_active(user_ids: np.ndarray) -> np.ndarray:
+            counts = state.user_counts(user_ids)
+            return counts + _lookup_counts(segment['count_user_ids'], segment['user_counts'], user_ids) > min_user
+        
+        # Ratings: a rating of a duplicated ISBN joins every books row carrying it, as in DataTransformation
+        rating_rows, book_rows = state.join_isbns(delta['ISBN'])
+        titled = state.arrays['book_title_codes'][book_rows] >= 0
+        rating_rows, book_rows = rating_rows[titled], book_rows[titled]
+        segment['joined_user_ids'] = delta_users[rating_rows]
+        segment['joined_book_rows'] = book_rows.astype(np.int32)
+        segment['joined_ratings'] = delta['Book-Rating'].to_numpy(dtype=np.int8)[rating_rows]
+        delta_positions = state.append(
+            segment['joined_user_ids'], segment['joined_book_rows'], segment['joined_ratings']
+        )
+        
+        # Titles: counted ratings grow by the newly active users' history and active users' delta rows
+        added = np.union1d(
+            state.rows_of_users(newly_active), delta_positions[is_active(segment['joined_user_ids'])]
+        )
+        segment['title_codes'], segment['title_counts'] = np.unique(state.gather(added)['titles'], return_counts=True)
+        old_title_counts = state.title_counts(segment['title_codes'])
+        newly_popular = segment['title_codes'][
+            (old_title_counts < min_book) & (old_title_counts + segment['title_counts'] >= min_book)
+        ]
+        
+        popular_rows = state.rows_of_titles(newly_popular)
+        popular_rows = popular_rows[is_active(state.gather(popular_rows)['joined_user_ids'])]
+        candidates = np.union1d(added, popular_rows)
+        rows = state.gather(candidates)
+        title_counts = state.title_counts(rows['titles'])
+        title_counts += _lookup_counts(segment['title_codes'], segment['title_counts'], rows['titles'])
+        popular = title_counts >= min_book
+        candidates, rows = candidates[popular], {name: values[popular] for name, values in rows.items()}
+        
+        # Ratings: a (user, title) pair already in the matrix keeps its earlier rating
+        first = first_pairs(np.arange(len(candidates)), rows['joined_user_ids'], rows['titles'], state.n_titles)
+        pair_keys = _pair_keys(rows['joined_user_ids'][first], rows['titles'][first], state.n_titles)
+        new = ~state.is_kept(pair_keys)
+        segment['kept_pair_keys'] = np.sort(pair_keys[new])
+        kept = {name: values[first[new]] for name, values in rows.items()}
+        kept['positions'] = candidates[first[new]]
+        
+        # Metadata: a title is described by the book of its first kept rating, which can move earlier
+        codes, first_new = np.unique(kept['titles'], return_index=True)
+        current_first = state.first_kept_positions(codes)
+        moved = (current_first < 0) | (kept['positions'][first_new] < current_first)
+        segment['first_title_codes'] = codes[moved]
+        segment['first_kept_positions'] = kept['positions'][first_new[moved]]
+        
+        report = {
+            'joined_rows': int(len(rating_rows)),
+            'newly_active_users': int(len(newly_active)),
+            'newly_popular_books': int(len(newly_popular)),
+            'new_ratings': int(len(kept['positions'])),
+        }
+        return kept, segment, report
+
+    def _publish(self, state: IncrementalState, bundle: Dict[str, np.ndarray], bundle_dir: Path,
+                 bundle_manifest: dict, kept: Dict[str, np.ndarray],
+                 segment: Dict[str, np.ndarray]) -> Tuple[dict, dict]:
+        """
+        Publish the current bundle patched with the newly kept ratings as a new version
+        
+        New titles and users are inserted into the sorted row and column labels, so the
+        matrix and its item vectors are rewritten. Every other array is hard-linked from
+        the current version unless the delta changes it, and without new rows only the
+        neighbor lists that changed are rewritten.
+        
+        Returns:
+            Tuple of (manifest of the new version, report)
+        """
+        old_codes = state.matrix_title_codes
+        old_users = bundle['user_ids']
+        row_codes = np.union1d(old_codes, kept['titles'])
+        user_ids = np.union1d(old_users, kept['joined_user_ids'])
+        old_to_new = np.searchsorted(row_codes, old_codes)
+        new_to_old = np.full(len(row_codes), -1, dtype=np.int64)
+        new_to_old[old_to_new] = np.arange(len(old_codes))
+        new_rows = np.flatnonzero(new_to_old < 0)
+        kept_rows = np.searchsorted(row_codes, kept['titles'])
+        
+        logger.info(f"Adding {len(kept['positions'])} ratings and {len(new_rows)} books to the matrix...")
+        old_matrix = get_csr(bundle, 'matrix')
+        old_rows = old_to_new[np.repeat(np.arange(len(old_codes)), np.diff(old_matrix.indptr))]
+        old_cols = np.searchsorted(user_ids, old_users)[old_matrix.indices]
+        matrix = coo_matrix(
+            (
+                np.concatenate([old_matrix.data, kept['joined_ratings']]).astype(np.float64),
+                (np.concatenate([old_rows, kept_rows]),
+                 np.concatenate([old_cols, np.searchsorted(user_ids, kept['joined_user_ids'])]))
+            ),
+            shape=(len(row_codes), len(user_ids))
+        ).tocsr()
+        matrix.eliminate_zeros()
+        matrix.sort_indices()
+        
+        affected = np.zeros(len(row_codes), dtype=bool)
+        affected[new_rows] = True
+        affected[kept_rows[kept['joined_ratings'] != 0]] = True
+        logger.info(f"Updating neighbors for {int(affected.sum())} affected books...")
+        neighbor_indices, neighbor_distances, report = self._update_neighbors(
+            matrix, affected, old_to_new, bundle['neighbor_indices'], bundle['neighbor_distances']
+        )
+        
+        arrays, linked, patched = {}, {}, {}
+
+        def link(*names: str):
+            linked.update({name: Path(bundle_dir, f"{name}.npy") for name in names})
+        
+        add_matrix_arrays(arrays, matrix, self.config.vector_dtype)
+        if len(user_ids) == len(old_users):
+            link('user_ids')
+        else:
+            arrays['user_ids'] = user_ids
+        
+        catalog_titles = get_strings(state.arrays, 'catalog_titles')
+        rating_counts = matrix.getnnz(axis=1)
+        if len(new_rows):
+            arrays['titles_offsets'], arrays['titles_data'] = self._splice_strings(
+                get_strings(bundle, 'titles'), catalog_titles, new_to_old, row_codes
+            )
+            TitleSearchIndex.from_bundle(bundle).add_inserted_to_bundle(
+                arrays, old_to_new, new_rows, [catalog_titles[code] for code in row_codes[new_rows]], rating_counts
+            )
+        else:
+            link('titles_offsets', 'titles_data', *SEARCH_ARRAYS)
+            arrays['rating_counts'] = rating_counts.astype(np.int32)
+        
+        # Rows whose first kept rating moved take their metadata from its book, the others keep theirs
+        moved_rows = np.searchsorted(row_codes, segment['first_title_codes'])
+        metadata_rows = new_to_old.copy()
+        metadata_rows[moved_rows] = -1
+        first_book_rows = np.full(len(row_codes), -1, dtype=np.int64)
+        first_book_rows[moved_rows] = kept['joined_book_rows'][
+            np.searchsorted(kept['positions'], segment['first_kept_positions'])
+        ]
+        for name, state_name in METADATA_STRINGS.items():
+            if len(moved_rows):
+                arrays[f"{name}_offsets"], arrays[f"{name}_data"] = self._splice_strings(
+                    get_strings(bundle, name), get_strings(state.arrays, state_name), metadata_rows, first_book_rows
+                )
+            else:
+                link(f"{name}_offsets", f"{name}_data")
+        
+        # New rows renumber every neighbor list; otherwise only the lists that changed are rewritten
+        if len(new_rows) == 0:
+            rewritten = np.flatnonzero(
+                (neighbor_indices != bundle['neighbor_indices']).any(axis=1)
+                | (neighbor_distances != bundle['neighbor_distances']).any(axis=1)
+            )
+            for name, values in (('neighbor_indices', neighbor_indices), ('neighbor_distances', neighbor_distances)):
+                patched[name] = (Path(bundle_dir, f"{name}.npy"), rewritten, values[rewritten])
+        else:
+            rewritten = np.arange(len(row_codes))
+            arrays['neighbor_indices'] = neighbor_indices
+            arrays['neighbor_distances'] = neighbor_distances
+            segment['matrix_title_codes'] = row_codes.astype(np.int32)
+        
+        manifest = publish_bundle(
+            arrays,
+            model_bundle_manifest(
+                matrix, neighbor_indices.shape[1], self.config.vector_dtype,
+                parent_version=bundle_manifest['artifact_version'], source='incremental'
+            ),
+            self.config.bundle_dir, self.config.keep_versions, linked=linked, patched=patched
+        )
+        report.update(rewritten_neighbor_rows=int(len(rewritten)), linked_arrays=len(linked))
+        return manifest, report
+
+    def _update_neighbors(self, matrix: csr_matrix, affected: np.ndarray, old_to_new: np.ndarray,
+                          old_indices: np.ndarray, old_distances: np.ndarray) -> Tuple[np.ndarray, np.ndarray, dict]:
+        """
+        Patch the neighbor table for a matrix where only the affected rows changed
+        
+        Similarities between two unaffected books are unchanged. An unaffected book whose
+        old top-K holds no affected book therefore only needs its old list merged with its
+        similarities to the affected books; every other book is rescored against the catalog.
+        
+        Args:
+            matrix: New books × users matrix
+            affected: Boolean mask of new rows whose vectors changed or that are new
+            old_to_new: New row of every old row
+            old_indices: Old neighbor table indices (old row numbering)
+            old_distances: Old neighbor table distances
+        
+        Returns:
+            Tuple of (neighbor_indices int32, neighbor_distances float32, report)
+        """
+        n_books = matrix.shape[0]
+        k = min(self.config.n_neighbors, n_books - 1)
+        vectors = normalize_rows(matrix).astype(np.float32)
+        affected_rows = np.flatnonzero(affected)
+        
+        neighbor_indices = np.empty((n_books, k), dtype=np.int32)
+        neighbor_distances = np.empty((n_books, k), dtype=np.float32)
+        
+        mergeable = np.zeros(n_books, dtype=bool)
+        old_rows = np.array([], dtype=np.int64)
+        if old_indices.shape[1] >= k:
+            mapped = old_to_new[old_indices[:, :k]]
+            clean = ~affected[old_to_new] & ~affected[mapped].any(axis=1)
+            old_rows = np.flatnonzero(clean)
+            mergeable[old_to_new[old_rows]] = True
+        
+        for start in range(0, len(old_rows), self.config.block_size):
+            block_old = old_rows[start:start + self.config.block_size]
+            block_new = old_to_new[block_old]
+            block_ids = old_to_new[old_indices[block_old, :k]]
+            block_distances = old_distances[block_old, :k]
+            if len(affected_rows):
+                affected_sims = np.asarray((vectors[block_new] @ vectors[affected_rows].T).todense(), dtype=np.float32)
+                block_distances = np.hstack([block_distances, 1.0 - affected_sims])
+                block_ids = np.hstack([block_ids, np.broadcast_to(affected_rows, affected_sims.shape)])
+            # Kept entries keep their stored distance, so lists the delta does not reach stay byte-identical
+            positions, _ = top_k(-block_distances, k)
+            neighbor_indices[block_new] = np.take_along_axis(block_ids, positions, axis=1)
+            neighbor_distances[block_new] = np.take_along_axis(block_distances, positions, axis=1)
+        
+        rescored = np.flatnonzero(~mergeable)
+        if len(rescored):
+            neighbor_distances[rescored], neighbor_indices[rescored] = exact_kneighbors(
+                vectors, vectors[rescored], k, query_ids=rescored,
+                block_size=self.config.block_size, normalized=True
+            )
+        
+        report = {
+            'affected_books': int(len(affected_rows)),
+            'merged_books': int(mergeable.sum()),
+            'recomputed_books': int(len(rescored)),
+        }
+        return neighbor_indices, neighbor_distances, report
+
+    @staticmethod
+    def _splice_strings(old: PackedStrings, source: PackedStrings, old_rows: np.ndarray,
+                        source_rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Packed strings whose row i is old[old_rows[i]], or source[source_rows[i]] where old_rows[i] is -1"""
+        fresh = np.flatnonzero(old_rows < 0)
+        strings = concat_strings((old.offsets, old.data), take_strings(source, source_rows[fresh]))
+        rows = old_rows.copy()
+        rows[fresh] = len(old) + np.arange(len(fresh))
+        return take_strings(strings, rows)
+
+    def _save_state(self, arrays: Dict[str, np.ndarray], **manifest_fields):
+        """Replace the state, segments included, with a new base for the thresholds it was computed with"""
+        manifest = {
+            'artifact_version': datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ'),
+            'min_user_ratings': self.config.min_user_ratings,
+            'min_book_ratings': self.config.min_book_ratings,
+            'applied_deltas': [],
+            'segments': [],
+            **manifest_fields,
+        }
+        new_state_dir = Path(f"{self.config.state_dir}.new")
+        shutil.rmtree(new_state_dir, ignore_errors=True)
+        save_bundle(arrays, manifest, new_state_dir)
+        
+        old_state_dir = Path(f"{self.config.state_dir}.old")
+        shutil.rmtree(old_state_dir, ignore_errors=True)
+        if Path(self.config.state_dir).exists():
+            os.replace(self.config.state_dir, old_state_dir)
+        os.replace(new_state_dir, self.config.state_dir)
+        shutil.rmtree(old_state_dir, ignore_errors=True)
+
+    def _write_segment(self, state: IncrementalState, segment: Dict[str, np.ndarray], delta_sha256: str) -> str:
+        """Write a delta's segment next to the base and return its name"""
+        name = f"{len(state.manifest['segments']) + 1:06d}"
+        segment_dir = Path(self.config.state_dir, SEGMENTS_DIR, name)
+        # Left over from an update that failed before its manifest was committed
+        shutil.rmtree(segment_dir, ignore_errors=True)
+        save_bundle(segment, {'delta_sha256': delta_sha256}, segment_dir)
+        return name
+
+    def _commit_segment(self, state: IncrementalState, name: str, **manifest_fields):
+        """Atomically replace the state manifest with one that lists the new segment"""
+        manifest = dict(state.manifest, segments=state.manifest['segments'] + [name], **manifest_fields)
+        manifest_tmp = Path(self.config.state_dir, f".{MANIFEST_FILE}.tmp")
+        with open(manifest_tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_tmp, Path(self.config.state_dir, MANIFEST_FILE))
@@ -0,0 +1,185 @@
+"""
+Serving Engine
+Reads the trained artifacts and answers neighbor queries with numpy/scipy only
+
+This is everything a web worker needs from training, kept apart from the training
+components so that importing it never pulls in scikit-learn or pandas. Recommendations
+come from the precomputed neighbor table, and requests beyond it from the pre-normalized
+item vectors, so the fitted model in model.pkl is never loaded. With the numpy bundle the
+whole engine is memory-mapped arrays; the pickle format unpickles pandas objects and so
+imports pandas, but still not scikit-learn.
+"""
+
+import os
+import logging
+import numpy as np
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from scipy.sparse import csr_matrix
+from entity.config_entity import ModelTrainerConfig
+from components.ann_index import normalize_rows, dequantize_vectors, exact_kneighbors, profile_kneighbors
+from components.title_search import TitleSearchIndex
+from utils.util import load_pickle
+from utils.artifact_bundle import load_bundle, get_strings, get_csr, resolve_bundle_dir
+
+logger = logging.getLogger(__name__)
+
+
+class ServingArtifacts:
+    """
+    Everything a request reads from one artifact version
+    
+    Requests take a reference to the active instance once and use only that, and a reload
+    replaces the reference in one assignment, so no request ever mixes two versions.
+    Every array of a numpy bundle is memory-mapped when the version is loaded, so a
+    version directory pruned while workers still serve it stays readable through their
+    open maps. Deriving the item vectors and user ratings from those arrays waits for
+    first use, since most requests are answered from the neighbor table alone.
+    """
+
+    def __init__(self, config: ModelTrainerConfig, book_names, image_urls, neighbor_indices: np.ndarray,
+                 neighbor_distances: np.ndarray, search_index: TitleSearchIndex, version: str,
+                 bundle_arrays: Optional[Dict[str, np.ndarray]] = None):
+        self.config = config
+        self.book_list = list(book_names)
+        self.book_positions = {title: position for position, title in enumerate(self.book_list)}
+        self.image_urls = image_urls
+        self.neighbor_indices = neighbor_indices
+        self.neighbor_distances = neighbor_distances
+        self.search_index = search_index
+        self.version = version
+        self.bundle_arrays = bundle_arrays
+        self.item_vectors = None
+        self.user_ratings = None
+        self.user_positions = None
+        self.loaded_at = datetime.now(timezone.utc)
+
+    def load_rating_matrix(self) -> Tuple[csr_matrix, np.ndarray]:
+        """
+        Load the books × users rating matrix and its user ids
+        
+        Returns:
+            Tuple of (CSR matrix, user ids of its columns)
+        """
+        if self.config.artifact_format == 'pickle':
+            user_book_matrix = load_pickle(self.config.book_matrix_path)
+            return user_book_matrix.matrix, np.asarray(user_book_matrix.user_ids)
+        return get_csr(self.bundle_arrays, 'matrix'), self.bundle_arrays['user_ids']
+
+    def get_item_vectors(self) -> csr_matrix:
+        """
+        Books × users matrix with L2-normalized rows, loaded on first use beyond the neighbor table
+        
+        Bundles store the vectors pre-normalized, so cosine similarity is a plain sparse dot
+        product; float32 vectors are used straight from the memory map. Pickle artifacts and
+        bundles written before the vectors existed are normalized here.
+        """
+        if self.item_vectors is None:
+            arrays = self.bundle_arrays or {}
+            if 'item_vectors_data' in arrays:
+                self.item_vectors = dequantize_vectors(
+                    arrays['item_vectors_data'], arrays['matrix_indices'], arrays['matrix_indptr'],
+                    tuple(int(dim) for dim in arrays['matrix_shape']), arrays.get('item_vector_scales')
+                )
+            else:
+                matrix, _ = self.load_rating_matrix()
+                self.item_vectors = normalize_rows(matrix).astype(np.float32)
+        return self.item_vectors
+
+    def get_user_ratings(self) -> Tuple[csr_matrix, Dict[int, int]]:
+        """
+        Users × books ratings and the row of each User-ID, loaded on the first user-profile request
+        
+        Returns:
+            Tuple of (CSR matrix, dict of User-ID → row)
+        """
+        if self.user_ratings is None:
+            matrix, user_ids = self.load_rating_matrix()
+            self.user_positions = {int(user_id): position for position, user_id in enumerate(user_ids)}
+            self.user_ratings = matrix.T.tocsr()
+        return self.user_ratings, self.user_positions
+
+    def find_neighbors(self, book_indices: np.ndarray, n_recommendations: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Neighbor indices and distances for many books in one vectorized pass
+        
+        Requests that fit in the precomputed table are a single fancy-index gather;
+        larger ones score all queries with one blocked sparse product and argpartition top-K.
+        
+        Args:
+            book_indices: Matrix rows of the query books
+            n_recommendations: Neighbors per book
+        
+        Returns:
+            Tuple of (indices, distances), both of shape (len(book_indices), n_recommendations)
+        """
+        if n_recommendations <= self.neighbor_indices.shape[1]:
+            return (
+                self.neighbor_indices[book_indices, :n_recommendations],
+                self.neighbor_distances[book_indices, :n_recommendations]
+            )
+        
+        item_vectors = self.get_item_vectors()
+        distances, indices = exact_kneighbors(
+            item_vectors, item_vectors[book_indices], n_recommendations,
+            query_ids=book_indices, normalized=True
+        )
+        return indices, distances
+
+    def find_profile_neighbors(self, item_ids: np.ndarray, weights: np.ndarray,
+                               n_recommendations: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Books closest to a weighted set of books, excluding the set itself
+        
+        Returns:
+            Tuple of (indices, distances), best first
+        """
+        distances, indices = profile_kneighbors(self.get_item_vectors(), item_ids, weights, n_recommendations)
+        return indices, distances
+
+
+def load_artifacts(config: ModelTrainerConfig) -> ServingArtifacts:
+    """
+    Load book titles, image URLs and the neighbor table precomputed at training time
+    
+    The numpy bundle is the version named by the bundle's current pointer, memory-mapped
+    so gunicorn workers share its pages. The pickle format is read fully into each worker
+    and versioned by its modification time. The title search index comes with the bundle
+    and is built here for the pickle format.
+    
+    Args:
+        config: Model trainer configuration naming the artifact format and paths
+    
+    Returns:
+        ServingArtifacts
+    """
+    if config.artifact_format == 'pickle':
+        book_names = load_pickle(config.book_names_path)
+        search_index = TitleSearchIndex.build(book_names, load_pickle(config.book_matrix_path).matrix.getnnz(axis=1))
+        modified = os.path.getmtime(config.neighbor_indices_path)
+        return ServingArtifacts(
+            config=config,
+            book_names=book_names,
+            image_urls=load_pickle(config.book_metadata_path)['Image-URL'].to_numpy(),
+            neighbor_indices=np.load(config.neighbor_indices_path),
+            neighbor_distances=np.load(config.neighbor_distances_path),
+            search_index=search_index,
+            version=datetime.fromtimestamp(modified, timezone.utc).strftime('mtime-%Y%m%dT%H%M%SZ')
+        )
+    
+    bundle_dir = resolve_bundle_dir(config.bundle_dir)
+    arrays, manifest = load_bundle(bundle_dir, mmap_mode='r')
+    book_names = get_strings(arrays, 'titles')
+    search_index = TitleSearchIndex.from_bundle(arrays)
+    if search_index is None:
+        search_index = TitleSearchIndex.build(book_names, np.diff(arrays['matrix_indptr']))
+    return ServingArtifacts(
+        config=config,
+        book_names=book_names,
+        image_urls=get_strings(arrays, 'image_urls'),
+        neighbor_indices=arrays['neighbor_indices'],
+        neighbor_distances=arrays['neighbor_distances'],
+        search_index=search_index,
+        version=manifest['artifact_version'],
+        bundle_arrays=arrays
+    )
@@ -3,69 +3,210 @@ Data Ingestion Component
 Loads and preprocesses the Book-Crossing dataset (Books, Users, Ratings)
 """
 
-import pandas as pd
+import os
 import logging
-from typing import Tuple
+import importlib.util
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Tuple
 from entity.config_entity import DataIngestionConfig
+from utils.util import cached_file_sha256
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever columns, dtypes or renames below change so stale caches are not reused
+CACHE_SCHEMA_VERSION = 1
+
+BOOKS_COLUMNS = {
+    'ISBN': 'ISBN',
+    'Book-Title': 'Title',
+    'Book-Author': 'Author',
+    'Year-Of-Publication': 'Year',
+    'Publisher': 'Publisher',
+    'Image-URL-L': 'Image-URL',
+}
+USERS_DTYPES = {'User-ID': np.int32, 'Age': np.float32}
+RATINGS_DTYPES = {'User-ID': np.int32, 'ISBN': 'category', 'Book-Rating': np.int8}
+
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
 
 class DataIngestion:
     """Handles loading and initial preprocessing of raw data files"""
     
     def __init__(self, config: DataIngestionConfig):
         self.config = config
+        self.cache_format = config.cache_format
+        self.csv_engine = config.csv_engine
+        
+        if not PYARROW_AVAILABLE:
+            if self.cache_format in ('parquet', 'feather'):
+                logger.warning(f"pyarrow not installed, using pickle cache instead of {self.cache_format}")
+                self.cache_format = 'pickle'
+            if self.csv_engine == 'pyarrow':
+                logger.warning("pyarrow not installed, using the C CSV engine")
+                self.csv_engine = 'c'
 
     def load_data(self) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
         """
-        Load all three datasets from CSV files
+        Load all three datasets, from the columnar cache when the source files are unchanged
         
         Returns:
             Tuple of (books_df, users_df, ratings_df)
         """
         try:
-            logger.info("Loading books dataset...")
-            self.books = pd.read_csv(
-                self.config.books_file, 
-                sep=';', 
-                on_bad_lines='skip', 
-                encoding='latin-1', 
-                low_memory=False
-            )
-            
-            self.books = self.books[['ISBN', 'Book-Title', 'Book-Author', 'Year-Of-Publication', 'Publisher', 'Image-URL-L']]
-            self.books.rename(columns={
-                'Book-Title': 'Title',
-                'Book-Author': 'Author',
-                'Year-Of-Publication': 'Year',
-                'Image-URL-L': 'Image-URL'
-            }, inplace=True)
-            
-            logger.info(f"Books dataset loaded: {self.books.shape}")
-            
-            logger.info("Loading users dataset...")
-            self.users = pd.read_csv(
-                self.config.users_file, 
-                sep=';', 
-                on_bad_lines='skip', 
-                encoding='latin-1', 
-                low_memory=False
-            )
-            logger.info(f"Users dataset loaded: {self.users.shape}")
+            self.load_catalog()
             
             logger.info("Loading ratings dataset...")
-            self.ratings = pd.read_csv(
-                self.config.ratings_file, 
-                sep=';', 
-                on_bad_lines='skip', 
-                encoding='latin-1', 
-                low_memory=False
-            )
+            self.ratings = self._load_cached('ratings', self.config.ratings_file, self._read_ratings)
             logger.info(f"Ratings dataset loaded: {self.ratings.shape}")
             
             return self.books, self.users, self.ratings
-            
+        
         except Exception as e:
             logger.error(f"Error in data ingestion: {e}")
             raise e
+
+    def load_catalog(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Load the books and users datasets only, for runs that stream the ratings with iter_ratings
+        
+        Returns:
+            Tuple of (books_df, users_df)
+        """
+        logger.info("Loading books dataset...")
+        self.books = self._load_cached('books', self.config.books_file, self._read_books)
+        logger.info(f"Books dataset loaded: {self.books.shape}")
+        
+        logger.info("Loading users dataset...")
+        self.users = self._load_cached('users', self.config.users_file, self._read_users)
+        logger.info(f"Users dataset loaded: {self.users.shape}")
+        return self.books, self.users
+
+    def iter_ratings(self, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """
+        Stream the ratings CSV in chunks, with the same columns and dtypes as load_data
+        
+        The cache is bypassed, since reading it would load the whole file, and the C
+        engine is always used because the pyarrow engine cannot read in chunks. The
+        ISBN categories are those of each chunk.
+        
+        Args:
+            chunk_size: Rows per chunk
+        
+        Yields:
+            Ratings DataFrames of at most chunk_size rows, in file order
+        """
+        with self._read_csv(self.config.ratings_file, RATINGS_DTYPES, chunksize=chunk_size) as reader:
+            yield from reader
+
+    def _read_csv(self, path: Path, dtypes: Dict[str, Any], **kwargs) -> pd.DataFrame:
+        """Read only the given columns of a Book-Crossing CSV with explicit dtypes"""
+        if self.csv_engine == 'pyarrow' and 'chunksize' not in kwargs:
+            return self._read_csv_pyarrow(path, dtypes)
+        return pd.read_csv(
+            path,
+            sep=';',
+            on_bad_lines='skip',
+            encoding='latin-1',
+            usecols=list(dtypes),
+            dtype=dtypes,
+            **kwargs
+        )
+
+    def _read_csv_pyarrow(self, path: Path, dtypes: Dict[str, Any]) -> pd.DataFrame:
+        """
+        Read with pyarrow.csv and explicit column types
+        
+        pandas' pyarrow engine infers types before applying dtype, which turns
+        ISBNs like '0345417623' into integers, so the types are passed to arrow directly.
+        """
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+        
+        column_types = {
+            col: pa.string() if dtype in (str, 'category') else pa.from_numpy_dtype(np.dtype(dtype))
+            for col, dtype in dtypes.items()
+        }
+        table = pa_csv.read_csv(
+            path,
+            read_options=pa_csv.ReadOptions(encoding='latin-1'),
+            parse_options=pa_csv.ParseOptions(delimiter=';', invalid_row_handler=lambda row: 'skip'),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=list(dtypes),
+                column_types=column_types,
+                null_values=['', 'NULL'],
+                strings_can_be_null=True
+            )
+        )
+        return table.to_pandas().astype(dtypes)
+
+    def _read_books(self, path: Path) -> pd.DataFrame:
+        """Read only the six books columns that are used, as strings"""
+        # Year stays a string: the raw column mixes years with shifted publisher names
+        books = self._read_csv(path, {col: str for col in BOOKS_COLUMNS})
+        return books[list(BOOKS_COLUMNS)].rename(columns=BOOKS_COLUMNS)
+
+    def _read_users(self, path: Path) -> pd.DataFrame:
+        """Read user ids and ages with compact numeric dtypes"""
+        return self._read_csv(path, USERS_DTYPES, na_values=['NULL'])
+
+    def _read_ratings(self, path: Path) -> pd.DataFrame:
+        """Read ratings as int32 user ids, categorical ISBNs and int8 ratings"""
+        return self._read_csv(path, RATINGS_DTYPES)
+
+    def _load_cached(self, name: str, source: Path, reader: Callable[[Path], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Return the parsed source file, reusing the cache entry for its content hash
+        
+        Args:
+            name: Dataset name used in cache file names
+            source: Raw CSV path
+            reader: Function parsing the raw CSV
+        
+        Returns:
+            Parsed DataFrame
+        """
+        if not self.config.use_cache:
+            return reader(source)
+        
+        os.makedirs(self.config.cache_dir, exist_ok=True)
+        source_hash = cached_file_sha256(source, Path(self.config.cache_dir, 'sources.json'))
+        cache_path = Path(
+            self.config.cache_dir,
+            f"{name}-v{CACHE_SCHEMA_VERSION}-{source_hash[:16]}.{self.cache_format}"
+        )
+        
+        if cache_path.exists():
+            logger.info(f"Cache hit for {source}: {cache_path}")
+            return self._read_cache(cache_path)
+        
+        logger.info(f"Cache miss for {source}, parsing CSV...")
+        df = reader(source)
+        
+        for stale_path in Path(self.config.cache_dir).glob(f"{name}-*"):
+            stale_path.unlink()
+        # Write under a temporary name first so an interrupted run never leaves a truncated cache
+        tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+        self._write_cache(df, tmp_path)
+        os.replace(tmp_path, cache_path)
+        logger.info(f"Cached {name} at: {cache_path}")
+        return df
+
+    def _write_cache(self, df: pd.DataFrame, path: Path):
+        """Write a cache entry in the configured format"""
+        if self.cache_format == 'parquet':
+            df.to_parquet(path, index=False)
+        elif self.cache_format == 'feather':
+            df.reset_index(drop=True).to_feather(path)
+        else:
+            df.to_pickle(path)
+
+    def _read_cache(self, path: Path) -> pd.DataFrame:
+        """Read a cache entry in the configured format"""
+        if self.cache_format == 'parquet':
+            return pd.read_parquet(path)
+        if self.cache_format == 'feather':
+            return pd.read_feather(path)
+        return pd.read_pickle(path)
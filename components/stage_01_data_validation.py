@@ -3,89 +3,252 @@ Data Validation Component
 Validates data integrity, schema, and quality of loaded datasets
 """
 
+import time
 import logging
+import numpy as np
 import pandas as pd
+from pathlib import Path
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional
 from entity.config_entity import DataValidationConfig
 from pydantic import ValidationError
+from utils.util import save_json
 
 logger = logging.getLogger(__name__)
 
+REQUIRED_COLUMNS = {
+    'books': ['ISBN', 'Title', 'Author', 'Year', 'Publisher', 'Image-URL'],
+    'users': ['User-ID'],
+    'ratings': ['User-ID', 'ISBN', 'Book-Rating'],
+}
+RATING_RANGE = (0, 10)
+# Spreads user ids over all 64 bits before they are combined with ISBN hashes
+_USER_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _null_counts(df: pd.DataFrame) -> dict:
+    """Missing values per column"""
+    return {column: int(count) for column, count in df.isna().sum().items()}
+
+
+def _rates(counts: dict, rows: int) -> dict:
+    """Turn per-column counts into rates, 0 for no rows"""
+    return {column: round(count / rows, 6) if rows else 0.0 for column, count in counts.items()}
+
+
+class RatingsProfile:
+    """
+    Quality counts of the ratings, accumulated chunk by chunk in one vectorized pass per chunk
+    
+    Duplicate (User-ID, ISBN) pairs are found from a 64-bit hash per rating, so they are
+    counted across chunks too, at 8 bytes per checked rating.
+    """
+
+    def __init__(self, book_isbns: pd.Series):
+        self.catalog = pd.Index(book_isbns.dropna().unique())
+        self.rows = 0
+        self.rows_checked = 0
+        self.chunks = 0
+        self.null_counts = {}
+        self.out_of_range = 0
+        self.orphan_ratings = 0
+        self.pair_keys: List[np.ndarray] = []
+        self.orphan_keys: List[np.ndarray] = []
+        self.seconds = 0.0
+
+    def update(self, ratings: pd.DataFrame, rows: Optional[int] = None):
+        """
+        Add one chunk, or a sample of it
+        
+        Args:
+            ratings: Ratings rows to check
+            rows: Rows the chunk had before sampling, defaults to len(ratings)
+        """
+        started = time.perf_counter()
+        self.rows += len(ratings) if rows is None else rows
+        self.rows_checked += len(ratings)
+        self.chunks += 1
+        for column, count in _null_counts(ratings).items():
+            self.null_counts[column] = self.null_counts.get(column, 0) + count
+        
+        book_ratings = ratings['Book-Rating'].to_numpy()
+        self.out_of_range += int(((book_ratings < RATING_RANGE[0]) | (book_ratings > RATING_RANGE[1])).sum())
+        
+        # Every distinct ISBN is hashed and looked up in the catalog once, rows go through the codes
+        isbns = ratings['ISBN'].astype('category').cat
+        codes = isbns.codes.to_numpy()
+        category_hashes = pd.util.hash_array(isbns.categories.to_numpy(dtype=object))
+        orphan_categories = self.catalog.get_indexer(isbns.categories) < 0
+        has_isbn = codes >= 0
+        present = np.bincount(codes[has_isbn], minlength=len(orphan_categories)) > 0
+        self.orphan_ratings += int(orphan_categories[codes[has_isbn]].sum())
+        self.orphan_keys.append(category_hashes[orphan_categories & present])
+        
+        users = ratings['User-ID']
+        complete = has_isbn & users.notna().to_numpy()
+        user_hashes = users.to_numpy()[complete].astype(np.int64).astype(np.uint64) * _USER_HASH_MULTIPLIER
+        self.pair_keys.append(category_hashes[codes[complete]] ^ user_hashes)
+        self.seconds += time.perf_counter() - started
+
+    def report(self) -> dict:
+        """Counts and rates over everything added so far"""
+        started = time.perf_counter()
+        pair_keys = np.concatenate(self.pair_keys) if self.pair_keys else np.empty(0, dtype=np.uint64)
+        duplicate_pairs = len(pair_keys) - len(pd.unique(pair_keys))
+        orphan_isbns = len(pd.unique(np.concatenate(self.orphan_keys))) if self.orphan_keys else 0
+        self.seconds += time.perf_counter() - started
+        return {
+            'rows': self.rows,
+            'rows_checked': self.rows_checked,
+            'chunks': self.chunks,
+            'null_counts': self.null_counts,
+            'null_rates': _rates(self.null_counts, self.rows_checked),
+            'rating_out_of_range': self.out_of_range,
+            'duplicate_pairs': int(duplicate_pairs),
+            'orphan_isbn_ratings': self.orphan_ratings,
+            'orphan_isbns': int(orphan_isbns),
+        }
+
 
 class DataValidation:
-    """Performs comprehensive validation checks on loaded datasets"""
+    """
+    Performs comprehensive validation checks on loaded datasets
     
+    Schema problems raise; quality problems (nulls, out-of-range values, duplicate keys,
+    ratings of ISBNs missing from the books table) are counted in one pass, logged as
+    warnings and saved as a JSON quality report. With sample_fraction set, only that
+    share of the ratings rows is checked.
+    """
+
     def __init__(self, config: DataValidationConfig):
         self.config = config
+        self.report_path = Path(config.root_dir, 'quality_report.json')
+        self.rng = np.random.default_rng(config.seed)
 
-    def validate_data(self, books: pd.DataFrame, users: pd.DataFrame, ratings: pd.DataFrame) -> bool:
+    def validate_data(self, books: pd.DataFrame, users: pd.DataFrame, ratings: pd.DataFrame) -> dict:
         """
         Validate the loaded datasets for completeness and correctness
         
         Args:
             books: Books DataFrame
-            users: Users DataFrame  
+            users: Users DataFrame
             ratings: Ratings DataFrame
-            
+        
         Returns:
-            bool: True if validation passes
+            dict: Quality report, also saved as quality_report.json
         """
         try:
             logger.info("Starting data validation...")
             
-            self._validate_non_empty_dataframes(books, users, ratings)
-            self._validate_books_schema(books)
-            self._validate_users_schema(users)
-            self._validate_ratings_schema(ratings)
-            self._validate_data_types_and_ranges(books, users, ratings)
+            self.validate_catalog(books, users)
+            self._validate_schema('ratings', ratings)
             
-            logger.info("Data validation successful!")
-            return True
+            profile = RatingsProfile(books['ISBN'])
+            profile.update(self._sample(ratings), rows=len(ratings))
+            report = self._save_report(books, users, profile)
             
+            logger.info("Data validation successful!")
+            return report
+        
         except (ValidationError, ValueError, AssertionError) as e:
             logger.error(f"Data validation failed: {e}")
             raise e
 
-    def _validate_non_empty_dataframes(self, books: pd.DataFrame, users: pd.DataFrame, ratings: pd.DataFrame):
-        """Check if dataframes are not empty"""
-        if books.empty:
-            raise ValueError("Books dataset is empty")
-        if users.empty:
-            raise ValueError("Users dataset is empty") 
-        if ratings.empty:
+    def validate_catalog(self, books: pd.DataFrame, users: pd.DataFrame):
+        """Schema checks of the books and users, for runs that validate the ratings with validate_chunks"""
+        self._validate_schema('books', books)
+        self._validate_schema('users', users)
+
+    def validate_chunks(self, books: pd.DataFrame, users: pd.DataFrame,
+                        chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """
+        Validate streamed ratings chunks on their way to the consumer
+        
+        Each chunk is profiled and passed on unchanged, so validation shares the
+        consumer's read of the file. The report is saved once the chunks run out.
+        
+        Args:
+            books: Books DataFrame
+            users: Users DataFrame
+            chunks: Ratings chunks
+        
+        Yields:
+            The same chunks
+        """
+        profile = RatingsProfile(books['ISBN'])
+        for chunk in chunks:
+            if profile.chunks == 0:
+                self._validate_schema('ratings', chunk)
+            profile.update(self._sample(chunk), rows=len(chunk))
+            yield chunk
+        if profile.rows == 0:
             raise ValueError("Ratings dataset is empty")
+        self._save_report(books, users, profile)
 
-    def _validate_books_schema(self, books: pd.DataFrame):
-        """Validate books dataframe schema"""
-        required_books_cols = ['ISBN', 'Title', 'Author', 'Year', 'Publisher', 'Image-URL']
-        missing_cols = [col for col in required_books_cols if col not in books.columns]
+    def _validate_schema(self, name: str, df: pd.DataFrame):
+        """Check that a dataset is non-empty and has its required columns"""
+        if df.empty:
+            raise ValueError(f"{name.capitalize()} dataset is empty")
+        missing_cols = [col for col in REQUIRED_COLUMNS[name] if col not in df.columns]
         if missing_cols:
-            raise ValueError(f"Books dataset missing required columns: {missing_cols}")
+            raise ValueError(f"{name.capitalize()} dataset missing required columns: {missing_cols}")
 
-    def _validate_users_schema(self, users: pd.DataFrame):
-        """Validate users dataframe schema"""
-        required_users_cols = ['User-ID']
-        missing_cols = [col for col in required_users_cols if col not in users.columns]
-        if missing_cols:
-            raise ValueError(f"Users dataset missing required columns: {missing_cols}")
+    def _sample(self, ratings: pd.DataFrame) -> pd.DataFrame:
+        """The configured share of the rows, or all of them"""
+        if self.config.sample_fraction is None:
+            return ratings
+        return ratings[self.rng.random(len(ratings)) < self.config.sample_fraction]
 
-    def _validate_ratings_schema(self, ratings: pd.DataFrame):
-        """Validate ratings dataframe schema"""
-        required_ratings_cols = ['User-ID', 'ISBN', 'Book-Rating']
-        missing_cols = [col for col in required_ratings_cols if col not in ratings.columns]
-        if missing_cols:
-            raise ValueError(f"Ratings dataset missing required columns: {missing_cols}")
-
-    def _validate_data_types_and_ranges(self, books: pd.DataFrame, users: pd.DataFrame, ratings: pd.DataFrame):
-        """Validate data types and value ranges"""
-        # Validate ratings are in acceptable range (0-10)
-        if 'Book-Rating' in ratings.columns:
-            invalid_ratings = ratings['Book-Rating'][(ratings['Book-Rating'] < 0) | (ratings['Book-Rating'] > 10)]
-            if len(invalid_ratings) > 0:
-                logger.warning(f"Found {len(invalid_ratings)} ratings outside 0-10 range")
+    def _books_report(self, books: pd.DataFrame) -> dict:
+        """Null rates, duplicate ISBNs and publication years outside min_year..max_year"""
+        max_year = self.config.max_year or datetime.now().year
+        # Year is read as a string, since the raw column mixes years with shifted publisher names
+        years = pd.to_numeric(books['Year'], errors='coerce').to_numpy(dtype=np.float64)
+        numeric = ~np.isnan(years)
+        null_counts = _null_counts(books)
+        return {
+            'rows': len(books),
+            'null_counts': null_counts,
+            'null_rates': _rates(null_counts, len(books)),
+            'duplicate_isbns': int(books['ISBN'].duplicated().sum()),
+            'year_range': [self.config.min_year, max_year],
+            'year_not_numeric': int(len(years) - numeric.sum() - null_counts['Year']),
+            'year_out_of_range': int(((years[numeric] < self.config.min_year) | (years[numeric] > max_year)).sum()),
+        }
+
+    def _users_report(self, users: pd.DataFrame) -> dict:
+        """Null rates and duplicate User-IDs"""
+        null_counts = _null_counts(users)
+        return {
+            'rows': len(users),
+            'null_counts': null_counts,
+            'null_rates': _rates(null_counts, len(users)),
+            'duplicate_user_ids': int(users['User-ID'].duplicated().sum()),
+        }
+
+    def _save_report(self, books: pd.DataFrame, users: pd.DataFrame, profile: RatingsProfile) -> dict:
+        """Assemble, log and save the quality report"""
+        started = time.perf_counter()
+        report = {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'sample_fraction': self.config.sample_fraction,
+            'books': self._books_report(books),
+            'users': self._users_report(users),
+            'ratings': profile.report(),
+        }
+        report['seconds'] = round(time.perf_counter() - started + profile.seconds, 4)
+        
+        ratings_report, books_report = report['ratings'], report['books']
+        if ratings_report['rating_out_of_range']:
+            logger.warning(f"Found {ratings_report['rating_out_of_range']} ratings outside "
+                           f"{RATING_RANGE[0]}-{RATING_RANGE[1]} range")
+        if books_report['year_out_of_range']:
+            logger.warning(f"Found {books_report['year_out_of_range']} books with unrealistic publication years")
+        if ratings_report['duplicate_pairs']:
+            logger.warning(f"Found {ratings_report['duplicate_pairs']} duplicate (User-ID, ISBN) ratings")
+        logger.info(f"Ratings of ISBNs missing from the books table: {ratings_report['orphan_isbn_ratings']} "
+                    f"({ratings_report['orphan_isbns']} ISBNs)")
         
-        # Validate year is reasonable
-        if 'Year' in books.columns:
-            current_year = 2025
-            invalid_years = books['Year'][(books['Year'] < 1800) | (books['Year'] > current_year)]
-            if len(invalid_years) > 0:
-                logger.warning(f"Found {len(invalid_years)} books with unrealistic publication years")
+        save_json(report, self.report_path)
+        logger.info(f"Quality report saved at: {self.report_path} ({report['seconds']}s)")
+        return report
@@ -4,62 +4,136 @@ Filters and transforms data for collaborative filtering model training
 """
 
 import logging
+import numpy as np
 import pandas as pd
-from typing import Tuple
+from typing import Callable, Iterable, Tuple
+from scipy.sparse import coo_matrix
 from entity.config_entity import DataTransformationConfig
+from entity.artifact_entity import UserBookMatrix
 
 logger = logging.getLogger(__name__)
 
 
+def join_books(rating_isbns: pd.Series, book_isbns: pd.Series, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Inner join of the given ratings rows with the books table on ISBN, as code arrays
+    
+    Books are mapped onto the ratings' ISBN categories and grouped by code, so every
+    rating gathers its matching books by offset. Like pd.merge, a rating matching
+    several books (a duplicated ISBN) yields one row per book, in books order.
+    
+    Args:
+        rating_isbns: ISBN column of the ratings
+        book_isbns: ISBN column of the books
+        rows: Ratings rows to join, ascending
+    
+    Returns:
+        Tuple of (ratings row, books row) per joined row, in ratings order
+    """
+    isbns = rating_isbns.astype('category').cat
+    book_codes = isbns.categories.get_indexer(book_isbns)
+    return join_codes(isbns.codes.to_numpy(), book_codes, len(isbns.categories), rows)
+
+
+def join_codes(rating_codes: np.ndarray, book_codes: np.ndarray, n_codes: int,
+               rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    join_books on ISBN codes the ratings and books already share, -1 for no ISBN
+    
+    Returns:
+        Tuple of (ratings row, books row) per joined row, in ratings order
+    """
+    catalog = np.flatnonzero(book_codes >= 0)
+    books_by_code = catalog[np.argsort(book_codes[catalog], kind='stable')]
+    books_per_code = np.bincount(book_codes[catalog], minlength=n_codes)
+    code_starts = np.cumsum(books_per_code) - books_per_code
+    
+    rows = rows[rating_codes[rows] >= 0]
+    codes = rating_codes[rows]
+    matches = books_per_code[codes]
+    rating_rows = np.repeat(rows, matches)
+    # Offset of each joined row among the books sharing its ISBN
+    offsets = np.arange(len(rating_rows)) - np.repeat(np.cumsum(matches) - matches, matches)
+    book_rows = books_by_code[np.repeat(code_starts[codes], matches) + offsets]
+    return rating_rows, book_rows
+
+
+def first_pairs(candidates: np.ndarray, user_ids: np.ndarray, title_codes: np.ndarray, n_titles: int) -> np.ndarray:
+    """
+    Sorted positions of the first candidate rating for each (user, title) pair, like drop_duplicates
+    
+    Args:
+        candidates: Positions in the joined table, ascending
+        user_ids: User id of every joined row
+        title_codes: Title code of every joined row
+        n_titles: Number of title codes
+    """
+    users = user_ids[candidates]
+    keys = np.searchsorted(np.unique(users), users).astype(np.int64) * n_titles + title_codes[candidates]
+    _, first = np.unique(keys, return_index=True)
+    return np.sort(candidates[first])
+
+
 class DataTransformation:
     """Transforms raw data into user-item interaction matrix for collaborative filtering"""
     
     def __init__(self, config: DataTransformationConfig):
         self.config = config
 
-    def transform_data(self, books: pd.DataFrame, ratings: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    def transform_data(self, books: pd.DataFrame, ratings: pd.DataFrame) -> Tuple[pd.DataFrame, UserBookMatrix]:
         """
         Transform and filter data for model training
         
+        Same result as merging ratings with books on ISBN, counting ratings per Title,
+        merging the counts back and dropping duplicate (User-ID, Title) pairs, but every
+        step runs on integer codes: users, ISBNs and titles are factorized once, the join
+        is a gather through the ISBN category codes, counts are np.bincount and duplicates
+        are found on packed (user, title) int64 keys. Strings are only copied for the rows
+        that survive the filters.
+        
         Args:
             books: Books DataFrame
             ratings: Ratings DataFrame
             
         Returns:
-            Tuple of (final_ratings_df, user_book_matrix)
+            Tuple of (final_ratings_df, sparse user_book_matrix)
         """
         try:
             logger.info("Starting data transformation...")
             
             logger.info(f"Filtering users with more than {self.config.min_user_ratings} ratings...")
-            user_rating_counts = ratings['User-ID'].value_counts() > self.config.min_user_ratings
-            active_users = user_rating_counts[user_rating_counts == True].index
-            filtered_ratings = ratings[ratings['User-ID'].isin(active_users)]
-            logger.info(f"Active users: {len(active_users)}")
+            user_codes, user_ids = pd.factorize(ratings['User-ID'], sort=True)
+            user_counts = np.bincount(user_codes, minlength=len(user_ids))
+            active = user_counts[user_codes] > self.config.min_user_ratings
+            logger.info(f"Active users: {int((user_counts > self.config.min_user_ratings).sum())}")
             
-            logger.info("Merging ratings with books data...")
-            ratings_with_books = pd.merge(filtered_ratings, books, on='ISBN')
+            logger.info("Joining ratings with books data...")
+            rating_rows, book_rows = join_books(ratings['ISBN'], books['ISBN'], np.flatnonzero(active))
             
-            book_rating_counts = ratings_with_books.groupby('Title')['Book-Rating'].count().reset_index()
-            book_rating_counts.rename(columns={'Book-Rating': 'Num_Ratings'}, inplace=True)
-            
-            ratings_with_books = pd.merge(ratings_with_books, book_rating_counts, on='Title')
+            # Titles are factorized in sorted order, so their codes already sort like the matrix rows
+            title_codes, titles = pd.factorize(books['Title'], sort=True)
+            joined_titles = title_codes[book_rows]
+            # Ratings of books without a title have no Title group, so they never get a count
+            titled = joined_titles >= 0
+            rating_rows, book_rows, joined_titles = rating_rows[titled], book_rows[titled], joined_titles[titled]
+            title_counts = np.bincount(joined_titles, minlength=len(titles))
             
             logger.info(f"Filtering books with at least {self.config.min_book_ratings} ratings...")
-            final_ratings = ratings_with_books[ratings_with_books['Num_Ratings'] >= self.config.min_book_ratings]
-            final_ratings.drop_duplicates(['User-ID', 'Title'], inplace=True)
+            candidates = np.flatnonzero(title_counts[joined_titles] >= self.config.min_book_ratings)
+            kept = first_pairs(candidates, user_codes[rating_rows], joined_titles, len(titles))
             
+            final_ratings = self._assemble_final_ratings(
+                books, ratings, rating_rows[kept], book_rows[kept], title_counts[joined_titles[kept]], kept
+            )
             logger.info(f"Final dataset shape: {final_ratings.shape}")
             
-            logger.info("Creating user-book matrix...")
-            user_book_matrix = final_ratings.pivot_table(
-                columns='User-ID', 
-                index='Title', 
-                values='Book-Rating'
+            logger.info("Creating sparse user-book matrix...")
+            user_book_matrix = self._build_sparse_matrix(
+                joined_titles[kept], titles, user_codes[rating_rows[kept]], user_ids,
+                final_ratings['Book-Rating'].to_numpy(dtype=np.float64)
             )
-            user_book_matrix.fillna(0, inplace=True)
             
-            logger.info(f"User-book matrix shape: {user_book_matrix.shape}")
+            logger.info(f"User-book matrix shape: {user_book_matrix.matrix.shape}, nnz: {user_book_matrix.matrix.nnz}")
             logger.info("Data transformation completed!")
             
             return final_ratings, user_book_matrix
@@ -67,3 +141,212 @@ class DataTransformation:
         except Exception as e:
             logger.error(f"Error in data transformation: {e}")
             raise e
+
+    def transform_chunks(self, books: pd.DataFrame,
+                         read_chunks: Callable[[], Iterable[pd.DataFrame]]) -> Tuple[pd.DataFrame, UserBookMatrix]:
+        """
+        Out-of-core transform_data: stream the ratings twice instead of holding them in memory
+        
+        Pass one counts ratings per user and per ISBN. Together with the books table the ISBN
+        counts bound each title's rating count from above, so titles that cannot reach
+        min_book_ratings are known before pass two. Pass two joins each chunk with the books,
+        counts the active users' ratings per title and keeps, as integer codes, only the
+        first rating of each (User-ID, Title) pair on the remaining titles; the exact
+        min_book_ratings filter then runs on those codes. Peak memory is one chunk plus
+        about 33 bytes per kept pair and the final outputs, and the result is identical to
+        transform_data on the whole file.
+        
+        Args:
+            books: Books DataFrame
+            read_chunks: Returns a fresh iterator over the ratings chunks, in file order, on every call
+            
+        Returns:
+            Tuple of (final_ratings_df, sparse user_book_matrix)
+        """
+        try:
+            logger.info("Starting out-of-core data transformation...")
+            isbn_index = pd.Index(books['ISBN'].dropna().unique())
+            book_isbn_codes = isbn_index.get_indexer(books['ISBN'])
+            title_codes, titles = pd.factorize(books['Title'], sort=True)
+            
+            logger.info("Pass 1: counting ratings per user and per ISBN...")
+            user_ids, user_counts = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+            isbn_counts = np.zeros(len(isbn_index), dtype=np.int64)
+            columns, n_ratings, n_chunks = None, 0, 0
+            for chunk in read_chunks():
+                columns = chunk.dtypes
+                user_ids, user_counts = self._merge_counts(user_ids, user_counts, chunk['User-ID'].to_numpy(dtype=np.int64))
+                chunk_isbns = self._isbn_codes(isbn_index, chunk['ISBN'])
+                isbn_counts += np.bincount(chunk_isbns[chunk_isbns >= 0], minlength=len(isbn_index))
+                n_ratings += len(chunk)
+                n_chunks += 1
+            if n_ratings == 0:
+                raise ValueError("Ratings dataset is empty")
+            
+            active_users = user_ids[user_counts > self.config.min_user_ratings]
+            logger.info(f"Read {n_ratings} ratings in {n_chunks} chunk(s), active users: {len(active_users)}")
+            # Every books row sharing an ISBN joins all of its ratings, whoever rated them
+            titled_books = (title_codes >= 0) & (book_isbn_codes >= 0)
+            title_bounds = np.bincount(
+                title_codes[titled_books], weights=isbn_counts[book_isbn_codes[titled_books]], minlength=len(titles)
+            )
+            possible_titles = title_bounds >= self.config.min_book_ratings
+            logger.info(f"Titles that can reach {self.config.min_book_ratings} ratings: {int(possible_titles.sum())}")
+            
+            logger.info("Pass 2: joining active users' ratings with books data...")
+            title_counts = np.zeros(len(titles), dtype=np.int64)
+            seen_pairs = np.empty(0, dtype=np.int64)
+            parts, offset = [], 0
+            for chunk in read_chunks():
+                chunk_users = chunk['User-ID'].to_numpy(dtype=np.int64)
+                rows = np.flatnonzero(np.isin(chunk_users, active_users))
+                rating_rows, book_rows = join_codes(
+                    self._isbn_codes(isbn_index, chunk['ISBN']), book_isbn_codes, len(isbn_index), rows
+                )
+                joined_titles = title_codes[book_rows]
+                titled = joined_titles >= 0
+                rating_rows, book_rows, joined_titles = rating_rows[titled], book_rows[titled], joined_titles[titled]
+                # Duplicate ratings still count towards Num_Ratings, so titles are counted before deduplicating
+                title_counts += np.bincount(joined_titles, minlength=len(titles))
+                
+                # Rows are labelled by their position in the joined table, so skipped rows still count
+                keep = np.flatnonzero(possible_titles[joined_titles])
+                keep, seen_pairs = self._first_new_pairs(
+                    keep, chunk_users[rating_rows[keep]] * len(titles) + joined_titles[keep], seen_pairs
+                )
+                parts.append({
+                    'users': chunk_users[rating_rows[keep]],
+                    'titles': joined_titles[keep].astype(np.int32),
+                    'book_rows': book_rows[keep].astype(np.int32),
+                    'ratings': chunk['Book-Rating'].to_numpy()[rating_rows[keep]],
+                    'positions': offset + keep,
+                })
+                offset += len(joined_titles)
+            del seen_pairs
+            kept_codes = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+            del parts
+            logger.info(f"Kept the first rating of {len(kept_codes['users'])} (User-ID, Title) pairs "
+                        f"out of {offset} joined ratings")
+            
+            logger.info(f"Filtering books with at least {self.config.min_book_ratings} ratings...")
+            kept = np.flatnonzero(title_counts[kept_codes['titles']] >= self.config.min_book_ratings)
+            present_users, user_codes = np.unique(kept_codes['users'][kept], return_inverse=True)
+            
+            kept_ratings = pd.DataFrame({
+                'User-ID': kept_codes['users'][kept].astype(columns['User-ID']),
+                'ISBN': books['ISBN'].to_numpy()[kept_codes['book_rows'][kept]],
+                'Book-Rating': kept_codes['ratings'][kept].astype(columns['Book-Rating']),
+            })[list(columns.index)]
+            final_ratings = self._assemble_final_ratings(
+                books, kept_ratings, np.arange(len(kept)), kept_codes['book_rows'][kept],
+                title_counts[kept_codes['titles'][kept]], kept_codes['positions'][kept]
+            )
+            logger.info(f"Final dataset shape: {final_ratings.shape}")
+            
+            logger.info("Creating sparse user-book matrix...")
+            user_book_matrix = self._build_sparse_matrix(
+                kept_codes['titles'][kept], titles, user_codes, present_users.astype(columns['User-ID']),
+                final_ratings['Book-Rating'].to_numpy(dtype=np.float64)
+            )
+            
+            logger.info(f"User-book matrix shape: {user_book_matrix.matrix.shape}, nnz: {user_book_matrix.matrix.nnz}")
+            logger.info("Out-of-core data transformation completed!")
+            
+            return final_ratings, user_book_matrix
+            
+        except Exception as e:
+            logger.error(f"Error in out-of-core data transformation: {e}")
+            raise e
+
+    @staticmethod
+    def _merge_counts(ids: np.ndarray, counts: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Add the occurrences of values to sorted (ids, counts) arrays"""
+        chunk_ids, chunk_counts = np.unique(values, return_counts=True)
+        merged_ids, inverse = np.unique(np.concatenate([ids, chunk_ids]), return_inverse=True)
+        merged_counts = np.zeros(len(merged_ids), dtype=np.int64)
+        np.add.at(merged_counts, inverse, np.concatenate([counts, chunk_counts]))
+        return merged_ids, merged_counts
+
+    @staticmethod
+    def _first_new_pairs(rows: np.ndarray, pair_keys: np.ndarray,
+                         seen_pairs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Keep the rows whose (user, title) key occurs for the first time, within the chunk and across chunks
+        
+        The chunk's new keys are already sorted, so they are merged into seen_pairs at their
+        searchsorted positions in one linear pass instead of re-sorting the whole set.
+        
+        Args:
+            rows: Candidate rows of the chunk, ascending
+            pair_keys: (user, title) key of every candidate row
+            seen_pairs: Sorted keys of the pairs kept from earlier chunks
+        
+        Returns:
+            Tuple of (kept rows, ascending; updated seen_pairs)
+        """
+        new_keys, first = np.unique(pair_keys, return_index=True)
+        positions = np.searchsorted(seen_pairs, new_keys)
+        unseen = seen_pairs[np.minimum(positions, len(seen_pairs) - 1)] != new_keys if len(seen_pairs) \
+            else np.ones(len(new_keys), dtype=bool)
+        seen_pairs = np.insert(seen_pairs, positions[unseen], new_keys[unseen])
+        return rows[np.sort(first[unseen])], seen_pairs
+
+    @staticmethod
+    def _isbn_codes(isbn_index: pd.Index, isbns: pd.Series) -> np.ndarray:
+        """Position of every ISBN in isbn_index, -1 when missing, looking up each distinct ISBN once"""
+        isbns = isbns.astype('category').cat
+        category_codes = np.append(isbn_index.get_indexer(isbns.categories), -1)
+        # Code -1 (no ISBN) picks the appended -1
+        return category_codes[isbns.codes.to_numpy()]
+
+    @staticmethod
+    def _assemble_final_ratings(books: pd.DataFrame, ratings: pd.DataFrame, rating_rows: np.ndarray,
+                                book_rows: np.ndarray, num_ratings: np.ndarray, labels: np.ndarray) -> pd.DataFrame:
+        """
+        Build the merged DataFrame for the kept rows only
+        
+        Columns, dtypes and index labels match the merge-based path: ratings columns with
+        the ISBN taken from books (as pd.merge does for a categorical/string key), the
+        other books columns, Num_Ratings, and each row's position in the joined table.
+        """
+        left = ratings.drop(columns='ISBN').iloc[rating_rows].reset_index(drop=True)
+        right = books.iloc[book_rows].reset_index(drop=True)
+        columns = list(ratings.columns) + [column for column in books.columns if column != 'ISBN']
+        final_ratings = pd.concat([left, right], axis=1)[columns]
+        final_ratings['Num_Ratings'] = num_ratings.astype(np.int64)
+        final_ratings.index = pd.Index(labels)
+        return final_ratings
+
+    def _build_sparse_matrix(self, title_codes: np.ndarray, titles: pd.Index, user_codes: np.ndarray,
+                             user_ids: pd.Index, book_ratings: np.ndarray) -> UserBookMatrix:
+        """
+        Build the titles × users rating matrix straight from integer codes
+        
+        Equivalent to pivot_table(index='Title', columns='User-ID').fillna(0) followed by
+        csr_matrix, but memory scales with the number of ratings instead of titles × users.
+        
+        Args:
+            title_codes: Sorted-order title code of every kept rating
+            titles: Labels of the title codes
+            user_codes: Sorted-order user code of every kept rating
+            user_ids: Labels of the user codes
+            book_ratings: Rating of every kept rating, one per (user, title)
+            
+        Returns:
+            UserBookMatrix with sorted title and user id labels
+        """
+        present_titles, row_codes = np.unique(title_codes, return_inverse=True)
+        present_users, col_codes = np.unique(user_codes, return_inverse=True)
+        
+        matrix = coo_matrix(
+            (book_ratings, (row_codes, col_codes)),
+            shape=(len(present_titles), len(present_users))
+        ).tocsr()
+        # Implicit 0 ratings are dropped by the dense path too
+        matrix.eliminate_zeros()
+        
+        return UserBookMatrix(
+            matrix=matrix,
+            titles=np.asarray(titles[present_titles], dtype=object),
+            user_ids=np.asarray(user_ids[present_users])
+        )
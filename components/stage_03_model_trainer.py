@@ -3,16 +3,188 @@ Model Training Component
 Trains K-Nearest Neighbors model for collaborative filtering and saves artifacts
 """
 
+import sys
+import time
 import logging
+import numpy as np
 import pandas as pd
-from typing import Tuple
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 from scipy.sparse import csr_matrix
 from sklearn.neighbors import NearestNeighbors
 from entity.config_entity import ModelTrainerConfig
-from utils.util import save_pickle
+from entity.artifact_entity import UserBookMatrix
+from components.ann_index import (
+    IVFIndex, exact_kneighbors, recall_at_k, normalize_rows, top_k,
+    quantize_vectors, dequantize_vectors, ranking_agreement
+)
+from components.title_search import TitleSearchIndex
+from utils.util import save_pickle, save_numpy, save_json
+from utils.artifact_bundle import add_csr, add_strings, publish_bundle
 
 logger = logging.getLogger(__name__)
 
+# Normalized vectors and output paths shared with pool workers through the initializer
+_worker_state = {}
+
+
+def _peak_rss_mb(who: int = None) -> Optional[float]:
+    """Peak resident set size of this process (or its finished children) in MB, None where unsupported"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who is None else who)
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _init_similarity_worker(vectors: csr_matrix, k: int, indices_path: Path, distances_path: Path):
+    """Pool initializer: receive the matrix once per worker instead of once per block"""
+    _worker_state.update(vectors=vectors, k=k, indices_path=indices_path, distances_path=distances_path)
+
+
+def _similarity_block(bounds: Tuple[int, int]) -> Tuple[int, int, Optional[float]]:
+    """
+    Score one row block against the whole catalog and write its top-K straight into the output memmaps
+    
+    Only the block_size × n_books similarity block is ever held in memory.
+    """
+    start, end = bounds
+    vectors, k = _worker_state['vectors'], _worker_state['k']
+    
+    sims = np.asarray((vectors[start:end] @ vectors.T).todense(), dtype=np.float32)
+    sims[np.arange(end - start), np.arange(start, end)] = -np.inf
+    block_indices, block_sims = top_k(sims, k)
+    del sims
+    
+    neighbor_indices = np.load(_worker_state['indices_path'], mmap_mode='r+')
+    neighbor_distances = np.load(_worker_state['distances_path'], mmap_mode='r+')
+    neighbor_indices[start:end] = block_indices
+    neighbor_distances[start:end] = 1.0 - block_sims
+    neighbor_indices.flush()
+    neighbor_distances.flush()
+    return start, end, _peak_rss_mb()
+
+
+def save_model_bundle(bundle_dir: Path, user_book_matrix: UserBookMatrix, book_metadata: pd.DataFrame,
+                      neighbor_indices: np.ndarray, neighbor_distances: np.ndarray, keep_versions: int = 3,
+                      vector_dtype: str = 'float32', **manifest_fields) -> dict:
+    """
+    Publish all serving artifacts as a new memory-mappable bundle version and make it current
+    
+    Args:
+        bundle_dir: Bundle root holding the versions and the current pointer
+        keep_versions: Published versions kept on disk
+        vector_dtype: Precision of the L2-normalized item vectors: 'float32', 'float16' or 'int8'
+        manifest_fields: Extra manifest entries, e.g. the version an incremental update started from
+    
+    Returns:
+        The manifest written with the bundle
+    """
+    matrix = user_book_matrix.matrix
+    arrays = {}
+    add_matrix_arrays(arrays, matrix, vector_dtype)
+    add_strings(arrays, 'titles', user_book_matrix.titles)
+    arrays['user_ids'] = user_book_matrix.user_ids.astype(np.int64)
+    add_strings(arrays, 'authors', book_metadata['Author'])
+    add_strings(arrays, 'years', book_metadata['Year'])
+    add_strings(arrays, 'publishers', book_metadata['Publisher'])
+    add_strings(arrays, 'image_urls', book_metadata['Image-URL'])
+    arrays['neighbor_indices'] = neighbor_indices
+    arrays['neighbor_distances'] = neighbor_distances
+    TitleSearchIndex.build(user_book_matrix.titles, matrix.getnnz(axis=1)).add_to_bundle(arrays)
+    
+    manifest = model_bundle_manifest(matrix, neighbor_indices.shape[1], vector_dtype, **manifest_fields)
+    return publish_bundle(arrays, manifest, bundle_dir, keep_versions)
+
+
+def add_matrix_arrays(arrays: Dict[str, np.ndarray], matrix: csr_matrix, vector_dtype: str):
+    """Store the rating matrix and its L2-normalized item vectors in bundle arrays"""
+    # Ratings are integers 0-10, so float32 stores them exactly at half the size
+    add_csr(arrays, 'matrix', matrix.astype(np.float32))
+    # Pre-normalized vectors share the matrix's indices/indptr, so serving needs no norm pass
+    arrays['item_vectors_data'], vector_scales = quantize_vectors(matrix, vector_dtype)
+    if vector_scales is not None:
+        arrays['item_vector_scales'] = vector_scales
+
+
+def model_bundle_manifest(matrix: csr_matrix, n_neighbors: int, vector_dtype: str, **manifest_fields) -> dict:
+    """Manifest of a model bundle, before publish_bundle makes its artifact_version unique"""
+    return {
+        'artifact_version': datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ'),
+        'n_books': int(matrix.shape[0]),
+        'n_users': int(matrix.shape[1]),
+        'nnz': int(matrix.nnz),
+        'n_neighbors': int(n_neighbors),
+        'vector_dtype': vector_dtype,
+        **manifest_fields,
+    }
+
+
+class BlockedSimilarity:
+    """
+    Exact all-pairs cosine top-K for catalogs too large for one similarity matrix
+    
+    Rows of the normalized matrix are scored in blocks across a process pool and each
+    block's top-K is written to disk as soon as it is done, so memory stays bounded by
+    n_workers × block_size × n_books similarities instead of n_books².
+    """
+    
+    def __init__(self, block_size: int, n_workers: int, output_dir: Path):
+        self.block_size = block_size
+        self.n_workers = n_workers
+        self.output_dir = output_dir
+
+    def fit(self, matrix: csr_matrix) -> "BlockedSimilarity":
+        self.vectors_ = normalize_rows(matrix).astype(np.float32)
+        return self
+
+    def kneighbors_all(self, n_neighbors: int) -> Tuple[np.ndarray, np.ndarray, dict]:
+        """
+        Top-K neighbors of every row, excluding the row itself
+        
+        Returns:
+            Tuple of (indices int32, distances float32, memory/timing report)
+        """
+        n_rows = self.vectors_.shape[0]
+        indices_path = Path(self.output_dir, 'similarity_indices.npy')
+        distances_path = Path(self.output_dir, 'similarity_distances.npy')
+        np.lib.format.open_memmap(indices_path, mode='w+', dtype=np.int32, shape=(n_rows, n_neighbors)).flush()
+        np.lib.format.open_memmap(distances_path, mode='w+', dtype=np.float32, shape=(n_rows, n_neighbors)).flush()
+        
+        blocks = [(start, min(start + self.block_size, n_rows)) for start in range(0, n_rows, self.block_size)]
+        init_args = (self.vectors_, n_neighbors, indices_path, distances_path)
+        
+        started = time.perf_counter()
+        worker_peaks = []
+        if self.n_workers == 1:
+            _init_similarity_worker(*init_args)
+            for done, block in enumerate(blocks, start=1):
+                worker_peaks.append(_similarity_block(block)[2])
+                logger.info(f"Similarity block {done}/{len(blocks)} written")
+        else:
+            with ProcessPoolExecutor(self.n_workers, initializer=_init_similarity_worker, initargs=init_args) as pool:
+                for done, (_, _, peak) in enumerate(pool.map(_similarity_block, blocks), start=1):
+                    worker_peaks.append(peak)
+                    logger.info(f"Similarity block {done}/{len(blocks)} written")
+        
+        measured_peaks = [peak for peak in worker_peaks if peak is not None]
+        report = {
+            'n_books': int(n_rows),
+            'k': int(n_neighbors),
+            'block_size': self.block_size,
+            'n_workers': self.n_workers,
+            'n_blocks': len(blocks),
+            'seconds': round(time.perf_counter() - started, 4),
+            'similarity_block_mb': round(min(self.block_size, n_rows) * n_rows * 4 / 2**20, 2),
+            'peak_rss_mb': _peak_rss_mb(),
+            'peak_worker_rss_mb': max(measured_peaks) if measured_peaks else None,
+        }
+        return np.load(indices_path), np.load(distances_path), report
+
 
 class ModelTrainer:
     """Trains and saves the recommendation model"""
@@ -20,34 +192,69 @@ class ModelTrainer:
     def __init__(self, config: ModelTrainerConfig):
         self.config = config
 
-    def train_model(self, final_ratings: pd.DataFrame, user_book_matrix: pd.DataFrame) -> NearestNeighbors:
+    def train_model(self, final_ratings: pd.DataFrame, user_book_matrix: UserBookMatrix) -> Union[NearestNeighbors, IVFIndex, BlockedSimilarity]:
         """
         Train KNN model for item-based collaborative filtering
         
         Args:
             final_ratings: Processed ratings DataFrame
-            user_book_matrix: User-book interaction matrix
+            user_book_matrix: Sparse user-book interaction matrix with labels
             
         Returns:
-            Trained NearestNeighbors model
+            Trained NearestNeighbors model, or IVFIndex / BlockedSimilarity for 'ivf' / 'blocked'
         """
         try:
             logger.info("Starting model training...")
             
-            logger.info("Converting to sparse matrix...")
-            sparse_user_book_matrix = csr_matrix(user_book_matrix.values)
+            sparse_user_book_matrix = user_book_matrix.matrix
             
             logger.info(f"Training KNN model with algorithm: {self.config.algorithm}")
-            model = NearestNeighbors(algorithm=self.config.algorithm, metric='cosine')
-            model.fit(sparse_user_book_matrix)
+            build_start = time.perf_counter()
+            if self.config.algorithm == 'ivf':
+                model = IVFIndex(
+                    n_lists=self.config.ivf_n_lists,
+                    n_probe=self.config.ivf_n_probe,
+                    n_iter=self.config.ivf_n_iter
+                ).fit(sparse_user_book_matrix)
+            elif self.config.algorithm == 'blocked':
+                model = BlockedSimilarity(
+                    block_size=self.config.similarity_block_size,
+                    n_workers=self.config.similarity_workers,
+                    output_dir=self.config.root_dir
+                ).fit(sparse_user_book_matrix)
+            else:
+                model = NearestNeighbors(algorithm=self.config.algorithm, metric='cosine')
+                model.fit(sparse_user_book_matrix)
+            build_seconds = time.perf_counter() - build_start
             
             logger.info("Model training completed!")
             
-            logger.info("Saving model and artifacts...")
-            save_pickle(model, self.config.model_path)
-            save_pickle(user_book_matrix.index, self.config.book_names_path)
-            save_pickle(final_ratings, self.config.final_ratings_path)
-            save_pickle(user_book_matrix, self.config.book_matrix_path)
+            logger.info(f"Precomputing top-{self.config.n_neighbors} neighbor table...")
+            neighbor_indices, neighbor_distances = self._build_neighbor_table(model, sparse_user_book_matrix)
+            logger.info(f"Neighbor table shape: {neighbor_indices.shape}")
+            
+            if isinstance(model, IVFIndex):
+                self._save_recall_report(model, sparse_user_book_matrix, neighbor_indices.shape[1], build_seconds)
+            
+            logger.info("Building per-book metadata store...")
+            book_metadata = self._build_book_metadata(final_ratings, user_book_matrix.titles)
+            
+            logger.info(f"Saving model and artifacts as {self.config.artifact_format}...")
+            if self.config.artifact_format == 'pickle':
+                save_pickle(model, self.config.model_path)
+                save_pickle(pd.Index(user_book_matrix.titles, name='Title'), self.config.book_names_path)
+                save_pickle(final_ratings, self.config.final_ratings_path)
+                save_pickle(user_book_matrix, self.config.book_matrix_path)
+                save_pickle(book_metadata, self.config.book_metadata_path)
+                save_numpy(neighbor_indices, self.config.neighbor_indices_path)
+                save_numpy(neighbor_distances, self.config.neighbor_distances_path)
+            else:
+                save_model_bundle(
+                    self.config.bundle_dir, user_book_matrix, book_metadata,
+                    neighbor_indices, neighbor_distances,
+                    keep_versions=self.config.keep_versions, vector_dtype=self.config.vector_dtype
+                )
+                self._save_precision_report(sparse_user_book_matrix, neighbor_indices.shape[1])
             
             logger.info("All artifacts saved successfully!")
             
@@ -56,3 +263,149 @@ class ModelTrainer:
         except Exception as e:
             logger.error(f"Error in model training: {e}")
             raise e
+
+    def _build_neighbor_table(self, model: Union[NearestNeighbors, IVFIndex, BlockedSimilarity],
+                              sparse_user_book_matrix: csr_matrix) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Query the fitted model once for every book and keep the top-K neighbors
+        
+        Args:
+            model: Fitted NearestNeighbors model, IVFIndex or BlockedSimilarity
+            sparse_user_book_matrix: Matrix the model was fitted on
+            
+        Returns:
+            Tuple of (neighbor_indices int32, neighbor_distances float32), both of shape (n_books, K)
+        """
+        n_books = sparse_user_book_matrix.shape[0]
+        k = min(self.config.n_neighbors, n_books - 1)
+        
+        if isinstance(model, IVFIndex):
+            book_ids = np.arange(n_books)
+            neighbor_distances, neighbor_indices = model.kneighbors(sparse_user_book_matrix, k, query_ids=book_ids)
+            # Books whose probed cells held fewer than K other books fall back to exact search
+            incomplete = (neighbor_indices < 0).any(axis=1)
+            if incomplete.any():
+                logger.info(f"{int(incomplete.sum())} books probed fewer than {k} candidates, using exact search")
+                neighbor_distances[incomplete], neighbor_indices[incomplete] = exact_kneighbors(
+                    sparse_user_book_matrix, sparse_user_book_matrix[incomplete], k, query_ids=book_ids[incomplete]
+                )
+            return neighbor_indices.astype(np.int32), neighbor_distances.astype(np.float32)
+        
+        if isinstance(model, BlockedSimilarity):
+            neighbor_indices, neighbor_distances, report = model.kneighbors_all(k)
+            logger.info(
+                f"Blocked similarity: {report['n_blocks']} blocks on {report['n_workers']} workers in "
+                f"{report['seconds']}s, peak RSS {report['peak_rss_mb']} MB (workers {report['peak_worker_rss_mb']} MB)"
+            )
+            save_json(report, Path(self.config.root_dir, 'similarity_report.json'))
+            return neighbor_indices, neighbor_distances
+        
+        distances, indices = model.kneighbors(sparse_user_book_matrix, n_neighbors=k + 1)
+        
+        # Drop each book from its own neighbor list. Duplicate rows tie at distance 0,
+        # so the book is not guaranteed to come first; when it is missing entirely,
+        # drop the farthest neighbor instead to keep exactly K per row.
+        is_self = indices == np.arange(n_books)[:, None]
+        is_self[~is_self.any(axis=1), -1] = True
+        
+        neighbor_indices = indices[~is_self].reshape(n_books, k).astype(np.int32)
+        neighbor_distances = distances[~is_self].reshape(n_books, k).astype(np.float32)
+        return neighbor_indices, neighbor_distances
+
+    def _save_recall_report(self, model: IVFIndex, sparse_user_book_matrix: csr_matrix, k: int, build_seconds: float):
+        """
+        Compare the IVF index with exact search on a sample of books and save recall@K and timings
+        
+        Args:
+            model: Fitted IVFIndex
+            sparse_user_book_matrix: Matrix the index was fitted on
+            k: Neighbors per book
+            build_seconds: Index build time
+        """
+        n_books = sparse_user_book_matrix.shape[0]
+        rng = np.random.default_rng(42)
+        sample = np.sort(rng.choice(n_books, min(self.config.ann_recall_sample, n_books), replace=False))
+        queries = sparse_user_book_matrix[sample]
+        
+        ann_start = time.perf_counter()
+        _, ann_indices = model.kneighbors(queries, k, query_ids=sample)
+        ann_seconds = time.perf_counter() - ann_start
+        
+        exact_start = time.perf_counter()
+        _, exact_indices = exact_kneighbors(sparse_user_book_matrix, queries, k, query_ids=sample)
+        exact_seconds = time.perf_counter() - exact_start
+        
+        report = {
+            'algorithm': 'ivf',
+            'n_books': int(n_books),
+            'n_lists': int(len(model.list_offsets_) - 1),
+            'n_probe': int(model.n_probe),
+            'k': int(k),
+            'sample_size': int(len(sample)),
+            f'recall_at_{k}': recall_at_k(ann_indices, exact_indices),
+            'build_seconds': round(build_seconds, 4),
+            'ann_query_seconds': round(ann_seconds, 4),
+            'exact_query_seconds': round(exact_seconds, 4),
+        }
+        logger.info(f"IVF recall@{k}: {report[f'recall_at_{k}']:.4f} on {len(sample)} sampled books")
+        save_json(report, Path(self.config.root_dir, 'ann_recall_report.json'))
+
+    def _save_precision_report(self, sparse_user_book_matrix: csr_matrix, k: int):
+        """
+        Compare the stored item vectors with float64 ones on a sample of books and save memory and ranking agreement
+        
+        Args:
+            sparse_user_book_matrix: Matrix the vectors were built from
+            k: Neighbors per book
+        """
+        n_books = sparse_user_book_matrix.shape[0]
+        rng = np.random.default_rng(42)
+        sample = np.sort(rng.choice(n_books, min(self.config.ann_recall_sample, n_books), replace=False))
+        matrix = sparse_user_book_matrix.astype(np.float64)
+        baseline = normalize_rows(matrix)
+        data, scales = quantize_vectors(matrix, self.config.vector_dtype)
+        vectors = dequantize_vectors(data, matrix.indices, matrix.indptr, matrix.shape, scales)
+        
+        # The stored vectors reuse the matrix's indices/indptr, a standalone float64 copy does not
+        baseline_bytes = baseline.data.nbytes + baseline.indices.nbytes + baseline.indptr.nbytes
+        stored_bytes = data.nbytes + (scales.nbytes if scales is not None else 0)
+        report = {
+            'vector_dtype': self.config.vector_dtype,
+            'n_books': int(n_books),
+            'nnz': int(matrix.nnz),
+            'k': int(k),
+            'sample_size': int(len(sample)),
+            'float64_vectors_mb': round(baseline_bytes / 2**20, 3),
+            'stored_vectors_mb': round(stored_bytes / 2**20, 3),
+            'memory_saved_mb': round((baseline_bytes - stored_bytes) / 2**20, 3),
+            # float32 vectors are served straight from the mapped bundle, others are widened per worker
+            'worker_private_mb': round((0 if self.config.vector_dtype == 'float32' else vectors.data.nbytes) / 2**20, 3),
+            **ranking_agreement(baseline, vectors, sample, k),
+        }
+        logger.info(
+            f"{self.config.vector_dtype} item vectors: {report['stored_vectors_mb']} MB vs "
+            f"{report['float64_vectors_mb']} MB in float64, recall@{k} {report[f'recall_at_{k}']:.4f} "
+            f"(tie-aware {report[f'tie_aware_recall_at_{k}']:.4f}) on {len(sample)} sampled books"
+        )
+        save_json(report, Path(self.config.root_dir, 'vector_precision_report.json'))
+
+    def _build_book_metadata(self, final_ratings: pd.DataFrame, book_names: np.ndarray) -> pd.DataFrame:
+        """
+        Deduplicate final_ratings to one metadata row per book, aligned with the matrix rows
+        
+        Args:
+            final_ratings: Processed ratings DataFrame
+            book_names: Matrix row labels (titles)
+            
+        Returns:
+            DataFrame with Title, Author, Year, Publisher and Image-URL where row i describes matrix row i
+        """
+        metadata_cols = ['Title', 'Author', 'Year', 'Publisher', 'Image-URL']
+        book_metadata = (
+            final_ratings[metadata_cols]
+            .drop_duplicates('Title')
+            .set_index('Title')
+            .reindex(book_names)
+            .reset_index()
+        )
+        return book_metadata
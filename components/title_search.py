@@ -0,0 +1,200 @@
+"""
+Title Search Index
+Prefix index over case- and accent-folded titles for search-as-you-type
+
+Every word-start suffix of every folded title is kept in one sorted array, so a prefix
+query is two binary searches whether it matches the start of a title or a later word.
+The arrays go into the artifact bundle and are memory-mapped like the rest of it.
+"""
+
+import re
+import bisect
+import difflib
+import logging
+import unicodedata
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+from utils.artifact_bundle import add_strings, get_strings, pack_strings, concat_strings, take_strings
+
+logger = logging.getLogger(__name__)
+
+NON_WORD = re.compile(r'[\W_]+')
+# Sorts after every folded key, so [query, query + KEY_END) covers all keys starting with query
+KEY_END = '\U0010ffff'
+
+
+def fold_text(text: str) -> str:
+    """Lowercase, strip accents and collapse punctuation to single spaces: 'Café, Noir!' → 'cafe noir'"""
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return NON_WORD.sub(' ', stripped.casefold()).strip()
+
+
+class TitleSearchIndex:
+    """
+    Ranks titles for a search query
+    
+    Ranking tiers, best first: the title starts with the query, a later word of the title
+    starts with the query, and (with token matching) the title contains words starting
+    with every query token in any order. Ties go to the title with more ratings.
+    """
+
+    def __init__(self, keys: Sequence[str], title_ids: np.ndarray, title_starts: np.ndarray, rating_counts: np.ndarray):
+        """
+        Args:
+            keys: Sorted word-start suffixes of the folded titles
+            title_ids: Title row of each key
+            title_starts: True where the key is the whole folded title
+            rating_counts: Ratings per title, used to break ties
+        """
+        self.keys = keys
+        self.title_ids = title_ids
+        self.title_starts = title_starts
+        self.rating_counts = rating_counts
+        # Tier offset larger than any rating count, so tiers never interleave
+        self._tier_step = int(np.max(rating_counts, initial=0)) + 1
+        self._vocabulary = None
+
+    @classmethod
+    def build(cls, titles: Sequence[str], rating_counts: np.ndarray) -> "TitleSearchIndex":
+        """Index titles in matrix row order"""
+        keys, title_ids, title_starts = [], [], []
+        for title_id, title in enumerate(titles):
+            tokens = fold_text(title).split()
+            for position in range(len(tokens)):
+                keys.append(' '.join(tokens[position:]))
+                title_ids.append(title_id)
+                title_starts.append(position == 0)
+        
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        index = cls(
+            keys=[keys[position] for position in order],
+            title_ids=np.asarray(title_ids, dtype=np.int32)[order],
+            title_starts=np.asarray(title_starts, dtype=bool)[order],
+            rating_counts=np.asarray(rating_counts, dtype=np.int32)
+        )
+        logger.info(f"Title search index built: {len(titles)} titles, {len(keys)} keys")
+        return index
+
+    def add_to_bundle(self, arrays: Dict[str, np.ndarray]):
+        """Store the index in an artifact bundle's arrays"""
+        add_strings(arrays, 'search_keys', self.keys)
+        arrays['search_title_ids'] = self.title_ids
+        arrays['search_title_starts'] = self.title_starts
+        arrays['rating_counts'] = self.rating_counts
+
+    def add_inserted_to_bundle(self, arrays: Dict[str, np.ndarray], old_to_new: np.ndarray, rows: np.ndarray,
+                               titles: Sequence[str], rating_counts: np.ndarray):
+        """
+        Store this index with titles inserted at new rows, as build on the new rows would
+        
+        The existing keys are copied as bytes instead of being folded and sorted again, so
+        the cost grows with the inserted titles and the size of the stored arrays.
+        
+        Args:
+            arrays: Artifact bundle arrays to add the index to
+            old_to_new: New row of every title row of this index
+            rows: New rows of the inserted titles, ascending
+            titles: Inserted titles
+            rating_counts: Ratings per title of the new rows
+        """
+        inserted = TitleSearchIndex.build(titles, np.zeros(len(titles), dtype=np.int32))
+        inserted_ids = np.asarray(rows, dtype=np.int32)[inserted.title_ids]
+        title_ids = old_to_new[self.title_ids].astype(np.int32)
+        
+        # Equal keys are ordered by title row, as build's stable sort leaves them
+        positions = np.empty(len(inserted.keys), dtype=np.int64)
+        for i, (key, title_id) in enumerate(zip(inserted.keys, inserted_ids)):
+            start, stop = bisect.bisect_left(self.keys, key), bisect.bisect_right(self.keys, key)
+            positions[i] = start + np.searchsorted(title_ids[start:stop], title_id, side='right')
+        order = np.insert(np.arange(len(self.keys)), positions, len(self.keys) + np.arange(len(inserted.keys)))
+        
+        keys = concat_strings((self.keys.offsets, self.keys.data), pack_strings(inserted.keys))
+        arrays['search_keys_offsets'], arrays['search_keys_data'] = take_strings(keys, order)
+        arrays['search_title_ids'] = np.concatenate([title_ids, inserted_ids])[order]
+        arrays['search_title_starts'] = np.concatenate([self.title_starts, inserted.title_starts])[order]
+        arrays['rating_counts'] = np.asarray(rating_counts, dtype=np.int32)
+
+    @classmethod
+    def from_bundle(cls, arrays: Dict[str, np.ndarray]) -> Optional["TitleSearchIndex"]:
+        """Index stored with add_to_bundle, None for bundles written before it existed"""
+        if 'search_title_ids' not in arrays:
+            return None
+        return cls(
+            keys=get_strings(arrays, 'search_keys'),
+            title_ids=arrays['search_title_ids'],
+            title_starts=arrays['search_title_starts'],
+            rating_counts=arrays['rating_counts']
+        )
+
+    def _prefix_range(self, prefix: str) -> slice:
+        return slice(bisect.bisect_left(self.keys, prefix), bisect.bisect_left(self.keys, prefix + KEY_END))
+
+    def _titles_with_all_tokens(self, tokens: List[str]) -> np.ndarray:
+        """Titles having a word starting with each token, in any order"""
+        matches = None
+        for token in sorted(tokens, key=len, reverse=True):
+            token_matches = np.unique(self.title_ids[self._prefix_range(token)])
+            matches = token_matches if matches is None else np.intersect1d(matches, token_matches, assume_unique=True)
+            if len(matches) == 0:
+                break
+        return matches
+
+    @property
+    def vocabulary(self) -> List[str]:
+        """Distinct folded words, built on the first fuzzy query"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted({key.split(' ', 1)[0] for key in self.keys})
+        return self._vocabulary
+
+    def _correct(self, tokens: List[str]) -> List[str]:
+        """Replace tokens that prefix no word with the closest known word"""
+        corrected = []
+        for token in tokens:
+            span = self._prefix_range(token)
+            if span.start == span.stop:
+                close = difflib.get_close_matches(token, self.vocabulary, n=1, cutoff=0.75)
+                token = close[0] if close else token
+            corrected.append(token)
+        return corrected
+
+    def search(self, query: str, limit: int = 10, match_tokens: bool = True, fuzzy: bool = False) -> np.ndarray:
+        """
+        Title rows matching query, best first
+        
+        Args:
+            query: Free text typed by the user
+            limit: Maximum number of titles returned
+            match_tokens: Also match titles containing every query word in any order
+            fuzzy: Correct misspelled words when nothing matches as typed
+        
+        Returns:
+            Array of at most limit title rows
+        """
+        tokens = fold_text(query).split()
+        if not tokens or limit <= 0:
+            return np.empty(0, dtype=np.int32)
+        
+        span = self._prefix_range(' '.join(tokens))
+        candidates = [self.title_ids[span]]
+        scores = [np.where(self.title_starts[span], 2, 1) * self._tier_step]
+        if match_tokens and len(tokens) > 1:
+            token_matches = self._titles_with_all_tokens(tokens)
+            candidates.append(token_matches)
+            scores.append(np.zeros(len(token_matches), dtype=np.int64))
+        
+        candidates = np.concatenate(candidates)
+        if len(candidates) == 0:
+            if fuzzy:
+                corrected = self._correct(tokens)
+                if corrected != tokens:
+                    return self.search(' '.join(corrected), limit, match_tokens, fuzzy=False)
+            return np.empty(0, dtype=np.int32)
+        
+        scores = np.concatenate(scores) + self.rating_counts[candidates]
+        # Best score per title first, then keep each title's first occurrence
+        order = np.argsort(-scores, kind='stable')
+        candidates, scores = candidates[order], scores[order]
+        _, first = np.unique(candidates, return_index=True)
+        first = np.sort(first)[:limit]
+        return candidates[first]
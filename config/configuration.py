@@ -3,7 +3,12 @@ from entity.config_entity import (
     DataIngestionConfig,
     DataValidationConfig,
     DataTransformationConfig,
-    ModelTrainerConfig
+    ModelTrainerConfig,
+    ServingConfig,
+    InstrumentationConfig,
+    LoggingConfig,
+    IncrementalUpdateConfig,
+    EvaluationConfig
 )
 from constant import CONFIG_FILE_PATH
 from utils.util import read_yaml, create_directories
@@ -22,7 +27,11 @@ class ConfigurationManager:
             root_dir=Path(config['root_dir']),
             books_file=Path(config['books_file']),
             users_file=Path(config['users_file']),
-            ratings_file=Path(config['ratings_file'])
+            ratings_file=Path(config['ratings_file']),
+            cache_dir=Path(config['cache_dir']),
+            use_cache=config['use_cache'],
+            cache_format=config['cache_format'],
+            csv_engine=config['csv_engine']
         )
         return data_ingestion_config
 
@@ -31,7 +40,11 @@ class ConfigurationManager:
         create_directories([config['root_dir']])
         
         data_validation_config = DataValidationConfig(
-            root_dir=Path(config['root_dir'])
+            root_dir=Path(config['root_dir']),
+            sample_fraction=config['sample_fraction'],
+            seed=config['seed'],
+            min_year=config['min_year'],
+            max_year=config['max_year']
         )
         return data_validation_config
 
@@ -42,7 +55,9 @@ class ConfigurationManager:
         data_transformation_config = DataTransformationConfig(
             root_dir=Path(config['root_dir']),
             min_user_ratings=config['min_user_ratings'],
-            min_book_ratings=config['min_book_ratings']
+            min_book_ratings=config['min_book_ratings'],
+            out_of_core=config['out_of_core'],
+            chunk_size=config['chunk_size']
         )
         return data_transformation_config
 
@@ -56,7 +71,99 @@ class ConfigurationManager:
             book_names_path=Path(config['book_names_path']),
             final_ratings_path=Path(config['final_ratings_path']),
             book_matrix_path=Path(config['book_matrix_path']),
+            book_metadata_path=Path(config['book_metadata_path']),
+            neighbor_indices_path=Path(config['neighbor_indices_path']),
+            neighbor_distances_path=Path(config['neighbor_distances_path']),
+            bundle_dir=Path(config['bundle_dir']),
+            artifact_format=config['artifact_format'],
+            keep_versions=config['keep_versions'],
             n_neighbors=config['n_neighbors'],
-            algorithm=config['algorithm']
+            algorithm=config['algorithm'],
+            ivf_n_lists=config['ivf_n_lists'],
+            ivf_n_probe=config['ivf_n_probe'],
+            ivf_n_iter=config['ivf_n_iter'],
+            similarity_block_size=config['similarity_block_size'],
+            similarity_workers=config['similarity_workers'],
+            ann_recall_sample=config['ann_recall_sample'],
+            vector_dtype=config['vector_dtype']
         )
         return model_trainer_config
+
+    def get_serving_config(self) -> ServingConfig:
+        config = self.config['serving']
+        
+        serving_config = ServingConfig(
+            metrics_dir=Path(config['metrics_dir']) if config['metrics_dir'] else None,
+            cache_backend=config['cache_backend'],
+            cache_max_entries=config['cache_max_entries'],
+            cache_ttl_seconds=config['cache_ttl_seconds'],
+            cache_eviction=config['cache_eviction'],
+            cache_path=Path(config['cache_path']),
+            reload_interval_seconds=config['reload_interval_seconds']
+        )
+        return serving_config
+
+    def get_instrumentation_config(self) -> InstrumentationConfig:
+        config = self.config['instrumentation']
+        
+        instrumentation_config = InstrumentationConfig(
+            run_report_path=Path(config['run_report_path']),
+            profile_dir=Path(config['profile_dir']),
+            trace_memory=config['trace_memory']
+        )
+        return instrumentation_config
+
+    def get_logging_config(self) -> LoggingConfig:
+        config = self.config['logging']
+        
+        logging_config = LoggingConfig(
+            log_dir=Path(config['log_dir']),
+            file_name=config['file_name'],
+            format=config['format'],
+            level=config['level'],
+            module_levels=config['module_levels'] or {},
+            sample_rates=config['sample_rates'] or {},
+            queue_size=config['queue_size'],
+            max_bytes=config['max_bytes'],
+            backup_count=config['backup_count']
+        )
+        return logging_config
+
+    def get_incremental_update_config(self) -> IncrementalUpdateConfig:
+        config = self.config['incremental_update']
+        transformation_config = self.config['data_transformation']
+        trainer_config = self.config['model_trainer']
+        create_directories([config['root_dir']])
+        
+        # Thresholds and neighbor settings are shared with the full pipeline so both produce the same artifacts
+        incremental_update_config = IncrementalUpdateConfig(
+            root_dir=Path(config['root_dir']),
+            state_dir=Path(config['state_dir']),
+            bundle_dir=Path(trainer_config['bundle_dir']),
+            enabled=config['enabled'],
+            artifact_format=trainer_config['artifact_format'],
+            keep_versions=trainer_config['keep_versions'],
+            vector_dtype=trainer_config['vector_dtype'],
+            min_user_ratings=transformation_config['min_user_ratings'],
+            min_book_ratings=transformation_config['min_book_ratings'],
+            n_neighbors=trainer_config['n_neighbors'],
+            block_size=trainer_config['similarity_block_size']
+        )
+        return incremental_update_config
+
+    def get_evaluation_config(self) -> EvaluationConfig:
+        config = self.config['evaluation']
+        create_directories([config['root_dir']])
+        
+        evaluation_config = EvaluationConfig(
+            root_dir=Path(config['root_dir']),
+            holdout_fraction=config['holdout_fraction'],
+            k=config['k'],
+            seed=config['seed'],
+            max_users=config['max_users'],
+            workers=config['workers'],
+            min_user_ratings=config['min_user_ratings'],
+            min_book_ratings=config['min_book_ratings'],
+            n_neighbors=config['n_neighbors']
+        )
+        return evaluation_config
@@ -0,0 +1,11 @@
+import numpy as np
+from pydantic import BaseModel, ConfigDict
+from scipy.sparse import csr_matrix
+
+
+class UserBookMatrix(BaseModel):
+    model_config = ConfigDict(frozen=True, arbitrary_types_allowed=True)
+    
+    matrix: csr_matrix      # books × users ratings, zeros not stored
+    titles: np.ndarray      # row labels, sorted
+    user_ids: np.ndarray    # column labels, sorted
@@ -1,6 +1,6 @@
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Literal
+from typing import Dict, List, Literal, Optional
 
 
 class DataIngestionConfig(BaseModel):
@@ -10,12 +10,20 @@ class DataIngestionConfig(BaseModel):
     books_file: Path
     users_file: Path
     ratings_file: Path
+    cache_dir: Path
+    use_cache: bool = Field(default=True, description="Reuse parsed CSVs while source files are unchanged")
+    cache_format: Literal['parquet', 'feather', 'pickle'] = Field(default='parquet', description="Parsed CSV cache format")
+    csv_engine: Literal['c', 'pyarrow'] = Field(default='c', description="pandas CSV parser engine")
 
 
 class DataValidationConfig(BaseModel):
     model_config = ConfigDict(frozen=True, protected_namespaces=())
     
     root_dir: Path
+    sample_fraction: Optional[float] = Field(default=None, gt=0, le=1, description="Share of ratings rows checked, None for all")
+    seed: int = Field(default=42, description="Seed of the ratings sample")
+    min_year: int = Field(default=1800, description="Earliest realistic publication year")
+    max_year: Optional[int] = Field(default=None, description="Latest realistic publication year, None for the current year")
 
 
 class DataTransformationConfig(BaseModel):
@@ -24,6 +32,8 @@ class DataTransformationConfig(BaseModel):
     root_dir: Path
     min_user_ratings: int = Field(gt=0, description="Minimum user ratings must be positive")
     min_book_ratings: int = Field(gt=0, description="Minimum book ratings must be positive")
+    out_of_core: bool = Field(default=False, description="Stream the ratings CSV in two passes instead of loading it")
+    chunk_size: int = Field(default=1_000_000, gt=0, description="Ratings rows read per chunk when out of core")
 
 
 class ModelTrainerConfig(BaseModel):
@@ -34,5 +44,85 @@ class ModelTrainerConfig(BaseModel):
     book_names_path: Path
     final_ratings_path: Path
     book_matrix_path: Path
+    book_metadata_path: Path
+    neighbor_indices_path: Path
+    neighbor_distances_path: Path
+    bundle_dir: Path
+    artifact_format: Literal['numpy', 'pickle'] = Field(default='numpy', description="Artifact storage format")
+    keep_versions: int = Field(default=3, gt=0, description="Published bundle versions kept on disk")
     n_neighbors: int = Field(gt=0, description="Number of neighbors must be positive")
-    algorithm: Literal['auto', 'ball_tree', 'kd_tree', 'brute'] = Field(default='brute', description="KNN algorithm type")
+    algorithm: Literal['auto', 'ball_tree', 'kd_tree', 'brute', 'ivf', 'blocked'] = Field(default='brute', description="KNN algorithm type")
+    ivf_n_lists: Optional[int] = Field(default=None, gt=0, description="IVF cells, defaults to sqrt(n_books)")
+    ivf_n_probe: int = Field(default=8, gt=0, description="IVF cells scanned per query, higher means better recall")
+    ivf_n_iter: int = Field(default=10, gt=0, description="Spherical k-means iterations")
+    similarity_block_size: int = Field(default=1024, gt=0, description="Rows scored per block by the blocked engine")
+    similarity_workers: int = Field(default=1, gt=0, description="Processes used by the blocked engine")
+    ann_recall_sample: int = Field(default=1000, gt=0, description="Books sampled for the recall@K report")
+    vector_dtype: Literal['float32', 'float16', 'int8'] = Field(default='float32', description="Precision of the stored L2-normalized item vectors")
+
+
+class ServingConfig(BaseModel):
+    model_config = ConfigDict(frozen=True, protected_namespaces=())
+    
+    metrics_dir: Optional[Path] = Field(default=None, description="Directory shared by workers for /metrics, None for in-process")
+    cache_backend: Literal['memory', 'sqlite', 'none'] = Field(default='memory', description="Response cache backend")
+    cache_max_entries: int = Field(default=4096, ge=0, description="Cached responses kept before evicting")
+    cache_ttl_seconds: Optional[float] = Field(default=None, gt=0, description="Response lifetime, None for no expiry")
+    cache_eviction: Literal['lru', 'fifo'] = Field(default='lru', description="Response cache eviction policy")
+    cache_path: Path = Field(default=Path('artifacts/cache/responses.sqlite3'), description="SQLite file of the shared cache")
+    reload_interval_seconds: Optional[float] = Field(default=5, gt=0, description="Seconds between checks for a new bundle, None disables")
+
+
+class InstrumentationConfig(BaseModel):
+    model_config = ConfigDict(frozen=True, protected_namespaces=())
+    
+    run_report_path: Path
+    profile_dir: Path
+    trace_memory: bool = Field(default=False, description="Record tracemalloc peaks per stage")
+
+
+LogLevel = Literal['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
+
+
+class LoggingConfig(BaseModel):
+    model_config = ConfigDict(frozen=True, protected_namespaces=())
+    
+    log_dir: Path
+    file_name: Optional[str] = Field(default=None, description="Log file shared by every run, None for one timestamped file per process group")
+    format: Literal['json', 'text'] = Field(default='json', description="One JSON object per line, or plain text")
+    level: LogLevel = Field(default='INFO', description="Root logger level")
+    module_levels: Dict[str, LogLevel] = Field(default_factory=dict, description="Levels of individual loggers")
+    sample_rates: Dict[str, float] = Field(default_factory=dict, description="Share of records below WARNING kept per logger")
+    queue_size: int = Field(default=10000, gt=0, description="Records buffered for the writer thread before new ones are dropped")
+    max_bytes: Optional[int] = Field(default=None, gt=0, description="Rotate the log file at this size, None never rotates")
+    backup_count: int = Field(default=5, ge=0, description="Rotated log files kept")
+
+
+class IncrementalUpdateConfig(BaseModel):
+    model_config = ConfigDict(frozen=True, protected_namespaces=())
+    
+    root_dir: Path
+    state_dir: Path
+    bundle_dir: Path
+    enabled: bool = Field(default=False, description="Build the delta state during in-memory training runs")
+    artifact_format: Literal['numpy', 'pickle'] = Field(default='numpy', description="Artifact storage format")
+    keep_versions: int = Field(default=3, gt=0, description="Published bundle versions kept on disk")
+    vector_dtype: Literal['float32', 'float16', 'int8'] = Field(default='float32', description="Precision of the stored L2-normalized item vectors")
+    min_user_ratings: int = Field(gt=0, description="Minimum user ratings must be positive")
+    min_book_ratings: int = Field(gt=0, description="Minimum book ratings must be positive")
+    n_neighbors: int = Field(gt=0, description="Number of neighbors must be positive")
+    block_size: int = Field(default=1024, gt=0, description="Rows scored per block when recomputing neighbors")
+
+
+class EvaluationConfig(BaseModel):
+    model_config = ConfigDict(frozen=True, protected_namespaces=())
+    
+    root_dir: Path
+    holdout_fraction: float = Field(default=0.2, gt=0, lt=1, description="Share of explicit ratings held out")
+    k: int = Field(default=10, gt=0, description="Cutoff of recall@K and NDCG@K")
+    seed: int = Field(default=42, description="Seed of the holdout split and user sampling")
+    max_users: int = Field(default=2000, gt=0, description="Users evaluated per setting")
+    workers: int = Field(default=1, gt=0, description="Processes evaluating threshold pairs")
+    min_user_ratings: List[int] = Field(min_length=1, description="min_user_ratings values to sweep")
+    min_book_ratings: List[int] = Field(min_length=1, description="min_book_ratings values to sweep")
+    n_neighbors: List[int] = Field(min_length=1, description="n_neighbors values to sweep")
@@ -0,0 +1,30 @@
+"""
+Gunicorn Settings
+Loaded automatically by `gunicorn app:app` when started from the project root
+"""
+
+from config.configuration import ConfigurationManager
+from logger.log import setup_logging, shutdown_logging
+from utils.metrics import clear_metrics_directory, mark_process_dead
+
+config_manager = ConfigurationManager()
+metrics_dir = config_manager.get_serving_config().metrics_dir
+# Set up in the master so every worker inherits the same log file
+setup_logging(config_manager.get_logging_config())
+
+
+def on_starting(server):
+    """Start every server with empty metrics so counters from a previous run are not summed in"""
+    if metrics_dir is not None:
+        clear_metrics_directory(metrics_dir)
+
+
+def child_exit(server, worker):
+    """Keep an exited worker's counters for /metrics but stop reporting its gauges"""
+    if metrics_dir is not None:
+        mark_process_dead(metrics_dir, worker.pid)
+
+
+def worker_exit(server, worker):
+    """Write the worker's queued log records before it exits"""
+    shutdown_logging()
@@ -1,16 +1,317 @@
+"""
+Logging Setup
+Queue-based, optionally JSON-structured logging shared by every process of a run or server
+
+Callers only put records on a bounded in-memory queue; a listener thread formats and
+writes them. Request-rate loggers can be sampled before their records are queued, and
+when the queue is full records are dropped and counted instead of blocking the caller.
+The first process to set up logging picks the log file and passes it on to the
+processes it starts (gunicorn workers, process pools) through the environment, so a
+process group writes a single log.
+
+Usage:
+    from logger.log import setup_logging
+    setup_logging(ConfigurationManager().get_logging_config())
+"""
+
 import os
-import sys
+import json
+import queue
+import atexit
+import random
 import logging
-from datetime import datetime
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from multiprocessing.util import Finalize, register_after_fork
+from typing import Callable, Dict, Optional
+from entity.config_entity import LoggingConfig
+
+# Set by the first process that sets up logging and inherited by the processes it starts
+LOG_FILE_ENV = 'BOOK_RECOMMENDER_LOG_FILE'
+TEXT_FORMAT = "[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s"
+OUTCOMES = ('queued', 'sampled_out', 'dropped')
+
+# Attributes every LogRecord has; anything else was passed with extra= and goes into the JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_runtime = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including the fields passed with extra="""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'line': record.lineno,
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a share of the records below WARNING from the given loggers and their children
+    
+    Args:
+        rates: Logger name → share of its records kept
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}
+
+    def rate(self, name: str) -> float:
+        """Sampling rate of a logger: its own, else its closest configured parent's, else 1"""
+        if name not in self._resolved:
+            matches = [logger for logger in self.rates if name == logger or name.startswith(logger + '.')]
+            self._resolved[name] = self.rates[max(matches, key=len)] if matches else 1.0
+        return self._resolved[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate(record.name)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler that drops records instead of blocking or raising when its queue is full
+    
+    Every record is counted by outcome (queued, sampled_out, dropped) in `counts`, and
+    passed to `count` when one is set, e.g. a metrics counter.
+    """
+
+    def __init__(self, log_queue: queue.Queue, count: Optional[Callable[[str], None]] = None):
+        super().__init__(log_queue)
+        self.count = count
+        self.counts = dict.fromkeys(OUTCOMES, 0)
+
+    def _record_outcome(self, outcome: str):
+        self.counts[outcome] += 1
+        if self.count is not None:
+            self.count(outcome)
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        kept = self.filter(record)
+        if not kept:
+            self._record_outcome('sampled_out')
+        else:
+            self.emit(record)
+        return kept
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Merge the arguments into the message and render any traceback, keeping extra fields
+        
+        The listener thread may format the record long after the arguments have changed,
+        and tracebacks cannot be pickled, so both are resolved in the calling thread. A
+        record with neither is queued as it is, which is most of them; the others are
+        copied first, as other handlers may still see the original.
+        """
+        if not record.args and not record.exc_info:
+            return record
+        prepared = logging.LogRecord.__new__(logging.LogRecord)
+        prepared.__dict__.update(vars(record))
+        prepared.msg = record.getMessage()
+        prepared.args = None
+        if record.exc_info:
+            prepared.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            prepared.exc_info = None
+        return prepared
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            self._record_outcome('queued')
+        except queue.Full:
+            self._record_outcome('dropped')
+
+
+class SharedRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler for a file that several processes append to
+    
+    Sizes are read from the file rather than this process's stream, rollovers are
+    serialized with a lock file, and a process whose file was rotated by another
+    reopens the new one before writing.
+    """
+
+    def __init__(self, filename: Path, max_bytes: int = 0, backup_count: int = 0):
+        super().__init__(filename, mode='a', maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.inode = os.fstat(self.stream.fileno()).st_ino
+
+    def _reopen_if_rotated(self):
+        """Switch to the current file at baseFilename if another process has rotated it away"""
+        try:
+            current = os.stat(self.baseFilename).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != self.inode:
+            if self.stream is not None:
+                self.stream.close()
+            self.stream = self._open()
+            self.inode = os.fstat(self.stream.fileno()).st_ino
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self._reopen_if_rotated()
+        except OSError:
+            self.handleError(record)
+            return
+        super().emit(record)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.maxBytes <= 0:
+            return False
+        try:
+            size = os.stat(self.baseFilename).st_size
+        except FileNotFoundError:
+            return False
+        return size + len(self.format(record)) + len(self.terminator) >= self.maxBytes
+
+    def doRollover(self):
+        with _file_lock(f"{self.baseFilename}.lock"):
+            # Another process may have rotated the file while this one waited for the lock
+            inode = self.inode
+            self._reopen_if_rotated()
+            if self.inode == inode:
+                super().doRollover()
+                self.inode = os.fstat(self.stream.fileno()).st_ino
+
+
+class _DrainingQueueListener(QueueListener):
+    """QueueListener whose stop waits for room in a full queue instead of raising queue.Full"""
+    
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive advisory lock on path, a no-op where fcntl is unavailable"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class LoggingRuntime:
+    """The queue, handler and listener thread of this process's logging"""
+
+    def __init__(self, config: LoggingConfig, log_path: Path, file_handler: logging.Handler,
+                 count: Optional[Callable[[str], None]] = None):
+        self.config = config
+        self.log_path = log_path
+        self.file_handler = file_handler
+        self.handler = BoundedQueueHandler(queue.Queue(config.queue_size), count)
+        if config.sample_rates:
+            self.handler.addFilter(SamplingFilter(config.sample_rates))
+        self.pid = os.getpid()
+        self.listener = None
+
+    def start(self):
+        """Start a listener thread writing the queued records to the log file"""
+        self.listener = _DrainingQueueListener(self.handler.queue, self.file_handler, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        """Write every record still queued, then stop the listener thread"""
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+
+    def after_fork(self):
+        """In a forked child: the parent's listener thread is gone, so start a fresh queue and listener"""
+        self.pid = os.getpid()
+        self.handler.queue = queue.Queue(self.config.queue_size)
+        self.handler.counts = dict.fromkeys(OUTCOMES, 0)
+        self.start()
+    
+    def stop_with_process(self):
+        """
+        In a multiprocessing child: stop through a finalizer
+        
+        Those children leave through os._exit, which skips atexit, and clear the
+        finalizers they inherit after the fork hooks ran, so this runs from
+        multiprocessing's own after-fork registry.
+        """
+        Finalize(self, self.stop, exitpriority=0)
+
+
+def _log_path(config: LoggingConfig) -> Path:
+    """The process group's log file: inherited from the parent process, else named by the config"""
+    inherited = os.environ.get(LOG_FILE_ENV)
+    if inherited:
+        return Path(inherited)
+    file_name = config.file_name or f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
+    log_path = Path(config.log_dir, file_name).resolve()
+    os.environ[LOG_FILE_ENV] = str(log_path)
+    return log_path
+
+
+def _after_fork_in_child():
+    if _runtime is not None:
+        _runtime.after_fork()
+
 
-LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
-logs_path = os.path.join(os.getcwd(), "logs", LOG_FILE)
-os.makedirs(logs_path, exist_ok=True)
+def setup_logging(config: LoggingConfig, count: Optional[Callable[[str], None]] = None) -> LoggingRuntime:
+    """
+    Route all logging in this process through a bounded queue to the process group's log file
+    
+    Calling it again in the same process returns the running setup, only attaching count.
+    
+    Args:
+        config: Logging configuration
+        count: Called with 'queued', 'sampled_out' or 'dropped' for every record, e.g. a metrics counter
+    
+    Returns:
+        LoggingRuntime holding the handler, its per-outcome counts and the listener
+    """
+    global _runtime
+    if _runtime is not None:
+        if count is not None:
+            _runtime.handler.count = count
+        return _runtime
+    
+    log_path = _log_path(config)
+    os.makedirs(log_path.parent, exist_ok=True)
+    file_handler = SharedRotatingFileHandler(log_path, config.max_bytes or 0, config.backup_count)
+    file_handler.setFormatter(JsonFormatter() if config.format == 'json' else logging.Formatter(TEXT_FORMAT))
+    
+    runtime = LoggingRuntime(config, log_path, file_handler, count)
+    root = logging.getLogger()
+    root.setLevel(config.level)
+    root.addHandler(runtime.handler)
+    for name, level in config.module_levels.items():
+        logging.getLogger(name).setLevel(level)
+    
+    runtime.start()
+    _runtime = runtime
+    atexit.register(shutdown_logging)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_after_fork_in_child)
+    register_after_fork(runtime, LoggingRuntime.stop_with_process)
+    return runtime
 
-LOG_FILE_PATH = os.path.join(logs_path, LOG_FILE)
 
-logging.basicConfig(
-    filename=LOG_FILE_PATH,
-    format="[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
+def shutdown_logging():
+    """Flush and stop this process's logging, e.g. from gunicorn's worker_exit hook"""
+    if _runtime is not None:
+        _runtime.stop()
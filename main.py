@@ -3,16 +3,73 @@ Main entry point for training the Book Recommender model
 Executes the complete ML pipeline from data ingestion to model training
 """
 
-from logger import log
+from logger.log import setup_logging
+from config.configuration import ConfigurationManager
 from pipeline.training_pipeline import TrainingPipeline
+from pipeline.incremental_pipeline import IncrementalPipeline
+from pipeline.evaluation_pipeline import EvaluationPipeline
+import argparse
 import logging
 
 logger = logging.getLogger(__name__)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the Book Recommender model")
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help="Ignore stage checkpoints and the ingestion cache and rebuild every stage "
+             "(needed after code changes, which checkpoints do not track)"
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help="Dump a cProfile file per stage into instrumentation.profile_dir "
+             "(inspect with python -m pstats or snakeviz)"
+    )
+    parser.add_argument(
+        '--delta',
+        metavar='RATINGS_CSV',
+        help="Apply new ratings (BX-Book-Ratings.csv format) to the current artifacts "
+             "instead of retraining from scratch"
+    )
+    parser.add_argument(
+        '--evaluate',
+        action='store_true',
+        help="Hold out ratings and sweep the thresholds and n_neighbors listed under evaluation "
+             "in config.yaml, reporting recall@K, NDCG@K, coverage, matrix size and latency"
+    )
+    args = parser.parse_args()
+    setup_logging(ConfigurationManager().get_logging_config())
+    
+    if args.evaluate:
+        try:
+            results = EvaluationPipeline().run_pipeline()
+            print(f"\n✅ Evaluated {len(results)} settings; see the evaluation root_dir for the full table.")
+        except Exception as e:
+            logger.error(f"Evaluation failed: {e}")
+            print(f"\n❌ Error: {e}")
+            raise e
+        raise SystemExit(0)
+    
+    if args.delta:
+        try:
+            logger.info(f"Applying ratings delta {args.delta}")
+            report = IncrementalPipeline().run_pipeline(args.delta)
+            if report is None:
+                print("\n✅ Delta already applied, artifacts unchanged.")
+            else:
+                print(f"\n✅ Published artifact version {report['artifact_version']} "
+                      f"({report['new_ratings']} new ratings, {report['affected_books']} books affected).")
+        except Exception as e:
+            logger.error(f"Incremental update failed: {e}")
+            print(f"\n❌ Error: {e}")
+            raise e
+        raise SystemExit(0)
+    
     try:
         logger.info("Starting Book Recommender Training Pipeline")
-        pipeline = TrainingPipeline()
+        pipeline = TrainingPipeline(force=args.force, profile=args.profile)
         pipeline.run_pipeline()
         logger.info("Training Pipeline completed successfully!")
         print("\n✅ Training completed! Run 'python app.py' to start the Flask application.")
@@ -0,0 +1,28 @@
+import logging
+from config.configuration import ConfigurationManager
+from components.stage_00_data_ingestion import DataIngestion
+from components.evaluation import ModelEvaluator
+
+logger = logging.getLogger(__name__)
+
+
+class EvaluationPipeline:
+    def __init__(self):
+        self.config_manager = ConfigurationManager()
+        self.ingestion_config = self.config_manager.get_data_ingestion_config()
+        self.evaluation_config = self.config_manager.get_evaluation_config()
+
+    def run_pipeline(self):
+        """Load the ratings once and sweep the evaluation grid over them"""
+        try:
+            logger.info("=" * 50)
+            logger.info("Offline Evaluation Started")
+            books, _, ratings = DataIngestion(self.ingestion_config).load_data()
+            results = ModelEvaluator(self.evaluation_config).evaluate(books, ratings)
+            logger.info("Offline Evaluation Completed")
+            logger.info("=" * 50)
+            return results
+        
+        except Exception as e:
+            logger.error(f"Offline evaluation failed: {e}")
+            raise e
@@ -0,0 +1,45 @@
+import logging
+from pathlib import Path
+from config.configuration import ConfigurationManager
+from components.incremental_update import IncrementalUpdater
+from pipeline.training_pipeline import CHECKPOINT_FILE
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalPipeline:
+    def __init__(self):
+        self.config_manager = ConfigurationManager()
+        self.incremental_config = self.config_manager.get_incremental_update_config()
+        self.transformation_config = self.config_manager.get_data_transformation_config()
+        self.trainer_config = self.config_manager.get_model_trainer_config()
+
+    def invalidate_training_checkpoints(self):
+        """
+        Make the next full run rebuild transformation and training from the source CSVs
+        
+        Its checkpoints describe the artifacts before the delta, so reusing them would
+        silently retrain on stale ratings while the incremental state holds newer ones.
+        """
+        for root_dir in (self.transformation_config.root_dir, self.trainer_config.root_dir):
+            checkpoint_path = Path(root_dir, CHECKPOINT_FILE)
+            if checkpoint_path.exists():
+                checkpoint_path.unlink()
+        logger.info("Append applied deltas to the ratings CSV to keep them in the next full run")
+
+    def run_pipeline(self, delta_path: Path):
+        """Apply a ratings delta to the current artifacts"""
+        try:
+            logger.info("=" * 50)
+            logger.info("Incremental Update Started")
+            updater = IncrementalUpdater(self.incremental_config)
+            report = updater.apply_delta(delta_path)
+            if report is not None:
+                self.invalidate_training_checkpoints()
+            logger.info("Incremental Update Completed")
+            logger.info("=" * 50)
+            return report
+        
+        except Exception as e:
+            logger.error(f"Incremental update failed: {e}")
+            raise e
@@ -1,25 +1,67 @@
+import os
+import shutil
 import logging
+from pathlib import Path
+from datetime import datetime, timezone
 from config.configuration import ConfigurationManager
+from logger.log import setup_logging
 from components.stage_00_data_ingestion import DataIngestion
 from components.stage_01_data_validation import DataValidation
 from components.stage_02_data_transformation import DataTransformation
 from components.stage_03_model_trainer import ModelTrainer
+from components.incremental_update import IncrementalUpdater
+from utils.instrumentation import RunReport, stage_sizes
+from utils.artifact_bundle import CURRENT_FILE
+from utils.util import (
+    save_pickle, load_pickle, save_json, load_json,
+    cached_file_sha256, compute_fingerprint
+)
 
 logger = logging.getLogger(__name__)
 
+CHECKPOINT_FILE = "checkpoint.json"
+
 
 class TrainingPipeline:
-    def __init__(self):
+    def __init__(self, force: bool = False, profile: bool = False):
+        """
+        Args:
+            force: Ignore stage checkpoints and the ingestion cache and rebuild every stage
+            profile: Dump a cProfile file per stage into instrumentation.profile_dir
+        """
         self.config_manager = ConfigurationManager()
+        self.force = force
+        self.profile = profile
+        self.ingestion_config = self.config_manager.get_data_ingestion_config()
+        self.validation_config = self.config_manager.get_data_validation_config()
+        self.transformation_config = self.config_manager.get_data_transformation_config()
+        self.trainer_config = self.config_manager.get_model_trainer_config()
+        self.incremental_config = self.config_manager.get_incremental_update_config()
+        self.instrumentation_config = self.config_manager.get_instrumentation_config()
+        self.run_report = self.new_run_report()
+
+    def new_run_report(self) -> RunReport:
+        """Fresh per-run stage report configured from the instrumentation section"""
+        return RunReport(
+            trace_memory=self.instrumentation_config.trace_memory,
+            profile_dir=self.instrumentation_config.profile_dir if self.profile else None
+        )
 
     def run_data_ingestion(self):
         """Run data ingestion stage"""
         try:
             logger.info("=" * 50)
             logger.info("STAGE 1: Data Ingestion Started")
-            config = self.config_manager.get_data_ingestion_config()
-            data_ingestion = DataIngestion(config)
-            books, users, ratings = data_ingestion.load_data()
+            with self.run_report.stage('data_ingestion') as record:
+                data_ingestion = DataIngestion(self.ingestion_config)
+                if self.transformation_config.out_of_core:
+                    # Ratings are streamed, and validated, by the transformation
+                    books, users = data_ingestion.load_catalog()
+                    ratings = None
+                    record['outputs'] = stage_sizes(books=books, users=users)
+                else:
+                    books, users, ratings = data_ingestion.load_data()
+                    record['outputs'] = stage_sizes(books=books, users=users, ratings=ratings)
             logger.info("STAGE 1: Data Ingestion Completed")
             logger.info("=" * 50)
             return books, users, ratings
@@ -32,23 +74,68 @@ class TrainingPipeline:
         try:
             logger.info("=" * 50)
             logger.info("STAGE 2: Data Validation Started")
-            config = self.config_manager.get_data_validation_config()
-            data_validation = DataValidation(config)
-            data_validation.validate_data(books, users, ratings)
+            with self.run_report.stage('data_validation') as record:
+                data_validation = DataValidation(self.validation_config)
+                if ratings is None:
+                    record['inputs'] = stage_sizes(books=books, users=users)
+                    data_validation.validate_catalog(books, users)
+                else:
+                    record['inputs'] = stage_sizes(books=books, users=users, ratings=ratings)
+                    data_validation.validate_data(books, users, ratings)
             logger.info("STAGE 2: Data Validation Completed")
             logger.info("=" * 50)
         except Exception as e:
             logger.error(f"Error in data validation stage: {e}")
             raise e
 
-    def run_data_transformation(self, books, ratings):
-        """Run data transformation stage"""
+    def stream_ratings(self, books, users):
+        """
+        Chunk reader for the out-of-core transformation
+        
+        Returns a function giving a fresh iterator over the ratings chunks on every call;
+        the first pass also validates them, so the ratings are never read just for validation.
+        """
+        data_ingestion = DataIngestion(self.ingestion_config)
+        data_validation = DataValidation(self.validation_config)
+        passes = 0
+        
+        def read_chunks():
+            nonlocal passes
+            passes += 1
+            chunks = data_ingestion.iter_ratings(self.transformation_config.chunk_size)
+            return data_validation.validate_chunks(books, users, chunks) if passes == 1 else chunks
+        return read_chunks
+
+    def run_data_transformation(self, books, users, ratings):
+        """Run data transformation stage and persist its outputs for later resumes"""
         try:
             logger.info("=" * 50)
             logger.info("STAGE 3: Data Transformation Started")
-            config = self.config_manager.get_data_transformation_config()
-            data_transformation = DataTransformation(config)
-            final_ratings, user_book_matrix = data_transformation.transform_data(books, ratings)
+            with self.run_report.stage('data_transformation') as record:
+                data_transformation = DataTransformation(self.transformation_config)
+                if self.transformation_config.out_of_core:
+                    record['inputs'] = stage_sizes(books=books)
+                    final_ratings, user_book_matrix = data_transformation.transform_chunks(
+                        books, self.stream_ratings(books, users)
+                    )
+                else:
+                    record['inputs'] = stage_sizes(books=books, ratings=ratings)
+                    final_ratings, user_book_matrix = data_transformation.transform_data(books, ratings)
+                save_pickle(final_ratings, Path(self.transformation_config.root_dir, 'final_ratings.pkl'))
+                save_pickle(user_book_matrix, Path(self.transformation_config.root_dir, 'user_book_matrix.pkl'))
+                record['outputs'] = stage_sizes(final_ratings=final_ratings, user_book_matrix=user_book_matrix)
+            if not self.incremental_config.enabled:
+                shutil.rmtree(self.incremental_config.state_dir, ignore_errors=True)
+                self.run_report.skip('incremental_state', 'disabled')
+            elif self.transformation_config.out_of_core:
+                # The state holds every joined rating, so it is only built by in-memory runs
+                logger.warning("Out-of-core run: no incremental update state is built, "
+                               "rerun with out_of_core: false before applying deltas")
+                shutil.rmtree(self.incremental_config.state_dir, ignore_errors=True)
+                self.run_report.skip('incremental_state', 'out of core')
+            else:
+                with self.run_report.stage('incremental_state'):
+                    IncrementalUpdater(self.incremental_config).build_state(books, ratings)
             logger.info("STAGE 3: Data Transformation Completed")
             logger.info("=" * 50)
             return final_ratings, user_book_matrix
@@ -56,14 +143,25 @@ class TrainingPipeline:
             logger.error(f"Error in data transformation stage: {e}")
             raise e
 
+    def load_data_transformation_outputs(self):
+        """Load the outputs persisted by the last data transformation run"""
+        logger.info("STAGE 3: Data Transformation up to date, loading checkpoint")
+        with self.run_report.stage('load_data_transformation_checkpoint') as record:
+            final_ratings = load_pickle(Path(self.transformation_config.root_dir, 'final_ratings.pkl'))
+            user_book_matrix = load_pickle(Path(self.transformation_config.root_dir, 'user_book_matrix.pkl'))
+            record['outputs'] = stage_sizes(final_ratings=final_ratings, user_book_matrix=user_book_matrix)
+        return final_ratings, user_book_matrix
+
     def run_model_training(self, final_ratings, user_book_matrix):
         """Run model training stage"""
         try:
             logger.info("=" * 50)
             logger.info("STAGE 4: Model Training Started")
-            config = self.config_manager.get_model_trainer_config()
-            model_trainer = ModelTrainer(config)
-            model = model_trainer.train_model(final_ratings, user_book_matrix)
+            with self.run_report.stage('model_trainer') as record:
+                record['inputs'] = stage_sizes(final_ratings=final_ratings, user_book_matrix=user_book_matrix)
+                model_trainer = ModelTrainer(self.trainer_config)
+                model = model_trainer.train_model(final_ratings, user_book_matrix)
+                record['algorithm'] = self.trainer_config.algorithm
             logger.info("STAGE 4: Model Training Completed")
             logger.info("=" * 50)
             return model
@@ -71,30 +169,157 @@ class TrainingPipeline:
             logger.error(f"Error in model training stage: {e}")
             raise e
 
+    def compute_stage_fingerprints(self) -> dict:
+        """
+        Fingerprint every stage from its config section and the fingerprint of the stage before it
+        
+        Ingestion is fingerprinted from the content hashes of the source CSVs, so
+        editing a later config section only invalidates that stage and the ones after it.
+        """
+        os.makedirs(self.ingestion_config.cache_dir, exist_ok=True)
+        sources_index = Path(self.ingestion_config.cache_dir, 'sources.json')
+        source_hashes = [
+            cached_file_sha256(path, sources_index)
+            for path in (self.ingestion_config.books_file, self.ingestion_config.users_file, self.ingestion_config.ratings_file)
+        ]
+        
+        fingerprints = {}
+        fingerprints['data_ingestion'] = compute_fingerprint(
+            self.ingestion_config.model_dump(mode='json'), source_hashes
+        )
+        fingerprints['data_validation'] = compute_fingerprint(
+            self.validation_config.model_dump(mode='json'), fingerprints['data_ingestion']
+        )
+        fingerprints['data_transformation'] = compute_fingerprint(
+            self.transformation_config.model_dump(mode='json'), fingerprints['data_validation']
+        )
+        fingerprints['model_trainer'] = compute_fingerprint(
+            self.trainer_config.model_dump(mode='json'), fingerprints['data_transformation']
+        )
+        return fingerprints
+
+    def _stage_outputs(self, stage: str) -> list:
+        """Files a stage must have left behind for its checkpoint to be reusable"""
+        if stage == 'data_transformation':
+            root_dir = self.transformation_config.root_dir
+            outputs = [Path(root_dir, 'final_ratings.pkl'), Path(root_dir, 'user_book_matrix.pkl')]
+            if self.incremental_config.enabled and not self.transformation_config.out_of_core:
+                outputs.append(Path(self.incremental_config.state_dir, 'manifest.json'))
+            return outputs
+        if stage == 'model_trainer':
+            if self.trainer_config.artifact_format == 'pickle':
+                return [
+                    self.trainer_config.book_names_path,
+                    self.trainer_config.book_metadata_path,
+                    self.trainer_config.neighbor_indices_path,
+                    self.trainer_config.neighbor_distances_path,
+                ]
+            return [Path(self.trainer_config.bundle_dir, CURRENT_FILE)]
+        return []
+
+    def _stage_root_dir(self, stage: str) -> Path:
+        """Directory holding a stage's checkpoint"""
+        return {
+            'data_ingestion': self.ingestion_config.root_dir,
+            'data_validation': self.validation_config.root_dir,
+            'data_transformation': self.transformation_config.root_dir,
+            'model_trainer': self.trainer_config.root_dir,
+        }[stage]
+
+    def is_stage_current(self, stage: str, fingerprint: str) -> bool:
+        """True if the stage last completed with this fingerprint and its outputs still exist"""
+        if self.force:
+            return False
+        checkpoint_path = Path(self._stage_root_dir(stage), CHECKPOINT_FILE)
+        if not checkpoint_path.exists():
+            return False
+        checkpoint = load_json(checkpoint_path)
+        return checkpoint.get('fingerprint') == fingerprint and all(
+            os.path.exists(path) for path in self._stage_outputs(stage)
+        )
+
+    def save_stage_checkpoint(self, stage: str, fingerprint: str):
+        """Record that a stage completed for the given fingerprint"""
+        save_json(
+            {
+                'stage': stage,
+                'fingerprint': fingerprint,
+                'completed_at': datetime.now(timezone.utc).isoformat(),
+                'outputs': [str(path) for path in self._stage_outputs(stage)],
+            },
+            Path(self._stage_root_dir(stage), CHECKPOINT_FILE)
+        )
+
+    def clear_checkpoints(self):
+        """Drop all stage checkpoints and the ingestion cache for a full rebuild"""
+        logger.info("Forcing full rebuild: clearing stage checkpoints and ingestion cache")
+        for stage in ('data_ingestion', 'data_validation', 'data_transformation', 'model_trainer'):
+            checkpoint_path = Path(self._stage_root_dir(stage), CHECKPOINT_FILE)
+            if checkpoint_path.exists():
+                checkpoint_path.unlink()
+        shutil.rmtree(self.ingestion_config.cache_dir, ignore_errors=True)
+
     def run_pipeline(self):
-        """Run the complete training pipeline"""
+        """
+        Run the training pipeline, resuming from the first stage whose fingerprint changed
+        
+        Every run, including failed and up-to-date ones, leaves a run report at
+        instrumentation.run_report_path with per-stage timings, memory and data sizes.
+        """
+        self.run_report = self.new_run_report()
+        status = 'failed'
         try:
-            # Stage 1: Data Ingestion
-            books, users, ratings = self.run_data_ingestion()
+            if self.force:
+                self.clear_checkpoints()
+            fingerprints = self.compute_stage_fingerprints()
             
-            # Stage 2: Data Validation
-            self.run_data_validation(books, users, ratings)
+            if self.is_stage_current('model_trainer', fingerprints['model_trainer']):
+                logger.info("All stages up to date, nothing to retrain")
+                for stage in ('data_ingestion', 'data_validation', 'data_transformation', 'model_trainer'):
+                    self.run_report.skip(stage, 'checkpoint current')
+                status = 'up_to_date'
+                return None
             
-            # Stage 3: Data Transformation
-            final_ratings, user_book_matrix = self.run_data_transformation(books, ratings)
+            if self.is_stage_current('data_transformation', fingerprints['data_transformation']):
+                for stage in ('data_ingestion', 'data_validation', 'data_transformation'):
+                    self.run_report.skip(stage, 'checkpoint current')
+                final_ratings, user_book_matrix = self.load_data_transformation_outputs()
+            else:
+                # Stage 1: Data Ingestion
+                books, users, ratings = self.run_data_ingestion()
+                self.save_stage_checkpoint('data_ingestion', fingerprints['data_ingestion'])
+                
+                # Stage 2: Data Validation
+                if self.is_stage_current('data_validation', fingerprints['data_validation']):
+                    logger.info("STAGE 2: Data Validation up to date, skipping")
+                    self.run_report.skip('data_validation', 'checkpoint current')
+                else:
+                    self.run_data_validation(books, users, ratings)
+                    self.save_stage_checkpoint('data_validation', fingerprints['data_validation'])
+                
+                # Stage 3: Data Transformation
+                final_ratings, user_book_matrix = self.run_data_transformation(books, users, ratings)
+                self.save_stage_checkpoint('data_transformation', fingerprints['data_transformation'])
             
             # Stage 4: Model Training
             model = self.run_model_training(final_ratings, user_book_matrix)
+            self.save_stage_checkpoint('model_trainer', fingerprints['model_trainer'])
             
             logger.info("=" * 50)
             logger.info("Training Pipeline Completed Successfully!")
             logger.info("=" * 50)
-            
+            status = 'completed'
+            return model
+        
         except Exception as e:
             logger.error(f"Training pipeline failed: {e}")
             raise e
+        
+        finally:
+            self.run_report.save(self.instrumentation_config.run_report_path, status, force=self.force)
 
 
 if __name__ == "__main__":
+    setup_logging(ConfigurationManager().get_logging_config())
     pipeline = TrainingPipeline()
     pipeline.run_pipeline()
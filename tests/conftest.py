@@ -0,0 +1,184 @@
+"""
+Shared fixtures: a small books table with a duplicated ISBN, skewed synthetic ratings, a
+trained run (transformation, model bundle and incremental state) built from them, and a
+workspace holding the same data as Book-Crossing CSVs with a config/config.yaml for the
+pipeline and the web app
+"""
+
+import os
+import csv
+import importlib
+import yaml
+import numpy as np
+import pandas as pd
+import pytest
+from pathlib import Path
+from typing import Callable
+from constant import CONFIG_FILE_PATH
+from entity.config_entity import DataTransformationConfig, ModelTrainerConfig, IncrementalUpdateConfig
+from components.stage_00_data_ingestion import RATINGS_DTYPES
+from components.stage_02_data_transformation import DataTransformation
+from components.stage_03_model_trainer import ModelTrainer
+from components.incremental_update import IncrementalUpdater
+
+MIN_USER_RATINGS = 8
+MIN_BOOK_RATINGS = 5
+N_NEIGHBORS = 4
+REPO_ROOT = Path(__file__).resolve().parents[1]
+CSV_OPTIONS = dict(sep=';', index=False, encoding='latin-1', quoting=csv.QUOTE_ALL)
+
+
+@pytest.fixture(scope='session')
+def books() -> pd.DataFrame:
+    """80 books with repeated titles and one ISBN shared by rows 10, 11 and 60, two of them with the same title"""
+    n_books = 80
+    books = pd.DataFrame({
+        'ISBN': [f"{i:010d}" for i in range(n_books)],
+        'Title': [f"Title {i % 50}" for i in range(n_books)],
+        'Author': [f"Author {i}" for i in range(n_books)],
+        'Year': [str(1950 + i) for i in range(n_books)],
+        'Publisher': [f"Publisher {i % 7}" for i in range(n_books)],
+        'Image-URL': [f"http://images/{i}.jpg" for i in range(n_books)],
+    })
+    books.loc[[11, 60], 'ISBN'] = books.loc[10, 'ISBN']
+    return books
+
+
+@pytest.fixture(scope='session')
+def make_ratings() -> Callable[..., pd.DataFrame]:
+    """Factory of skewed ratings, many of them implicit zeros, some of unknown ISBNs and many of the shared ISBN"""
+    def make(books: pd.DataFrame, n_ratings: int, users: np.ndarray, seed: int) -> pd.DataFrame:
+        rng = np.random.default_rng(seed)
+        isbns = np.append(books['ISBN'].unique(), ['9999999999', '8888888888'])
+        weights = 1.0 / np.arange(1, len(isbns) + 1)
+        weights[np.flatnonzero(isbns == books.loc[10, 'ISBN'])] = 0.3
+        user_weights = 1.0 / np.arange(1, len(users) + 1) ** 0.7
+        explicit = rng.integers(1, 11, n_ratings)
+        return pd.DataFrame({
+            'User-ID': rng.choice(users, n_ratings, p=user_weights / user_weights.sum()),
+            'ISBN': rng.choice(isbns, n_ratings, p=weights / weights.sum()),
+            'Book-Rating': np.where(rng.random(n_ratings) < 0.4, 0, explicit),
+        })
+    
+    return make
+
+
+@pytest.fixture
+def ratings_csv(tmp_path) -> Callable[..., Path]:
+    """Factory writing ratings frames, concatenated, to <tmp_path>/<name>.csv in the BX-Book-Ratings format"""
+    def write(name: str, *frames: pd.DataFrame) -> Path:
+        path = Path(tmp_path, f"{name}.csv")
+        pd.concat(frames).to_csv(path, sep=';', index=False)
+        return path
+    
+    return write
+
+
+@pytest.fixture(scope='session')
+def read_ratings() -> Callable[[Path], pd.DataFrame]:
+    """Reads a ratings file with the ingestion dtypes"""
+    def read(path: Path) -> pd.DataFrame:
+        return pd.read_csv(path, sep=';', encoding='latin-1', dtype=RATINGS_DTYPES)
+    
+    return read
+
+
+@pytest.fixture(scope='session')
+def trainer_config() -> Callable[..., ModelTrainerConfig]:
+    """Factory of model trainer configurations writing into a root directory"""
+    def config(root: Path, **fields) -> ModelTrainerConfig:
+        return ModelTrainerConfig(**{
+            'root_dir': root,
+            'model_path': Path(root, 'model.pkl'),
+            'book_names_path': Path(root, 'book_names.pkl'),
+            'final_ratings_path': Path(root, 'final_ratings.pkl'),
+            'book_matrix_path': Path(root, 'book_matrix.pkl'),
+            'book_metadata_path': Path(root, 'book_metadata.pkl'),
+            'neighbor_indices_path': Path(root, 'neighbor_indices.npy'),
+            'neighbor_distances_path': Path(root, 'neighbor_distances.npy'),
+            'bundle_dir': Path(root, 'bundle'),
+            'n_neighbors': N_NEIGHBORS,
+            **fields,
+        })
+    
+    return config
+
+
+@pytest.fixture(scope='session')
+def train(trainer_config) -> Callable[..., IncrementalUpdater]:
+    """Factory running the in-memory transformation and training into a root and building the incremental state"""
+    def run(root: Path, books: pd.DataFrame, ratings: pd.DataFrame) -> IncrementalUpdater:
+        transformation_config = DataTransformationConfig(
+            root_dir=root, min_user_ratings=MIN_USER_RATINGS, min_book_ratings=MIN_BOOK_RATINGS
+        )
+        incremental_config = IncrementalUpdateConfig(
+            root_dir=root, state_dir=Path(root, 'state'), bundle_dir=Path(root, 'bundle'), enabled=True,
+            min_user_ratings=MIN_USER_RATINGS, min_book_ratings=MIN_BOOK_RATINGS, n_neighbors=N_NEIGHBORS,
+        )
+        final_ratings, user_book_matrix = DataTransformation(transformation_config).transform_data(books, ratings)
+        ModelTrainer(trainer_config(root)).train_model(final_ratings, user_book_matrix)
+        updater = IncrementalUpdater(incremental_config)
+        updater.build_state(books, ratings)
+        return updater
+    
+    return run
+
+
+@pytest.fixture(scope='session')
+def workspace(books, make_ratings) -> Callable[..., Path]:
+    """
+    Factory writing BX-Books.csv, BX-Users.csv and BX-Book-Ratings.csv into root/data and the
+    repository config, pointed at them with the test thresholds, into root/config/config.yaml
+    
+    Keyword arguments override config sections, e.g. model_trainer={'algorithm': 'ivf'}.
+    """
+    def write(root: Path, ratings: pd.DataFrame = None, **overrides) -> Path:
+        if ratings is None:
+            ratings = make_ratings(books, 1500, np.arange(1, 41), seed=0)
+        data_dir = Path(root, 'data')
+        os.makedirs(data_dir, exist_ok=True)
+        paths = {name: Path(data_dir, f"{name}.csv") for name in ('BX-Books', 'BX-Users', 'BX-Book-Ratings')}
+        books.rename(columns={
+            'Title': 'Book-Title', 'Author': 'Book-Author', 'Year': 'Year-Of-Publication', 'Image-URL': 'Image-URL-L'
+        }).to_csv(paths['BX-Books'], **CSV_OPTIONS)
+        users = np.unique(ratings['User-ID'])
+        pd.DataFrame({'User-ID': users, 'Location': 'city, state, country', 'Age': 30}).to_csv(
+            paths['BX-Users'], **CSV_OPTIONS
+        )
+        ratings.to_csv(paths['BX-Book-Ratings'], **CSV_OPTIONS)
+        
+        with open(Path(REPO_ROOT, CONFIG_FILE_PATH)) as f:
+            config = yaml.safe_load(f)
+        config['data_ingestion'].update(
+            books_file=str(paths['BX-Books']), users_file=str(paths['BX-Users']),
+            ratings_file=str(paths['BX-Book-Ratings'])
+        )
+        config['data_transformation'].update(min_user_ratings=MIN_USER_RATINGS, min_book_ratings=MIN_BOOK_RATINGS)
+        config['model_trainer'].update(n_neighbors=N_NEIGHBORS)
+        for section, values in overrides.items():
+            config[section].update(values)
+        os.makedirs(Path(root, CONFIG_FILE_PATH).parent, exist_ok=True)
+        with open(Path(root, CONFIG_FILE_PATH), 'w') as f:
+            yaml.safe_dump(config, f, sort_keys=False)
+        return root
+    
+    return write
+
+
+@pytest.fixture(scope='session')
+def app_workspace(tmp_path_factory, workspace) -> Path:
+    """Workspace trained by the full pipeline, with its metrics kept in files as under gunicorn"""
+    from pipeline.training_pipeline import TrainingPipeline
+    
+    root = workspace(tmp_path_factory.mktemp('app'), serving={'reload_interval_seconds': None})
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(root)
+        TrainingPipeline().run_pipeline()
+    return root
+
+
+@pytest.fixture
+def web_app(app_workspace, monkeypatch):
+    """The app module, imported once from the trained workspace; requests run from it too"""
+    monkeypatch.chdir(app_workspace)
+    return importlib.import_module('app')
@@ -0,0 +1,56 @@
+"""
+Profile search must reject weights that do not define a weighted mean, and an IVF neighbor table
+must fill the rows whose probed cells held fewer than K books
+"""
+
+import json
+import numpy as np
+import pytest
+from pathlib import Path
+from scipy.sparse import random as sparse_random
+from components.ann_index import normalize_rows, profile_kneighbors, exact_kneighbors
+from components.stage_02_data_transformation import DataTransformation
+from components.stage_03_model_trainer import ModelTrainer
+from entity.config_entity import DataTransformationConfig
+from utils.artifact_bundle import load_bundle, resolve_bundle_dir
+
+
+@pytest.mark.parametrize('weights', [[0.0, 0.0], [np.nan, 1.0], [np.inf, 1.0]])
+def test_profile_rejects_undefined_weights(weights):
+    vectors = normalize_rows(sparse_random(20, 30, density=0.3, format='csr', random_state=0))
+    with pytest.raises(ValueError):
+        profile_kneighbors(vectors, np.array([0, 1]), np.array(weights), 5)
+
+
+def test_profile_excludes_the_history():
+    vectors = normalize_rows(sparse_random(20, 30, density=0.3, format='csr', random_state=0))
+    distances, indices = profile_kneighbors(vectors, np.array([0, 1]), np.array([0.0, 2.0]), 5)
+    assert len(indices) == 5 and not np.isin(indices, [0, 1]).any()
+    assert np.all(np.diff(distances) >= 0)
+
+
+def test_ivf_table_fills_incomplete_rows(tmp_path, books, make_ratings, trainer_config):
+    ratings = make_ratings(books, 1500, np.arange(1, 41), seed=0)
+    transformation_config = DataTransformationConfig(root_dir=tmp_path, min_user_ratings=8, min_book_ratings=5)
+    final_ratings, user_book_matrix = DataTransformation(transformation_config).transform_data(books, ratings)
+    config = trainer_config(tmp_path, algorithm='ivf', n_neighbors=8, ivf_n_lists=8, ivf_n_probe=1)
+    model = ModelTrainer(config).train_model(final_ratings, user_book_matrix)
+    
+    matrix = user_book_matrix.matrix
+    book_ids = np.arange(matrix.shape[0])
+    _, probed = model.kneighbors(matrix, 8, query_ids=book_ids)
+    incomplete = (probed < 0).any(axis=1)
+    assert incomplete.any()
+    
+    arrays, _ = load_bundle(resolve_bundle_dir(config.bundle_dir))
+    neighbor_indices = np.asarray(arrays['neighbor_indices'])
+    assert neighbor_indices.shape == (len(book_ids), 8) and (neighbor_indices >= 0).all()
+    assert not (neighbor_indices == book_ids[:, None]).any()
+    _, exact = exact_kneighbors(matrix, matrix[incomplete], 8, query_ids=book_ids[incomplete])
+    assert np.array_equal(np.sort(neighbor_indices[incomplete], axis=1), np.sort(exact, axis=1))
+    
+    with open(Path(tmp_path, 'ann_recall_report.json')) as f:
+        report = json.load(f)
+    assert report['algorithm'] == 'ivf' and report['n_probe'] == 1 and report['k'] == 8
+    assert report['n_books'] == len(book_ids) and report['sample_size'] == min(config.ann_recall_sample, len(book_ids))
+    assert 0 <= report['recall_at_8'] <= 1
@@ -0,0 +1,67 @@
+"""
+/api/recommend/profile answers from titles, ratings or a known user, never recommends the history back,
+and rejects malformed profiles with 400 and unknown ones with 404
+"""
+
+import pytest
+
+
+def post_profile(web_app, payload):
+    response = web_app.app.test_client().post('/api/recommend/profile', json=payload)
+    return response.status_code, response.get_json()
+
+
+def test_profile_from_titles_and_ratings(web_app):
+    history = web_app.artifacts.book_list[:2]
+    for payload in ({'titles': history + ['No Such Book'], 'n': 3},
+                    {'ratings': {history[0]: 9, history[1]: 0, 'No Such Book': 7}, 'n': 3}):
+        status, body = post_profile(web_app, payload)
+        titles = [recommendation['title'] for recommendation in body['recommendations']]
+        assert status == 200 and body['n'] == 3 and len(titles) == 3, payload
+        assert body['not_found'] == ['No Such Book']
+        assert not set(titles) & set(history)
+        distances = [recommendation['distance'] for recommendation in body['recommendations']]
+        assert distances == sorted(distances)
+
+
+def test_profile_from_user(web_app):
+    user_ratings, user_positions = web_app.artifacts.get_user_ratings()
+    user_id = next(iter(user_positions))
+    rated = {web_app.artifacts.book_list[idx] for idx in user_ratings[user_positions[user_id]].indices}
+    
+    status, body = post_profile(web_app, {'user_id': user_id, 'n': 2})
+    assert status == 200 and body['user_id'] == user_id and len(body['recommendations']) == 2
+    assert not {recommendation['title'] for recommendation in body['recommendations']} & rated
+    
+    status, body = post_profile(web_app, {'user_id': -1})
+    assert status == 404 and 'not found' in body['error']
+
+
+def test_profile_of_unknown_titles(web_app):
+    status, body = post_profile(web_app, {'titles': ['No Such Book', 'Nor This One']})
+    assert status == 404 and body['not_found'] == ['No Such Book', 'Nor This One']
+
+
+@pytest.mark.parametrize('payload', [
+    {},
+    {'n': 3},
+    {'titles': ['Title 1'], 'user_id': 1},
+    {'titles': ['Title 1'], 'n': 0},
+    {'titles': ['Title 1'], 'n': 101},
+    {'titles': ['Title 1'], 'n': '5'},
+    {'titles': ['Title 1'], 'n': True},
+    {'user_id': '11676'},
+    {'user_id': True},
+    {'titles': 'Title 1'},
+    {'titles': ['Title 1', 2]},
+    {'ratings': ['Title 1']},
+    {'ratings': {'Title 1': -1}},
+    {'ratings': {'Title 1': float('nan')}},
+    {'ratings': {'Title 1': float('inf')}},
+    {'ratings': {'Title 1': '9'}},
+    {'ratings': {'Title 1': 0, 'Title 2': 0, 'No Such Book': 9}},
+    {'titles': [f"Title {i}" for i in range(1001)]},
+])
+def test_profile_rejects_bad_requests(web_app, payload):
+    status, body = post_profile(web_app, payload)
+    assert status == 400 and body['error']
@@ -0,0 +1,76 @@
+"""
+DataTransformation must produce what the merge-based transformation it replaced produced
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from typing import Tuple
+from scipy.sparse import coo_matrix
+from entity.config_entity import DataTransformationConfig
+from entity.artifact_entity import UserBookMatrix
+from components.stage_02_data_transformation import DataTransformation
+
+
+def merge_transform(books: pd.DataFrame, ratings: pd.DataFrame, min_user_ratings: int,
+                    min_book_ratings: int) -> Tuple[pd.DataFrame, UserBookMatrix]:
+    """The transformation as it was before integer coding: pd.merge, groupby and drop_duplicates"""
+    user_rating_counts = ratings['User-ID'].value_counts() > min_user_ratings
+    active_users = user_rating_counts[user_rating_counts].index
+    filtered_ratings = ratings[ratings['User-ID'].isin(active_users)]
+    
+    ratings_with_books = pd.merge(filtered_ratings, books, on='ISBN')
+    book_rating_counts = ratings_with_books.groupby('Title')['Book-Rating'].count().reset_index()
+    book_rating_counts.rename(columns={'Book-Rating': 'Num_Ratings'}, inplace=True)
+    ratings_with_books = pd.merge(ratings_with_books, book_rating_counts, on='Title')
+    
+    final_ratings = ratings_with_books[ratings_with_books['Num_Ratings'] >= min_book_ratings]
+    final_ratings = final_ratings.drop_duplicates(['User-ID', 'Title'])
+    
+    row_codes, titles = pd.factorize(final_ratings['Title'], sort=True)
+    col_codes, user_ids = pd.factorize(final_ratings['User-ID'], sort=True)
+    matrix = coo_matrix(
+        (final_ratings['Book-Rating'].to_numpy(dtype=np.float64), (row_codes, col_codes)),
+        shape=(len(titles), len(user_ids))
+    ).tocsr()
+    matrix.eliminate_zeros()
+    return final_ratings, UserBookMatrix(
+        matrix=matrix, titles=np.asarray(titles, dtype=object), user_ids=np.asarray(user_ids)
+    )
+
+
+def assert_same_outputs(expected: Tuple[pd.DataFrame, UserBookMatrix], actual: Tuple[pd.DataFrame, UserBookMatrix]):
+    """Same final_ratings rows and dtypes in (User-ID, Title) order, and the same matrix"""
+    expected_ratings, expected_matrix = expected
+    actual_ratings, actual_matrix = actual
+    pd.testing.assert_frame_equal(
+        expected_ratings.sort_values(['User-ID', 'Title']).reset_index(drop=True),
+        actual_ratings.sort_values(['User-ID', 'Title']).reset_index(drop=True)
+    )
+    np.testing.assert_array_equal(expected_matrix.titles, actual_matrix.titles)
+    np.testing.assert_array_equal(expected_matrix.user_ids, actual_matrix.user_ids)
+    assert expected_matrix.matrix.shape == actual_matrix.matrix.shape
+    assert (expected_matrix.matrix != actual_matrix.matrix).nnz == 0
+
+
+@pytest.mark.parametrize('min_user_ratings, min_book_ratings', [(8, 5), (20, 10), (1, 1)])
+def test_matches_merge_transform(tmp_path, books, make_ratings, ratings_csv, read_ratings,
+                                 min_user_ratings, min_book_ratings):
+    # Duplicated ISBNs, implicit zero ratings and ISBNs missing from the books table
+    ratings = read_ratings(ratings_csv('ratings', make_ratings(books, 2000, np.arange(1, 61), seed=10)))
+    assert books['ISBN'].duplicated().any() and (ratings['Book-Rating'] == 0).any()
+    config = DataTransformationConfig(
+        root_dir=tmp_path, min_user_ratings=min_user_ratings, min_book_ratings=min_book_ratings
+    )
+    
+    expected = merge_transform(books, ratings, min_user_ratings, min_book_ratings)
+    actual = DataTransformation(config).transform_data(books, ratings)
+    streamed = DataTransformation(config).transform_chunks(
+        books, lambda: (ratings.iloc[start:start + 300] for start in range(0, len(ratings), 300))
+    )
+    
+    assert len(actual[0]) > 0
+    assert_same_outputs(expected, actual)
+    # Both code paths label rows the same way, so out of core must match in order and index too
+    pd.testing.assert_frame_equal(actual[0], streamed[0])
+    assert_same_outputs(actual, streamed)
@@ -0,0 +1,86 @@
+"""
+An incremental update must publish the same bundle as a full retrain on the ratings with the delta appended
+"""
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from components.ann_index import normalize_rows
+from utils.artifact_bundle import load_bundle, resolve_bundle_dir, get_csr, get_strings
+
+STRING_ARRAYS = ('titles', 'authors', 'years', 'publishers', 'image_urls', 'search_keys')
+
+
+def assert_same_bundle(updated_dir: Path, retrained_dir: Path):
+    """Compare everything a worker serves from two bundles"""
+    updated, _ = load_bundle(resolve_bundle_dir(updated_dir))
+    retrained, _ = load_bundle(resolve_bundle_dir(retrained_dir))
+    
+    updated_matrix, retrained_matrix = get_csr(updated, 'matrix'), get_csr(retrained, 'matrix')
+    assert updated_matrix.shape == retrained_matrix.shape
+    assert (updated_matrix != retrained_matrix).nnz == 0
+    np.testing.assert_array_equal(updated['user_ids'], retrained['user_ids'])
+    for name in STRING_ARRAYS:
+        assert list(get_strings(updated, name)) == list(get_strings(retrained, name)), name
+    for name in ('search_title_ids', 'search_title_starts', 'rating_counts'):
+        np.testing.assert_array_equal(updated[name], retrained[name], err_msg=name)
+    
+    # Tied similarities may be ordered differently, so indices are checked through their distances
+    np.testing.assert_allclose(updated['neighbor_distances'], retrained['neighbor_distances'], atol=1e-5)
+    vectors = normalize_rows(updated_matrix)
+    rows = np.arange(updated_matrix.shape[0])[:, np.newaxis]
+    similarities = np.asarray((vectors @ vectors.T).todense())[rows, updated['neighbor_indices']]
+    np.testing.assert_allclose(1.0 - similarities, updated['neighbor_distances'], atol=1e-5)
+
+
+def test_delta_matches_full_retrain(tmp_path, books, make_ratings, ratings_csv, read_ratings, train):
+    base = make_ratings(books, 1500, np.arange(1, 41), seed=1)
+    delta = make_ratings(books, 400, np.arange(20, 61), seed=2)
+    
+    updater = train(Path(tmp_path, 'updated'), books, read_ratings(ratings_csv('base', base)))
+    report = updater.apply_delta(ratings_csv('delta', delta))
+    train(Path(tmp_path, 'retrained'), books, read_ratings(ratings_csv('full', base, delta)))
+    
+    assert report['newly_active_users'] > 0 and report['newly_popular_books'] > 0
+    assert_same_bundle(Path(tmp_path, 'updated', 'bundle'), Path(tmp_path, 'retrained', 'bundle'))
+    assert updater.apply_delta(Path(tmp_path, 'delta.csv')) is None
+
+
+def test_duplicated_isbn_joins_every_book(tmp_path, books, make_ratings, ratings_csv, read_ratings, train):
+    base = make_ratings(books, 1500, np.arange(1, 41), seed=3)
+    # Ten ratings of the shared ISBN from active users, twice min_book_ratings, make both of its titles popular
+    delta = pd.DataFrame({'User-ID': np.arange(1, 11), 'ISBN': books.loc[10, 'ISBN'], 'Book-Rating': 7})
+    
+    updater = train(Path(tmp_path, 'updated'), books, read_ratings(ratings_csv('base', base)))
+    updater.apply_delta(ratings_csv('delta', delta))
+    train(Path(tmp_path, 'retrained'), books, read_ratings(ratings_csv('full', base, delta)))
+    
+    updated, _ = load_bundle(resolve_bundle_dir(Path(tmp_path, 'updated', 'bundle')))
+    assert {'Title 10', 'Title 11'} <= set(get_strings(updated, 'titles'))
+    assert_same_bundle(Path(tmp_path, 'updated', 'bundle'), Path(tmp_path, 'retrained', 'bundle'))
+
+
+def test_sequential_deltas_match_full_retrain(tmp_path, books, make_ratings, ratings_csv, read_ratings, train):
+    base = make_ratings(books, 1200, np.arange(1, 41), seed=4)
+    deltas = [make_ratings(books, 300, np.arange(20, 61), seed=seed) for seed in (5, 6)]
+    
+    updater = train(Path(tmp_path, 'updated'), books, read_ratings(ratings_csv('base', base)))
+    reports = [updater.apply_delta(ratings_csv(f"delta_{i}", delta)) for i, delta in enumerate(deltas)]
+    train(Path(tmp_path, 'retrained'), books, read_ratings(ratings_csv('full', base, *deltas)))
+    
+    assert reports[1]['parent_version'] == reports[0]['artifact_version']
+    assert len(list(Path(tmp_path, 'updated', 'state', 'segments').iterdir())) == 2
+    assert_same_bundle(Path(tmp_path, 'updated', 'bundle'), Path(tmp_path, 'retrained', 'bundle'))
+
+
+def test_delta_outside_the_matrix_keeps_the_version(tmp_path, books, make_ratings, ratings_csv, read_ratings, train):
+    base = make_ratings(books, 1500, np.arange(1, 41), seed=7)
+    # A single rating from a new user cannot make them active
+    delta = pd.DataFrame({'User-ID': [1000], 'ISBN': [books.loc[0, 'ISBN']], 'Book-Rating': [5]})
+    
+    updater = train(Path(tmp_path, 'updated'), books, read_ratings(ratings_csv('base', base)))
+    _, manifest = load_bundle(resolve_bundle_dir(Path(tmp_path, 'updated', 'bundle')))
+    report = updater.apply_delta(ratings_csv('delta', delta))
+    
+    assert report['new_ratings'] == 0
+    assert report['artifact_version'] == manifest['artifact_version']
@@ -0,0 +1,79 @@
+"""
+Queued logging drops and counts records instead of blocking, samples by logger hierarchy
+and keeps extra= fields in its JSON records
+"""
+
+import sys
+import json
+import queue
+import logging
+from pathlib import Path
+from logger.log import BoundedQueueHandler, JsonFormatter, SamplingFilter, SharedRotatingFileHandler
+
+
+def make_record(name: str = 'app', level: int = logging.INFO, **extra) -> logging.LogRecord:
+    logger = logging.getLogger(name)
+    return logger.makeRecord(name, level, __file__, 1, "served %s", ('/',), None, extra=extra)
+
+
+def test_full_queue_drops_and_counts():
+    outcomes = []
+    handler = BoundedQueueHandler(queue.Queue(maxsize=2), count=outcomes.append)
+    for _ in range(5):
+        handler.handle(make_record())
+    
+    assert handler.counts == {'queued': 2, 'sampled_out': 0, 'dropped': 3}
+    assert outcomes == ['queued', 'queued', 'dropped', 'dropped', 'dropped']
+    # Arguments are merged before queueing, as the listener formats the record later
+    assert handler.queue.get_nowait().getMessage() == "served /"
+
+
+def test_sampled_out_records_are_counted():
+    handler = BoundedQueueHandler(queue.Queue(maxsize=10))
+    handler.addFilter(SamplingFilter({'app.requests': 0.0}))
+    handler.handle(make_record('app.requests'))
+    handler.handle(make_record('app.requests', level=logging.WARNING))
+    handler.handle(make_record('app'))
+    
+    assert handler.counts == {'queued': 2, 'sampled_out': 1, 'dropped': 0}
+
+
+def test_sampling_rate_resolves_closest_parent():
+    sampling = SamplingFilter({'app': 0.5, 'app.requests': 0.1})
+    assert sampling.rate('app') == 0.5
+    assert sampling.rate('app.requests') == 0.1
+    assert sampling.rate('app.requests.slow') == 0.1
+    assert sampling.rate('app.other') == 0.5
+    # A shared prefix is not a parent
+    assert sampling.rate('application') == 1.0
+    assert sampling.rate('components') == 1.0
+
+
+def test_json_formatter_keeps_extra_fields():
+    entry = json.loads(JsonFormatter().format(make_record(route='/api/search', status=200, duration_ms=1.5)))
+    assert entry['message'] == "served /"
+    assert entry['level'] == 'INFO' and entry['logger'] == 'app'
+    assert (entry['route'], entry['status'], entry['duration_ms']) == ('/api/search', 200, 1.5)
+    assert 'args' not in entry and 'msg' not in entry
+
+
+def test_json_formatter_renders_exceptions():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.getLogger('app').makeRecord('app', logging.ERROR, __file__, 1, "failed", (), sys.exc_info())
+    entry = json.loads(JsonFormatter().format(record))
+    assert 'ValueError: boom' in entry['exception']
+
+
+def test_rotation_keeps_backup_count_files(tmp_path):
+    handler = SharedRotatingFileHandler(Path(tmp_path, 'run.log'), max_bytes=200, backup_count=2)
+    handler.setFormatter(JsonFormatter())
+    for _ in range(20):
+        handler.emit(make_record(route='/'))
+    handler.close()
+    
+    assert sorted(path.name for path in tmp_path.iterdir() if not path.name.endswith('.lock')) == [
+        'run.log', 'run.log.1', 'run.log.2'
+    ]
+    assert all(path.stat().st_size <= 200 for path in tmp_path.glob('run.log*'))
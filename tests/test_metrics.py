@@ -0,0 +1,139 @@
+"""
+Metric files of dead workers from an earlier run must not be summed, threaded recording must not lose samples,
+and /metrics must expose request counters and latency histograms merged over exited workers
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import numpy as np
+from pathlib import Path
+from utils.metrics import MetricsRegistry, LIVE_PREFIX, DEAD_PREFIX
+
+
+def make_registry() -> MetricsRegistry:
+    registry = MetricsRegistry(namespace='test')
+    registry.requests = registry.counter('requests_total', "Requests", {'route': ['/']})
+    registry.latency = registry.histogram('latency_seconds', "Latency", {'route': ['/']}, buckets=(0.1, 1.0))
+    return registry
+
+
+def dead_pid() -> int:
+    """Pid of a process that has exited"""
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def write_samples(directory: Path, prefix: str, pid: int, registry: MetricsRegistry, requests: float):
+    """Metrics file of another process that recorded requests"""
+    samples = np.zeros(registry.size, dtype=np.float64)
+    samples[registry.requests.offset] = requests
+    samples.tofile(Path(directory, f"{prefix}-{pid}-{registry.layout_hash}.db"))
+
+
+def test_stale_files_are_not_summed(tmp_path):
+    registry = make_registry()
+    pid = dead_pid()
+    write_samples(tmp_path, LIVE_PREFIX, pid, registry, 5)
+    write_samples(tmp_path, DEAD_PREFIX, pid, registry, 7)
+    
+    registry.open(tmp_path)
+    registry.requests.inc('/')
+    values, _ = registry.collect()
+    
+    assert values[registry.requests.offset] == 1
+    assert sorted(path.name.split('-')[0] for path in tmp_path.iterdir()) == [LIVE_PREFIX]
+
+
+def test_exited_workers_of_a_running_server_keep_counting(tmp_path):
+    registry = make_registry()
+    # A live sibling worker means the dead file was marked during this run
+    write_samples(tmp_path, LIVE_PREFIX, os.getppid(), registry, 2)
+    write_samples(tmp_path, DEAD_PREFIX, dead_pid(), registry, 7)
+    
+    registry.open(tmp_path)
+    registry.requests.inc('/')
+    values, _ = registry.collect()
+    
+    assert values[registry.requests.offset] == 10
+
+
+def test_threaded_recording_keeps_every_sample():
+    registry = make_registry()
+    registry.open()
+    n_threads, n_samples = 8, 20_000
+
+    def record():
+        for _ in range(n_samples):
+            registry.requests.inc('/')
+            registry.latency.observe(0.5, '/')
+    
+    threads = [threading.Thread(target=record) for _ in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    values, _ = registry.collect()
+    assert values[registry.requests.offset] == n_threads * n_samples
+    assert np.sum(values[registry.latency.offset:registry.latency.offset + 3]) == n_threads * n_samples
+
+
+def scrape(client) -> dict:
+    """Samples of a /metrics response keyed by name and labels"""
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.content_type.startswith('text/plain')
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line and not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            samples[series] = float(value)
+    return samples
+
+
+def test_metrics_endpoint_counts_requests(web_app):
+    client = web_app.app.test_client()
+    requests = 'book_recommender_http_requests_total{route="/api/search",status="2xx"}'
+    latency = 'book_recommender_http_request_duration_seconds'
+    before = scrape(client)
+    for query in ('title', 'title 1', 'title 2'):
+        assert client.get('/api/search', query_string={'q': query}).status_code == 200
+    assert client.get('/api/search').status_code == 400
+    after = scrape(client)
+    
+    assert after[requests] - before[requests] == 3
+    assert after['book_recommender_http_requests_total{route="/api/search",status="4xx"}'] - \
+        before['book_recommender_http_requests_total{route="/api/search",status="4xx"}'] == 1
+    count = after[f'{latency}_count{{route="/api/search"}}']
+    assert count - before[f'{latency}_count{{route="/api/search"}}'] == 4
+    assert after[f'{latency}_bucket{{route="/api/search",le="+Inf"}}'] == count
+    buckets = [value for series, value in after.items() if series.startswith(f'{latency}_bucket{{route="/api/search"')]
+    assert buckets == sorted(buckets)
+    assert after[f'{latency}_sum{{route="/api/search"}}'] > 0
+    assert after['book_recommender_books_loaded'] == len(web_app.artifacts.book_list)
+    assert after[f'book_recommender_artifact_info{{artifact_version="{web_app.artifacts.version}",'
+                 f'artifact_format="numpy"}}'] == 1
+
+
+def test_metrics_endpoint_merges_exited_workers_only(web_app):
+    client = web_app.app.test_client()
+    registry = web_app.metrics
+    series = 'book_recommender_recommend_titles_total{result="not_found"}'
+    pid = dead_pid()
+    # A worker that exited during this run, and one whose server died without marking it
+    exited, stale = (Path(registry.directory, f"{prefix}-{pid}-{registry.layout_hash}.db")
+                     for prefix in (DEAD_PREFIX, LIVE_PREFIX))
+    samples = np.zeros(registry.size, dtype=np.float64)
+    samples[web_app.RECOMMENDED_TITLES.offsets[('not_found',)]] = 5
+    samples.tofile(exited)
+    samples[web_app.RECOMMENDED_TITLES.offsets[('not_found',)]] = 7
+    samples.tofile(stale)
+    try:
+        before = scrape(client)[series]
+        exited.unlink()
+        assert before - scrape(client)[series] == 5
+    finally:
+        for path in (exited, stale):
+            path.unlink(missing_ok=True)
@@ -0,0 +1,48 @@
+"""
+Workers sharing the SQLite cache during a rolling reload must not drop each other's entries, which
+relies on published versions sorting as strings in publication order
+"""
+
+import numpy as np
+from pathlib import Path
+from utils.artifact_bundle import publish_bundle
+from utils.response_cache import SQLiteCache
+
+
+def test_rolling_reload_keeps_entries_of_both_versions(tmp_path):
+    old_worker = SQLiteCache(Path(tmp_path, 'cache.db'), max_entries=100)
+    new_worker = SQLiteCache(Path(tmp_path, 'cache.db'), max_entries=100)
+    old_worker.set_version('20260101T000000Z')
+    old_worker.set('a', [1])
+    
+    new_worker.set_version('20260102T000000Z')
+    new_worker.set('a', [2])
+    assert old_worker.get('a') is None
+    
+    # A worker still starting on the old version must not wipe the new version's entries
+    old_worker.version = None
+    old_worker.set_version('20260101T000000Z')
+    old_worker.set('a', [1])
+    assert new_worker.get('a') == [2]
+    assert old_worker.get('a') == [1]
+
+
+def test_published_versions_sort_in_publication_order(tmp_path):
+    bundle_root = Path(tmp_path, 'bundle')
+    versions = [
+        publish_bundle({'values': np.arange(3)}, {'artifact_version': timestamp}, bundle_root, keep_versions=20)[
+            'artifact_version']
+        for timestamp in ['20260101T000000Z'] * 12 + ['20260101T000001Z']
+    ]
+    assert len(set(versions)) == len(versions) and versions == sorted(versions)
+    
+    cache = SQLiteCache(Path(tmp_path, 'cache.db'), max_entries=100)
+    for version in versions:
+        cache.version = version
+        cache.set('a', version)
+    cache.set_version(versions[-2])
+    assert cache.get('a') == versions[-2]
+    cache.version = versions[-1]
+    assert cache.get('a') == versions[-1]
+    cache.version = versions[-3]
+    assert cache.get('a') is None
@@ -0,0 +1,26 @@
+"""
+A worker must keep answering from its loaded version after that version's directory is pruned
+"""
+
+import numpy as np
+from pathlib import Path
+from components.serving_engine import load_artifacts
+from utils.artifact_bundle import prune_versions, read_current_version
+
+
+def test_pruned_version_stays_readable(tmp_path, books, make_ratings, ratings_csv, train, trainer_config):
+    base = make_ratings(books, 1500, np.arange(1, 41), seed=8)
+    delta = make_ratings(books, 400, np.arange(20, 61), seed=9)
+    updater = train(Path(tmp_path, 'run'), books, base)
+    config = trainer_config(Path(tmp_path, 'run'))
+    
+    artifacts = load_artifacts(config)
+    updater.apply_delta(ratings_csv('delta', delta))
+    prune_versions(config.bundle_dir, keep_versions=1)
+    assert read_current_version(config.bundle_dir) != artifacts.version
+    assert not Path(config.bundle_dir, 'versions', artifacts.version).exists()
+    
+    user_ratings, user_positions = artifacts.get_user_ratings()
+    assert user_ratings.shape[0] == len(user_positions)
+    indices, distances = artifacts.find_profile_neighbors(np.array([0, 1]), np.array([1.0, 2.0]), 3)
+    assert len(indices) == 3 and np.all(np.isfinite(distances))
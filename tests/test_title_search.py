@@ -0,0 +1,100 @@
+"""
+Title search ranks prefix matches by tier and rating count, ignores case and accents, and
+finds titles an incremental update added
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from pathlib import Path
+from components.title_search import TitleSearchIndex, fold_text
+from utils.artifact_bundle import load_bundle, resolve_bundle_dir, get_strings
+
+TITLES = ['The Harry Potter Guide', 'Harry Potter and the Stone', 'Potter, Harry: A Life', 'Harrow', 'Émile et Zoé']
+RATING_COUNTS = np.array([50, 10, 5, 1, 3])
+
+
+@pytest.fixture
+def index() -> TitleSearchIndex:
+    return TitleSearchIndex.build(TITLES, RATING_COUNTS)
+
+
+def found(index: TitleSearchIndex, query: str, **kwargs) -> list:
+    return [TITLES[row] for row in index.search(query, **kwargs)]
+
+
+def test_fold_text():
+    assert fold_text('Café, Noir!') == 'cafe noir'
+    assert fold_text('  ÉMILE   et_Zoé ') == 'emile et zoe'
+
+
+def test_tiers_rank_before_rating_counts(index):
+    # Title start, then a later word, then every word in any order; rating counts only break ties
+    assert found(index, 'harry potter') == [
+        'Harry Potter and the Stone', 'The Harry Potter Guide', 'Potter, Harry: A Life'
+    ]
+    assert found(index, 'harr') == ['Harry Potter and the Stone', 'Harrow', 'The Harry Potter Guide', 'Potter, Harry: A Life']
+
+
+def test_token_matching_can_be_turned_off(index):
+    assert found(index, 'potter harry', match_tokens=False) == ['Potter, Harry: A Life']
+    assert 'The Harry Potter Guide' in found(index, 'potter harry')
+
+
+def test_folded_and_accented_queries(index):
+    for query in ('emile', 'ÉMILE', 'Emile,', 'zoé', 'et zoe'):
+        assert found(index, query) == ['Émile et Zoé'], query
+
+
+def test_limit_and_empty_queries(index):
+    assert len(index.search('harr', limit=2)) == 2
+    assert len(index.search('harr', limit=0)) == 0
+    assert len(index.search('  ,, ')) == 0
+    assert len(index.search('nothing like this')) == 0
+
+
+def test_fuzzy_corrects_misspelled_words(index):
+    assert found(index, 'hary poter') == []
+    assert found(index, 'hary poter', fuzzy=True)[0] == 'Harry Potter and the Stone'
+
+
+def test_round_trip_through_bundle_arrays(index):
+    arrays = {}
+    index.add_to_bundle(arrays)
+    restored = TitleSearchIndex.from_bundle(arrays)
+    assert list(restored.search('harr')) == list(index.search('harr'))
+
+
+def test_finds_a_title_added_by_a_delta(tmp_path, books, make_ratings, ratings_csv, read_ratings, train):
+    base = make_ratings(books, 1500, np.arange(1, 41), seed=11)
+    updater = train(Path(tmp_path, 'run'), books, read_ratings(ratings_csv('base', base)))
+    bundle_root = Path(tmp_path, 'run', 'bundle')
+    arrays, _ = load_bundle(resolve_bundle_dir(bundle_root))
+    missing = sorted(set(books['Title']) - set(get_strings(arrays, 'titles')))
+    title = missing[0]
+    
+    delta = pd.DataFrame({
+        'User-ID': np.arange(1, 11), 'ISBN': books.loc[books['Title'] == title, 'ISBN'].iloc[0], 'Book-Rating': 8
+    })
+    updater.apply_delta(ratings_csv('delta', delta))
+    
+    arrays, _ = load_bundle(resolve_bundle_dir(bundle_root))
+    titles = list(get_strings(arrays, 'titles'))
+    index = TitleSearchIndex.from_bundle(arrays)
+    assert [titles[row] for row in index.search(title.upper())] == [title]
+    assert title in {titles[row] for row in index.search('title', limit=len(titles))}
+
+
+def test_search_endpoint(web_app):
+    client = web_app.app.test_client()
+    response = client.get('/api/search', query_string={'q': 'TITLE 1', 'limit': 3})
+    results = response.get_json()['results']
+    assert response.status_code == 200 and len(results) == 3
+    assert all(result['title'].startswith('Title 1') for result in results)
+    counts = [result['ratings'] for result in results]
+    assert counts == sorted(counts, reverse=True)
+    
+    assert client.get('/api/search', query_string={'q': 'tittle 1', 'fuzzy': '1'}).get_json()['results']
+    for query_string in ({'q': ' '}, {'q': 'title', 'limit': 0}, {'q': 'title', 'limit': 'ten'},
+                         {'q': 'title', 'limit': web_app.MAX_SEARCH_RESULTS + 1}):
+        assert client.get('/api/search', query_string=query_string).status_code == 400, query_string
@@ -0,0 +1,42 @@
+"""
+The pipeline skips stages whose checkpoint matches the inputs and config, reruns the stages
+downstream of a config change, and reruns everything with force
+"""
+
+import json
+from pipeline.training_pipeline import TrainingPipeline
+
+STAGES = ('data_ingestion', 'data_validation', 'data_transformation', 'model_trainer')
+
+
+def run(force: bool = False) -> tuple:
+    """Overall status and the status of each pipeline stage from the run report"""
+    pipeline = TrainingPipeline(force=force)
+    pipeline.run_pipeline()
+    with open(pipeline.instrumentation_config.run_report_path) as f:
+        report = json.load(f)
+    stages = {record['stage']: record['status'] for record in report['stages'] if record['stage'] in STAGES}
+    return report['status'], stages
+
+
+def test_checkpoints_skip_current_stages(tmp_path, monkeypatch, workspace):
+    workspace(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    
+    assert run() == ('completed', dict.fromkeys(STAGES, 'completed'))
+    assert run() == ('up_to_date', dict.fromkeys(STAGES, 'skipped'))
+    
+    workspace(tmp_path, model_trainer={'n_neighbors': 3})
+    assert run() == ('completed', {
+        'data_ingestion': 'skipped', 'data_validation': 'skipped', 'data_transformation': 'skipped',
+        'model_trainer': 'completed'
+    })
+    
+    workspace(tmp_path, model_trainer={'n_neighbors': 3}, data_transformation={'min_book_ratings': 6})
+    assert run() == ('completed', {
+        'data_ingestion': 'completed', 'data_validation': 'skipped', 'data_transformation': 'completed',
+        'model_trainer': 'completed'
+    })
+    assert run() == ('up_to_date', dict.fromkeys(STAGES, 'skipped'))
+    
+    assert run(force=True) == ('completed', dict.fromkeys(STAGES, 'completed'))
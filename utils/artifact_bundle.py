@@ -0,0 +1,271 @@
+"""
+Artifact Bundle
+Versioned directory of raw .npy arrays plus a JSON manifest, loadable with
+np.load(mmap_mode='r') so every web worker shares the same pages through the OS page cache
+
+Published bundles live in <bundle root>/versions/<artifact_version>/ and the one to serve
+is named by the <bundle root>/current pointer file, which is replaced atomically. A new
+version is therefore never visible half-written, and files a worker has mapped are
+never overwritten.
+"""
+
+import os
+import json
+import shutil
+import logging
+import numpy as np
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from scipy.sparse import csr_matrix
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "current"
+VERSIONS_DIR = "versions"
+
+
+def pack_strings(values: Iterable) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode strings as (offsets int64, UTF-8 bytes uint8) so they can be memory-mapped"""
+    encoded = [str(value).encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return offsets, data
+
+
+class PackedStrings:
+    """Read-only sequence view over strings stored by pack_strings"""
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index) -> str:
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.data[start:end].tobytes().decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        # Decode the whole blob once instead of slicing the memmap per item
+        blob = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield blob[start:end].decode('utf-8')
+
+
+def add_strings(arrays: Dict[str, np.ndarray], name: str, values: Iterable):
+    """Pack strings into arrays as <name>_offsets and <name>_data"""
+    arrays[f"{name}_offsets"], arrays[f"{name}_data"] = pack_strings(values)
+
+
+def get_strings(arrays: Dict[str, np.ndarray], name: str) -> PackedStrings:
+    """Read strings stored with add_strings"""
+    return PackedStrings(arrays[f"{name}_offsets"], arrays[f"{name}_data"])
+
+
+def take_strings(strings: PackedStrings, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """pack_strings of strings[i] for i in indices, gathered as bytes without decoding"""
+    indices = np.asarray(indices, dtype=np.int64)
+    starts = np.asarray(strings.offsets[indices])
+    lengths = np.asarray(strings.offsets[indices + 1]) - starts
+    offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+    return offsets, np.asarray(strings.data[positions], dtype=np.uint8)
+
+
+def concat_strings(*parts: Tuple[np.ndarray, np.ndarray]) -> PackedStrings:
+    """Packed (offsets, data) pairs joined into one sequence"""
+    bases = np.cumsum([0] + [len(data) for _, data in parts[:-1]])
+    offsets = np.concatenate([np.asarray(parts[0][0][:1])] + [
+        np.asarray(part_offsets[1:]) + base for (part_offsets, _), base in zip(parts, bases)
+    ])
+    return PackedStrings(offsets, np.concatenate([np.asarray(data) for _, data in parts]))
+
+
+def add_csr(arrays: Dict[str, np.ndarray], name: str, matrix: csr_matrix):
+    """Store a CSR matrix as its raw data/indices/indptr arrays plus shape"""
+    arrays[f"{name}_data"] = matrix.data
+    arrays[f"{name}_indices"] = matrix.indices
+    arrays[f"{name}_indptr"] = matrix.indptr
+    arrays[f"{name}_shape"] = np.asarray(matrix.shape, dtype=np.int64)
+
+
+def get_csr(arrays: Dict[str, np.ndarray], name: str) -> csr_matrix:
+    """Rebuild a CSR matrix stored with add_csr without copying its arrays"""
+    shape = tuple(int(dim) for dim in arrays[f"{name}_shape"])
+    return csr_matrix(
+        (arrays[f"{name}_data"], arrays[f"{name}_indices"], arrays[f"{name}_indptr"]),
+        shape=shape,
+        copy=False
+    )
+
+
+def link_or_copy(source: Path, target: Path):
+    """Hard-link source to target, copying where the filesystem has no hard links"""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def save_bundle(arrays: Dict[str, np.ndarray], manifest: dict, bundle_dir: Path,
+                linked: Optional[Dict[str, Path]] = None,
+                patched: Optional[Dict[str, Tuple[Path, np.ndarray, np.ndarray]]] = None):
+    """
+    Write arrays as individual .npy files and the manifest last
+
+    The manifest is only written once every array is on disk, so a bundle
+    without a manifest is an incomplete write and is never loaded.
+
+    Args:
+        linked: Arrays taken unchanged from existing .npy files, hard-linked instead of written
+        patched: Arrays copied from an existing .npy file with some rows replaced, as (file, rows, values)
+    """
+    os.makedirs(bundle_dir, exist_ok=True)
+
+    files = {}
+    for name, array in arrays.items():
+        np.save(Path(bundle_dir, f"{name}.npy"), array)
+        files[name] = {'dtype': str(array.dtype), 'shape': list(array.shape)}
+    for name, source in (linked or {}).items():
+        link_or_copy(source, Path(bundle_dir, f"{name}.npy"))
+        array = np.load(Path(bundle_dir, f"{name}.npy"), mmap_mode='r')
+        files[name] = {'dtype': str(array.dtype), 'shape': list(array.shape)}
+    for name, (source, rows, values) in (patched or {}).items():
+        # Copied, never linked: the source belongs to a published bundle and must not change
+        shutil.copyfile(source, Path(bundle_dir, f"{name}.npy"))
+        array = np.load(Path(bundle_dir, f"{name}.npy"), mmap_mode='r+')
+        array[rows] = values
+        array.flush()
+        files[name] = {'dtype': str(array.dtype), 'shape': list(array.shape)}
+        del array
+
+    manifest = dict(manifest, format_version=BUNDLE_FORMAT_VERSION, files=files)
+    with open(Path(bundle_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    logger.info(f"Artifact bundle saved at: {bundle_dir}")
+
+
+def load_bundle(bundle_dir: Path, mmap_mode='r') -> Tuple[Dict[str, np.ndarray], dict]:
+    """
+    Load a bundle written by save_bundle
+
+    Returns:
+        Tuple of (arrays keyed by name, manifest dict)
+    """
+    with open(Path(bundle_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported artifact bundle format {manifest.get('format_version')} "
+            f"(expected {BUNDLE_FORMAT_VERSION}) in {bundle_dir}"
+        )
+
+    arrays = {
+        name: np.load(Path(bundle_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+        for name in manifest['files']
+    }
+    logger.info(f"Artifact bundle {manifest.get('artifact_version')} loaded from: {bundle_dir}")
+    return arrays, manifest
+
+
+def read_current_version(bundle_root: Path) -> Optional[str]:
+    """Version named by the current pointer, None before the first publish"""
+    try:
+        with open(Path(bundle_root, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_dir(bundle_root: Path, version: str) -> Path:
+    """Directory of one published version"""
+    return Path(bundle_root, VERSIONS_DIR, version)
+
+
+def resolve_bundle_dir(bundle_root: Path) -> Path:
+    """
+    Directory of the bundle to serve
+
+    Falls back to the bundle root itself for bundles written before versioning,
+    which kept the arrays and manifest directly in it.
+    """
+    version = read_current_version(bundle_root)
+    if version is not None:
+        return version_dir(bundle_root, version)
+    if Path(bundle_root, MANIFEST_FILE).exists():
+        return Path(bundle_root)
+    raise FileNotFoundError(f"No published artifact bundle in {bundle_root}")
+
+
+def publish_bundle(arrays: Dict[str, np.ndarray], manifest: dict, bundle_root: Path, keep_versions: int = 3,
+                   linked: Optional[Dict[str, Path]] = None,
+                   patched: Optional[Dict[str, Tuple[Path, np.ndarray, np.ndarray]]] = None) -> dict:
+    """
+    Write a new bundle version and make it current
+
+    The version is written to a hidden staging directory, renamed into versions/, and
+    only then named by the current pointer (written to a temporary file and renamed over
+    the old one). Readers see either the old version or the complete new one.
+
+    Args:
+        manifest: Must contain artifact_version, which names the version directory
+        keep_versions: Published versions kept on disk, including the new one
+        linked: Arrays hard-linked from an earlier version, see save_bundle
+        patched: Arrays copied from an earlier version with rows replaced, see save_bundle
+
+    Returns:
+        The manifest written, with artifact_version made unique if that name was taken
+    """
+    versions_root = Path(bundle_root, VERSIONS_DIR)
+    os.makedirs(versions_root, exist_ok=True)
+
+    # Zero-padded so versions still sort as strings in publication order, see SQLiteCache
+    base_version = version = manifest['artifact_version']
+    suffix = 1
+    while version_dir(bundle_root, version).exists():
+        suffix += 1
+        version = f"{base_version}-{suffix:03d}"
+    manifest = dict(manifest, artifact_version=version)
+
+    staging_dir = Path(versions_root, f".{version}.tmp")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    save_bundle(arrays, manifest, staging_dir, linked=linked, patched=patched)
+    os.replace(staging_dir, version_dir(bundle_root, version))
+
+    pointer_tmp = Path(bundle_root, f".{CURRENT_FILE}.tmp")
+    with open(pointer_tmp, 'w') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, Path(bundle_root, CURRENT_FILE))
+    logger.info(f"Published artifact version {version} in {bundle_root}")
+
+    prune_versions(bundle_root, keep_versions)
+    return manifest
+
+
+def prune_versions(bundle_root: Path, keep_versions: int):
+    """
+    Delete all but the newest keep_versions published versions, never the current one
+
+    Workers still serving a deleted version keep reading it through their open mappings;
+    the space is freed once they switch to the current version.
+    """
+    versions_root = Path(bundle_root, VERSIONS_DIR)
+    current = read_current_version(bundle_root)
+    versions = sorted(
+        (path for path in versions_root.iterdir() if path.is_dir() and not path.name.startswith('.')),
+        key=lambda path: (path.stat().st_mtime, path.name)
+    )
+    for path in versions[:max(len(versions) - keep_versions, 0)]:
+        if path.name != current:
+            shutil.rmtree(path, ignore_errors=True)
+            logger.info(f"Removed old artifact version: {path.name}")
@@ -0,0 +1,185 @@
+"""
+Pipeline Instrumentation
+Per-stage wall/CPU time, peak memory and data sizes, collected into a JSON run report
+"""
+
+import os
+import sys
+import time
+import cProfile
+import logging
+import tracemalloc
+import pandas as pd
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+from scipy.sparse import spmatrix
+from utils.util import save_json
+
+logger = logging.getLogger(__name__)
+
+PROC_STATUS = Path('/proc/self/status')
+PROC_CLEAR_REFS = Path('/proc/self/clear_refs')
+
+
+def _proc_status_mb(field: str) -> Optional[float]:
+    """A memory field of /proc/self/status (e.g. VmRSS, VmHWM) in MB, None where unavailable"""
+    try:
+        with open(PROC_STATUS) as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process in MB"""
+    return _proc_status_mb('VmRSS')
+
+
+def reset_peak_rss() -> bool:
+    """
+    Reset the kernel's peak RSS counter so the next reading covers only what follows
+
+    Returns:
+        True if the reset is supported (Linux), otherwise peak readings cover the whole process
+    """
+    try:
+        with open(PROC_CLEAR_REFS, 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size in MB since the last reset_peak_rss (or process start)"""
+    peak = _proc_status_mb('VmHWM')
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def describe(value) -> dict:
+    """Size summary of a stage input or output: rows/columns for frames, shape/nnz for matrices"""
+    if isinstance(value, pd.DataFrame):
+        return {'rows': int(value.shape[0]), 'columns': int(value.shape[1])}
+    if isinstance(value, spmatrix) or hasattr(value, 'nnz'):
+        return {'shape': [int(dim) for dim in value.shape], 'nnz': int(value.nnz)}
+    if hasattr(value, 'matrix'):
+        return describe(value.matrix)
+    if hasattr(value, 'shape'):
+        return {'shape': [int(dim) for dim in value.shape]}
+    return {'type': type(value).__name__}
+
+
+def _round(value: Optional[float], digits: int = 2) -> Optional[float]:
+    """Round a reading that may be None"""
+    return None if value is None else round(value, digits)
+
+
+class RunReport:
+    """
+    Collects one record per pipeline stage and saves them as a JSON run report
+
+    Usage:
+        with run_report.stage('data_ingestion') as record:
+            books, users, ratings = ...
+            record['outputs'] = {'books': describe(books)}
+    """
+
+    def __init__(self, trace_memory: bool = False, profile_dir: Optional[Path] = None):
+        """
+        Args:
+            trace_memory: Also record tracemalloc peaks (Python allocations only, slows the run)
+            profile_dir: Dump a cProfile .prof file per stage here when set
+        """
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[dict]:
+        """Measure the enclosed block as stage name and yield its record for size details"""
+        record = {'stage': name, 'status': 'running'}
+        self.stages.append(record)
+
+        peak_is_per_stage = reset_peak_rss()
+        rss_before = current_rss_mb()
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        profiler = cProfile.Profile() if self.profile_dir else None
+
+        wall_started, cpu_started = time.perf_counter(), time.process_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+            record['status'] = 'completed'
+        except Exception as e:
+            record['status'] = 'failed'
+            record['error'] = str(e)
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+            record['wall_seconds'] = round(time.perf_counter() - wall_started, 4)
+            record['cpu_seconds'] = round(time.process_time() - cpu_started, 4)
+
+            rss_after = current_rss_mb()
+            record['rss_before_mb'] = _round(rss_before)
+            record['rss_after_mb'] = _round(rss_after)
+            record['peak_rss_mb'] = _round(peak_rss_mb())
+            record['peak_rss_scope'] = 'stage' if peak_is_per_stage else 'process'
+            if self.trace_memory:
+                traced_peak = tracemalloc.get_traced_memory()[1]
+                record['tracemalloc_peak_delta_mb'] = _round((traced_peak - traced_before) / 2**20)
+            if profiler:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profile_path = Path(self.profile_dir, f"{name}.prof")
+                profiler.dump_stats(profile_path)
+                record['profile'] = str(profile_path)
+
+            logger.info(
+                f"{name}: {record['status']} in {record['wall_seconds']}s wall / {record['cpu_seconds']}s CPU, "
+                f"peak RSS {record['peak_rss_mb']} MB"
+            )
+
+    def skip(self, name: str, reason: str):
+        """Record a stage that was not run, e.g. because its checkpoint was current"""
+        self.stages.append({'stage': name, 'status': 'skipped', 'reason': reason})
+
+    def save(self, path: Path, status: str, **fields) -> dict:
+        """Write the report with the overall run status and any extra fields"""
+        report = {
+            'status': status,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.now(timezone.utc).isoformat(),
+            'total_seconds': round(time.perf_counter() - self._started, 4),
+            'trace_memory': self.trace_memory,
+            'profile_dir': str(self.profile_dir) if self.profile_dir else None,
+            **fields,
+            'stages': self.stages,
+        }
+        os.makedirs(Path(path).parent, exist_ok=True)
+        save_json(report, path)
+        logger.info(f"Run report saved at: {path}")
+        return report
+
+
+def stage_sizes(**values) -> dict:
+    """describe() every keyword argument, keyed by name"""
+    return {name: describe(value) for name, value in values.items()}
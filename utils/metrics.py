@@ -0,0 +1,334 @@
+"""
+Serving Metrics
+Prometheus text-format counters and histograms that aggregate across gunicorn workers
+
+Each worker records into its own small memory-mapped file, so recording a sample is a
+couple of in-memory float additions under a per-registry lock, with no system calls.
+/metrics, whichever worker serves it, sums the files of every worker. Files of workers
+that exited during this server run keep counting towards counters and histograms, like the
+multiprocess mode of prometheus_client; files of dead pids left by an earlier run are
+removed when the registry opens and never summed.
+"""
+
+import os
+import json
+import mmap
+import bisect
+import hashlib
+import logging
+import itertools
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LIVE_PREFIX = 'worker'
+DEAD_PREFIX = 'dead'
+
+
+def _pid_alive(pid: int) -> bool:
+    """True if a process with this pid exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Prometheus label set, e.g. {route="/",status="2xx"}"""
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+def _format_value(value: float) -> str:
+    """Integers without a trailing .0, everything else as repr"""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    """A metric family whose label values are all declared up front, giving a fixed slot layout"""
+
+    metric_type = ''
+    slots_per_series = 1
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str,
+                 labels: Optional[Dict[str, Sequence[str]]] = None):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels or {})
+        self.series = list(itertools.product(*(labels or {}).values()))
+        self.offset = registry.size
+        self.offsets = {
+            values: self.offset + position * self.slots_per_series
+            for position, values in enumerate(self.series)
+        }
+        registry.size += len(self.series) * self.slots_per_series
+
+    def layout(self) -> str:
+        return f"{self.metric_type}:{self.name}:{self.label_names}:{self.series}:{self.slots_per_series}"
+
+    def render(self, values: np.ndarray) -> list:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter, summed across workers"""
+
+    metric_type = 'counter'
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self.registry.lock:
+            self.registry.values[self.offsets[label_values]] += amount
+
+    def render(self, values: np.ndarray) -> list:
+        return [
+            f"{self.name}{_format_labels(self.label_names, series)} {_format_value(values[self.offsets[series]])}"
+            for series in self.series
+        ]
+
+
+class Histogram(_Metric):
+    """
+    Latency histogram with fixed buckets, summed across workers
+
+    Each series stores one non-cumulative count per bucket (the last one is +Inf) and the sum.
+    """
+
+    metric_type = 'histogram'
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str,
+                 labels: Optional[Dict[str, Sequence[str]]] = None, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self.slots_per_series = len(self.buckets) + 1
+        super().__init__(registry, name, documentation, labels)
+
+    def layout(self) -> str:
+        return f"{super().layout()}:{self.buckets}"
+
+    def observe(self, value: float, *label_values: str):
+        base = self.offsets[label_values]
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self.registry.lock:
+            values = self.registry.values
+            values[base + bucket] += 1
+            values[base + len(self.buckets)] += value
+
+    def render(self, values: np.ndarray) -> list:
+        lines = []
+        for series in self.series:
+            base = self.offsets[series]
+            counts = np.cumsum(values[base:base + len(self.buckets)])
+            for bound, count in zip(self.buckets, counts):
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.label_names + ('le',), series + (le,))
+                lines.append(f"{self.name}_bucket{labels} {_format_value(count)}")
+            labels = _format_labels(self.label_names, series)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[base + len(self.buckets)])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(counts[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Declares metrics and owns this process's sample storage
+
+    Declare every metric first, then call open(). Without a directory, samples stay in
+    process memory, which is enough for a single worker.
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.metrics = []
+        self.size = 0
+        self.directory = None
+        self.values = None
+        self.info = {}
+        # Threaded workers record concurrently, and += on a slot is a read then a write
+        self.lock = threading.Lock()
+        self._mmap = None
+
+    def counter(self, name: str, documentation: str, labels: Optional[Dict[str, Sequence[str]]] = None) -> Counter:
+        metric = Counter(self, f"{self.namespace}_{name}", documentation, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labels: Optional[Dict[str, Sequence[str]]] = None,
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(self, f"{self.namespace}_{name}", documentation, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    @property
+    def layout_hash(self) -> str:
+        """Identifies the slot layout, so files written by other code versions are never mixed in"""
+        layout = '|'.join(metric.layout() for metric in self.metrics)
+        return hashlib.sha256(layout.encode()).hexdigest()[:12]
+
+    def open(self, directory: Optional[Path] = None):
+        """
+        Allocate zeroed storage for this process
+
+        Args:
+            directory: Shared metrics directory for multi-worker servers, None for in-process only
+        """
+        self.directory = directory
+        if directory is not None:
+            self._remove_stale_files()
+        self._allocate()
+        # Workers forked from a preloading master must not share the master's file
+        os.register_at_fork(after_in_child=self._allocate)
+
+    def _allocate(self):
+        # A lock held by another thread at fork time would never be released in the child
+        self.lock = threading.Lock()
+        nbytes = max(self.size, 1) * 8
+        if self.directory is None:
+            self.values = memoryview(bytearray(nbytes)).cast('d')
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(LIVE_PREFIX, os.getpid(), 'db'), 'wb+') as f:
+            f.truncate(nbytes)
+            self._mmap = mmap.mmap(f.fileno(), nbytes)
+        self.values = memoryview(self._mmap).cast('d')
+        if self.info:
+            self.set_info(**self.info)
+
+    def _remove_stale_files(self):
+        """
+        Delete metrics files of dead pids that no live worker is accounting for
+
+        A worker file of a dead pid was never marked dead, so its server is gone. Files marked
+        dead only belong to the current run while some other process still has a live file;
+        otherwise this is the first process of a new run and they are left over too.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        files = [
+            (path, path.name.split('-')[0], int(path.name.split('-')[1]))
+            for path in Path(self.directory).iterdir()
+            if path.name.startswith((LIVE_PREFIX + '-', DEAD_PREFIX + '-')) and path.name.split('-')[1].isdigit()
+        ]
+        alive = {pid: _pid_alive(pid) for _, prefix, pid in files if prefix == LIVE_PREFIX}
+        new_run = not any(alive.values())
+        removed = 0
+        for path, prefix, pid in files:
+            if (prefix == LIVE_PREFIX and not alive[pid]) or (prefix == DEAD_PREFIX and new_run):
+                try:
+                    path.unlink()
+                    removed += 1
+                except FileNotFoundError:
+                    continue
+        if removed:
+            logger.info(f"Removed {removed} stale metrics files from {self.directory}")
+
+    def _path(self, prefix: str, pid: int, extension: str) -> Path:
+        return Path(self.directory, f"{prefix}-{pid}-{self.layout_hash}.{extension}")
+
+    def set_info(self, **fields):
+        """Publish this worker's gauges (artifact version, load time, ...), written rarely"""
+        self.info.update(fields)
+        if self.directory is not None:
+            with open(self._path(LIVE_PREFIX, os.getpid(), 'json'), 'w') as f:
+                json.dump(self.info, f)
+
+    def collect(self) -> Tuple[np.ndarray, list]:
+        """
+        Sum the samples of every worker and gather the info of live workers
+
+        Returns:
+            Tuple of (summed slot values, list of live worker info dicts)
+        """
+        if self.directory is None:
+            return np.frombuffer(self.values, dtype=np.float64).copy(), [self.info]
+
+        total = np.zeros(max(self.size, 1), dtype=np.float64)
+        for path in Path(self.directory).glob(f"*-{self.layout_hash}.db"):
+            # A live file of a dead pid was never marked dead: its server is gone
+            if path.name.startswith(LIVE_PREFIX) and not _pid_alive(int(path.name.split('-')[1])):
+                continue
+            samples = np.fromfile(path, dtype=np.float64)
+            if len(samples) == len(total):
+                total += samples
+
+        infos = []
+        for path in Path(self.directory).glob(f"{LIVE_PREFIX}-*-{self.layout_hash}.json"):
+            pid = int(path.name.split('-')[1])
+            if not _pid_alive(pid):
+                continue
+            try:
+                with open(path) as f:
+                    infos.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return total, infos
+
+    def render(self, gauges: Dict[str, Tuple[str, str]] = None, info_metric: Optional[str] = None,
+               info_labels: Sequence[str] = ()) -> str:
+        """
+        Prometheus text exposition of all metrics
+
+        Args:
+            gauges: info field → (metric name, help), exported as the maximum over live workers
+            info_metric: Name of an info metric counting live workers per combination of info_labels
+            info_labels: Info fields used as labels of info_metric
+        """
+        values, infos = self.collect()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.render(values))
+
+        for field, (name, documentation) in (gauges or {}).items():
+            readings = [info[field] for info in infos if info.get(field) is not None]
+            if readings:
+                lines.append(f"# HELP {self.namespace}_{name} {documentation}")
+                lines.append(f"# TYPE {self.namespace}_{name} gauge")
+                lines.append(f"{self.namespace}_{name} {_format_value(max(readings))}")
+
+        if info_metric:
+            name = f"{self.namespace}_{info_metric}"
+            combinations = {}
+            for info in infos:
+                key = tuple(str(info.get(label)) for label in info_labels)
+                combinations[key] = combinations.get(key, 0) + 1
+            lines.append(f"# HELP {name} Live workers per artifact version")
+            lines.append(f"# TYPE {name} gauge")
+            for key, count in sorted(combinations.items()):
+                lines.append(f"{name}{_format_labels(info_labels, key)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def clear_metrics_directory(directory: Path):
+    """Remove every metrics file, called once when the server starts"""
+    if not os.path.isdir(directory):
+        return
+    for path in Path(directory).iterdir():
+        if path.name.startswith((LIVE_PREFIX, DEAD_PREFIX)):
+            path.unlink()
+    logger.info(f"Cleared metrics directory: {directory}")
+
+
+def mark_process_dead(directory: Path, pid: int):
+    """Keep an exited worker's counters but drop it from live gauges"""
+    if not os.path.isdir(directory):
+        return
+    for path in Path(directory).glob(f"{LIVE_PREFIX}-{pid}-*"):
+        if path.suffix == '.json':
+            path.unlink()
+        else:
+            os.replace(path, path.with_name(path.name.replace(LIVE_PREFIX, DEAD_PREFIX, 1)))
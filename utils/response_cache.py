@@ -0,0 +1,237 @@
+"""
+Response Cache
+Bounded LRU/FIFO caches with an optional TTL for recommendation lists and rendered pages
+
+Every key carries the artifact version it was computed from, and switching to a new
+version drops entries of older ones, so a deploy never serves stale recommendations.
+The shared SQLite backend only drops versions older than the one switched to, so during
+a rolling reload workers still on the old version and workers already on the new one
+never delete each other's entries; whatever is left over ages out through eviction.
+The memory backend is private to a worker; the SQLite backend is one file shared by all
+gunicorn workers on the host.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Interface shared by the cache backends
+    
+    Values are JSON-serializable (recommendation lists, rendered HTML); None means a miss.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None, eviction: str = 'lru'):
+        """
+        Args:
+            max_entries: Entries kept before the oldest are evicted
+            ttl_seconds: Seconds an entry stays valid, None for no expiry
+            eviction: 'lru' evicts the least recently used entry, 'fifo' the least recently stored
+        """
+        if eviction not in ('lru', 'fifo'):
+            raise ValueError(f"Unknown eviction policy: {eviction}")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.eviction = eviction
+        self.version = None
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def set_version(self, version: str):
+        """Switch to a new artifact version, dropping entries of versions this cache will not serve again"""
+        if version != self.version:
+            self.version = version
+            self._drop_other_versions(version)
+            logger.info(f"Response cache now serving artifact version {version}")
+
+    def _drop_other_versions(self, version: str):
+        raise NotImplementedError
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+
+class MemoryCache(ResponseCache):
+    """In-process cache on an OrderedDict, safe to share between threads of one worker"""
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None, eviction: str = 'lru'):
+        super().__init__(max_entries, ttl_seconds, eviction)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        key = (self.version, key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[0], time.monotonic()):
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                return None
+            if self.eviction == 'lru':
+                self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        key = (self.version, key)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _drop_other_versions(self, version: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] != version]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache(ResponseCache):
+    """
+    Cache in a local SQLite file shared by every worker on the host
+    
+    A hit costs one indexed read (plus an access-time update under LRU), so it pays off
+    for rendered pages and large n rather than for single table lookups. Evictions run in
+    batches of about 10% of max_entries to keep writes cheap.
+    """
+
+    def __init__(self, path: Path, max_entries: int, ttl_seconds: Optional[float] = None, eviction: str = 'lru'):
+        super().__init__(max_entries, ttl_seconds, eviction)
+        self.path = Path(path)
+        self._evict_batch = max(1, max_entries // 10)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        os.makedirs(self.path.parent, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, version TEXT NOT NULL, value TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per process; workers forked after import must not reuse the parent's"""
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._pid = os.getpid()
+        return self._connection
+
+    def _key(self, key: Hashable) -> str:
+        return json.dumps([self.version, key], separators=(',', ':'))
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        key, now = self._key(key), time.time()
+        try:
+            with self._lock:
+                connection = self._connect()
+                row = connection.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and self._expired(row[1], now):
+                    connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    row = None
+                if row is not None and self.eviction == 'lru':
+                    connection.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache read failed, treating as a miss: {e}")
+            row = None
+        
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: Hashable, value: Any):
+        key, now = self._key(key), time.time()
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, version, value, stored_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, self.version, json.dumps(value, separators=(',', ':')), now, now)
+                )
+                self._pending += 1
+                if self._pending >= self._evict_batch:
+                    self._pending = 0
+                    self._evict(connection)
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache write failed, entry not stored: {e}")
+
+    def _evict(self, connection: sqlite3.Connection):
+        """Trim to max_entries, oldest used_at first (used_at equals stored_at under FIFO)"""
+        connection.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY used_at LIMIT max(0, (SELECT COUNT(*) FROM responses) - ?))",
+            (self.max_entries,)
+        )
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM responses")
+
+    def _drop_other_versions(self, version: str):
+        """
+        Drop older versions only, leaving newer ones to workers that already switched
+        
+        Versions must sort as strings in publication order: they are UTC timestamps, and
+        publish_bundle names a collision within the same second with a zero-padded
+        "-{suffix}", which sorts after its base and before the next second.
+        """
+        with self._lock:
+            self._connect().execute("DELETE FROM responses WHERE version < ?", (version,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def create_response_cache(backend: str, max_entries: int, ttl_seconds: Optional[float] = None,
+                          eviction: str = 'lru', path: Optional[Path] = None) -> Optional[ResponseCache]:
+    """
+    Build the configured cache backend
+    
+    Args:
+        backend: 'memory', 'sqlite' or 'none'
+        max_entries: Entries kept before evicting
+        ttl_seconds: Entry lifetime, None for no expiry
+        eviction: 'lru' or 'fifo'
+        path: SQLite file, required for the sqlite backend
+    
+    Returns:
+        ResponseCache, or None when caching is disabled
+    """
+    if backend == 'none' or max_entries == 0:
+        return None
+    if backend == 'memory':
+        return MemoryCache(max_entries, ttl_seconds, eviction)
+    if backend == 'sqlite':
+        if path is None:
+            raise ValueError("The sqlite response cache needs a path")
+        return SQLiteCache(path, max_entries, ttl_seconds, eviction)
+    raise ValueError(f"Unknown response cache backend: {backend}")
@@ -1,5 +1,8 @@
 import os
+import json
 import yaml
+import hashlib
+import numpy as np
 import pickle
 from pathlib import Path
 import logging
@@ -40,3 +43,61 @@ def load_pickle(path: Path):
         data = pickle.load(f)
     logger.info(f"Pickle file loaded from: {path}")
     return data
+
+
+def save_numpy(array: np.ndarray, path: Path):
+    """Save numpy array as .npy file"""
+    np.save(path, array)
+    logger.info(f"Numpy file saved at: {path}")
+
+
+def load_numpy(path: Path, mmap_mode=None) -> np.ndarray:
+    """Load .npy file, optionally memory-mapped"""
+    array = np.load(path, mmap_mode=mmap_mode)
+    logger.info(f"Numpy file loaded from: {path}")
+    return array
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Hash file content in chunks so large files are never fully loaded"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cached_file_sha256(path: Path, index_path: Path) -> str:
+    """SHA-256 of a file, recomputed only when its size or mtime differs from the index entry"""
+    index = load_json(index_path) if os.path.exists(index_path) else {}
+    
+    stat = os.stat(path)
+    key = str(Path(path).resolve())
+    entry = index.get(key)
+    if entry is None or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+        entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_sha256(path)}
+        index[key] = entry
+        save_json(index, index_path)
+    
+    return entry['sha256']
+
+
+def compute_fingerprint(*parts) -> str:
+    """Stable SHA-256 over JSON-serializable parts (paths and other objects are stringified)"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def save_json(data, path: Path):
+    """Save dictionary as json file"""
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+    logger.info(f"Json file saved at: {path}")
+
+
+def load_json(path: Path):
+    """Load json file"""
+    with open(path) as f:
+        data = json.load(f)
+    logger.info(f"Json file loaded from: {path}")
+    return data